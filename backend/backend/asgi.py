@@ -20,10 +20,18 @@ django_asgi_app = get_asgi_application()
 
 from channels.routing import ProtocolTypeRouter, URLRouter
 from investments.routing import websocket_urlpatterns  # Import your WebSocket routes
+from investments.middleware import JWTAuthMiddleware, WebSocketMetricsMiddleware
+from investments.prices import flush_price_writes_on_shutdown, lifespan
 
 
 
+# Write buffered WebSocket price ticks before the server exits
+flush_price_writes_on_shutdown()
+
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
-    "websocket": URLRouter(websocket_urlpatterns),
+    "lifespan": lifespan,
+    "websocket": WebSocketMetricsMiddleware(
+        JWTAuthMiddleware(URLRouter(websocket_urlpatterns)), websocket_urlpatterns,
+    ),
 })
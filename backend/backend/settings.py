@@ -55,6 +55,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'investments.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -95,11 +96,88 @@ CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
         "CONFIG": {
-            "hosts": [("localhost", 6379)], #use 'redis' instead of 'localhost' if using Docker
+            "hosts": [(os.environ.get('REDIS_HOST', 'localhost'), 6379)],  # 'redis' under docker-compose
         },
     },
 }
 
+# Seconds a price socket buffers ticks before sending them as one frame
+# (latest price per asset wins); 0 sends every tick immediately
+PRICE_UPDATES_FLUSH_INTERVAL = 0.1
+
+# Seconds the in-memory price map used for WebSocket snapshots may go
+# without checking the database for prices written by other processes
+PRICE_CACHE_TTL = 5
+# Seconds behind the newest last_updated seen that each refresh reads again.
+# Rows are stamped before they commit (the write-behind buffer stamps them at
+# tick time), so one can land after a newer one; this must cover that lag
+PRICE_CACHE_REFRESH_OVERLAP = 30
+
+# Users whose held asset ids are kept (LRU, per process) to fold the latest
+# price of their holdings into their ETags without a query per request
+HELD_ASSETS_CACHE_SIZE = 10000
+
+# Admin price ticks received over the WebSocket are broadcast at once and
+# written to the database in batches: after this many seconds, or as soon
+# as this many assets have unwritten prices. Pending prices are written on
+# shutdown; a killed worker loses at most this window (prices.PriceWriteBuffer)
+PRICE_WRITE_BEHIND_INTERVAL = 0.5
+PRICE_WRITE_BEHIND_MAX_PENDING = 500
+
+# Cache of the serialized /api/assets/ list, validated with ETag and
+# If-None-Match. The local-memory LRU is per process; with several workers
+# use 'investments.catalog.RedisBackend' (OPTIONS: location, key_prefix,
+# timeout) so an invalidation reaches all of them
+ASSET_CATALOG_CACHE = {
+    'BACKEND': 'investments.catalog.LocMemLRUBackend',
+    'OPTIONS': {'max_entries': 64},
+}
+
+# Largest file /api/investments/import/ accepts. The import runs inside the
+# request and holds a worker until it finishes, so bigger files go through
+# manage.py import_investments
+IMPORT_UPLOAD_MAX_BYTES = 20 * 1024 * 1024
+
+# Most days /api/goals/<id>/value-series/ returns: the range is clamped to
+# the goal's first purchase and today, then to this many days before its end
+VALUE_SERIES_MAX_DAYS = 50 * 366
+
+# Goal projections (/api/goals/<id>/projection/): Monte Carlo paths per
+# run unless ?paths= asks otherwise, the most a request may ask for, and
+# how many results are memoized (LRU, per process)
+PROJECTION_DEFAULT_PATHS = 10000
+PROJECTION_MAX_PATHS = 50000
+# Longest term a goal may have (also the most years_to_invest accepts), and
+# the most paths x months one simulation may hold: it keeps two float32
+# arrays of that size, so 12M cells is about 96 MB per request
+PROJECTION_MAX_MONTHS = 1200
+PROJECTION_MAX_CELLS = 12_000_000
+PROJECTION_CACHE_SIZE = 256
+# Annual expected return and volatility used when a goal's assets have too
+# little price history to estimate them and the request doesn't supply them
+PROJECTION_DEFAULT_RETURN = 0.07
+PROJECTION_DEFAULT_VOLATILITY = 0.15
+
+# XIRR/TWR results memoized per goal and per user (LRU, per process); keyed
+# by the user's data_version and the latest price of their holdings, so
+# they're recomputed after any change
+RETURNS_CACHE_SIZE = 1024
+
+# Reads authenticate from the access token's claims plus a cached copy of
+# the user's status columns instead of loading the user row per request.
+# A deactivated user, changed password or another worker's write is
+# noticed within TOKEN_USER_STATUS_TTL seconds; False loads the row always
+TOKEN_CLAIMS_USER = True
+TOKEN_USER_STATUS_TTL = 5
+TOKEN_USER_STATUS_MAX_ENTRIES = 10000
+
+# Per-route latency, query and serializer timings plus WebSocket and
+# channel layer counters, served at /metrics for Prometheus (per process).
+# Scrapes must send "Authorization: Bearer <METRICS_TOKEN>"; with no token
+# set, /metrics answers 403 unless DEBUG is on
+METRICS_ENABLED = True
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -118,7 +196,7 @@ TEMPLATES = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'investments.authentication.TokenClaimsAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -18,11 +18,13 @@ from django.contrib import admin
 from django.urls import include, path
 from django.views.generic import TemplateView
 from django.urls import path, re_path
+from investments.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('/', include('rest_framework.urls')),
     path('api/', include('investments.urls')),
+    path('metrics', metrics_view, name='metrics'),
     # Catch-all for frontend
     re_path(r'', TemplateView.as_view(template_name='index.html')),
 ]
@@ -0,0 +1,115 @@
+# analytics.py
+from datetime import date, datetime, time, timedelta, timezone
+
+import numpy as np
+from django.conf import settings
+from django.db.models import CharField, FloatField
+from django.db.models.functions import Cast
+
+from .models import AssetPriceBar, MonthlyInvestment
+
+
+def _to_days(values):
+    return np.array(values, dtype='datetime64[D]')
+
+
+def daily_closes(asset_ids, end=None):
+    """
+    {asset_id: (dates, closes)} from the daily rollup, as sorted
+    datetime64[D] and float64 arrays; one query for all assets.
+
+    Values are cast in the database so rows skip the ORM's per-value
+    datetime/Decimal converters, which would dominate the cost otherwise.
+    """
+    bars = AssetPriceBar.objects.filter(asset_id__in=asset_ids, interval='1d')
+    if end is not None:
+        bars = bars.filter(start__lt=datetime.combine(end + timedelta(days=1), time.min, timezone.utc))
+    rows = list(
+        bars.order_by('asset_id', 'start')
+        .annotate(day=Cast('start', CharField()), close_value=Cast('close', FloatField()))
+        .values_list('asset_id', 'day', 'close_value')
+    )
+    if not rows:
+        return {}
+
+    owners, days, closes = zip(*rows)
+    owners = np.array(owners)
+    days = np.array([day[:10] for day in days], dtype='datetime64[D]')
+    closes = np.array(closes, dtype=np.float64)
+    splits = np.flatnonzero(np.diff(owners)) + 1
+    return {
+        int(asset_owners[0]): (asset_days, asset_closes)
+        for asset_owners, asset_days, asset_closes in zip(
+            np.split(owners, splits), np.split(days, splits), np.split(closes, splits)
+        )
+    }
+
+
+def portfolio_value_series(goal, start=None, end=None):
+    """
+    Daily invested amount and market value of ``goal`` from ``start`` (first
+    purchase by default) to ``end`` (today by default). The range is clamped
+    to the first purchase and today, and to the last VALUE_SERIES_MAX_DAYS
+    days of it, since the grid is allocated per day.
+
+    Holdings per asset are a cumsum over the purchases; the holding and
+    close in force on each day are found with searchsorted, so the work is
+    array operations over (days x assets) rather than a loop per date. A day
+    with no recorded close before it values the asset at its latest
+    purchase price, like MonthlyInvestment.current_value does.
+    """
+    rows = list(
+        MonthlyInvestment.objects.filter(goal=goal)
+        .order_by('date', 'id')
+        .values_list('asset_id', 'date', 'quantity', 'purchase_price')
+    )
+    if not rows:
+        return {'dates': [], 'invested': [], 'value': []}
+    end = min(end or date.today(), date.today())
+    start = max(start or rows[0][1], rows[0][1])
+    max_days = getattr(settings, 'VALUE_SERIES_MAX_DAYS', 50 * 366)
+    if (end - start).days >= max_days:
+        start = end - timedelta(days=max_days - 1)
+    if start > end:
+        return {'dates': [], 'invested': [], 'value': []}
+
+    grid = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+    asset_ids = sorted({asset_id for asset_id, *_ in rows if asset_id is not None})
+    closes = daily_closes(asset_ids, end)
+
+    invested = np.zeros(len(grid))
+    value = np.zeros(len(grid))
+    by_asset = {}
+    for asset_id, day, quantity, price in rows:
+        days, quantities, prices = by_asset.setdefault(asset_id, ([], [], []))
+        days.append(day)
+        quantities.append(float(quantity))
+        prices.append(float(price))
+
+    for asset_id, (days, quantities, prices) in by_asset.items():
+        days = _to_days(days)
+        quantities = np.array(quantities)
+        prices = np.array(prices)
+        # Index of the last purchase on or before each day (-1: none yet)
+        held_upto = np.searchsorted(days, grid, side='right') - 1
+        owned = held_upto >= 0
+        held_upto = np.maximum(held_upto, 0)
+
+        units = np.where(owned, np.cumsum(quantities)[held_upto], 0.0)
+        cost = np.where(owned, np.cumsum(quantities * prices)[held_upto], 0.0)
+        unit_price = prices[held_upto]  # latest purchase price, the fallback
+
+        if asset_id in closes:
+            close_days, close_values = closes[asset_id]
+            close_upto = np.searchsorted(close_days, grid, side='right') - 1
+            has_close = close_upto >= 0
+            unit_price = np.where(has_close, close_values[np.maximum(close_upto, 0)], unit_price)
+
+        invested += cost
+        value += units * unit_price
+
+    return {
+        'dates': np.datetime_as_string(grid).tolist(),
+        'invested': np.round(invested, 2).tolist(),
+        'value': np.round(value, 2).tolist(),
+    }
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class InvestmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'investments'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import metrics
+        if metrics.metrics_enabled():
+            connection_created.connect(metrics.install_query_recorder)
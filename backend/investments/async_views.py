@@ -0,0 +1,205 @@
+# async_views.py
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.views import View
+from django_filters.utils import translate_validation
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .authentication import TokenClaimsAuthentication
+from .catalog import asset_catalog
+from .models import Asset
+from .pagination import InvestmentKeysetPagination
+from .portfolio import PortfolioTotals
+from .serializers import AssetSerializer, InvestmentGoalSerializer, MonthlyInvestmentSerializer
+from .views import (
+    MonthlyInvestmentFilter, goal_queryset, investment_queryset, user_data_not_modified, user_data_validators,
+)
+
+# Goals are read through aiterator() in chunks this size (each chunk is one
+# trip to the database thread, positions prefetched with it)
+GOAL_CHUNK_SIZE = 500
+
+_jwt_authentication = TokenClaimsAuthentication()
+
+
+async def authenticate(request):
+    """
+    The user of the request's Bearer access token, or None without one,
+    as the sync views' TokenClaimsAuthentication finds it: a ClaimsUser
+    (or, with TOKEN_CLAIMS_USER off, the loaded row) after the same
+    active, revoked-password and claims checks. Validating the token needs
+    no database; the user lookup, usually a user_status_cache hit, runs
+    on a database thread. Raises InvalidToken/AuthenticationFailed like it does.
+    """
+    header = _jwt_authentication.get_header(request)
+    raw_token = _jwt_authentication.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return None
+    token = _jwt_authentication.get_validated_token(raw_token)
+    if getattr(settings, 'TOKEN_CLAIMS_USER', True):
+        return await database_sync_to_async(_jwt_authentication.get_claims_user)(token)
+    return await database_sync_to_async(_jwt_authentication.get_user)(token)
+
+
+def filter_investments(request, queryset):
+    """
+    MonthlyInvestmentFilter applied as the sync list's DjangoFilterBackend
+    does. Validating ``?goal=`` reads the goal, so call it on a database
+    thread.
+    """
+    filterset = MonthlyInvestmentFilter(request.query_params, queryset=queryset, request=request)
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    return filterset.qs
+
+
+async def apaginate_pages(request, queryset):
+    """
+    Page ``queryset`` with the default (page number) pagination, as the sync
+    list views do; the count is taken with acount() up front so Paginator
+    never queries, and the page is read with the async ORM. Returns the
+    paginator, ready for get_paginated_response().
+    """
+    paginator = api_settings.DEFAULT_PAGINATION_CLASS()
+    django_paginator = paginator.django_paginator_class(queryset, paginator.get_page_size(request))
+    django_paginator.count = await queryset.acount()
+    page_number = paginator.get_page_number(request, django_paginator)
+    try:
+        paginator.page = django_paginator.page(page_number)
+    except InvalidPage as exc:
+        raise NotFound(paginator.invalid_page_message.format(page_number=page_number, message=str(exc)))
+    paginator.page.object_list = [row async for row in paginator.page.object_list]
+    paginator.request = request
+    return paginator
+
+
+class AsyncReadView(View):
+    """
+    Base for the async GET variants of read-heavy endpoints. Served by the
+    ASGI event loop itself, they only leave it for each query (the async
+    ORM) instead of holding a sync_to_async thread for the whole request,
+    which leaves that pool to the WebSocket consumers' database calls.
+    Responses are rendered with DRF's JSONRenderer and the same serializers
+    as the sync views, so bodies match.
+
+    Subclasses implement get_data(request, user). ``user_data_conditional``
+    adds the ETag/Last-Modified of UserDataConditionalMixin.
+    """
+    http_method_names = ['get', 'head', 'options']
+    requires_authentication = True
+    user_data_conditional = False
+    renderer = JSONRenderer()
+
+    async def get(self, request, *args, **kwargs):
+        # DRF's Request gives the serializers and paginators query_params
+        request = Request(request)
+        try:
+            user = await authenticate(request) if self.requires_authentication else None
+            if self.requires_authentication and user is None:
+                raise NotAuthenticated()
+            request.user = user
+
+            headers = {}
+            if self.user_data_conditional:
+                headers = await database_sync_to_async(user_data_validators)(request, user, self.renderer.format)
+                if user_data_not_modified(request, user, headers):
+                    return self.not_modified(headers)
+            return await self.respond(request, user, headers)
+        except APIException as exc:
+            headers = {}
+            if isinstance(exc, NotAuthenticated) or exc.status_code == status.HTTP_401_UNAUTHORIZED:
+                headers['WWW-Authenticate'] = _jwt_authentication.authenticate_header(request)
+            # Shaped like DRF's exception_handler output
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return self.render(data, exc.status_code, headers)
+
+    async def respond(self, request, user, headers):
+        return self.render(await self.get_data(request, user), headers=headers)
+
+    async def get_data(self, request, user):
+        raise NotImplementedError
+
+    def render(self, data, status_code=status.HTTP_200_OK, headers=None):
+        return HttpResponse(
+            self.renderer.render(data), status=status_code,
+            content_type=self.renderer.media_type, headers=headers,
+        )
+
+    @staticmethod
+    def not_modified(headers):
+        response = HttpResponseNotModified()
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+
+class AsyncOverallGoalStats(AsyncReadView):
+    async def get_data(self, request, user):
+        totals = (await PortfolioTotals.aload(user)).as_dict()
+        return {
+            **totals,
+            "last_updated": timezone.now().isoformat(),
+        }
+
+
+class AsyncGoalList(AsyncReadView):
+    user_data_conditional = True
+
+    async def get_data(self, request, user):
+        goals = [goal async for goal in goal_queryset(user).aiterator(chunk_size=GOAL_CHUNK_SIZE)]
+        return InvestmentGoalSerializer(goals, many=True, context={'request': request}).data
+
+
+class AsyncInvestmentList(AsyncReadView):
+    """
+    /api/investments/ served like MonthlyInvestmentViewSet.list: the same
+    filters and ``?expand=goal``, page numbers by default and keyset pages
+    with ``?pagination=cursor``.
+    """
+    user_data_conditional = True
+
+    async def get_data(self, request, user):
+        queryset = await database_sync_to_async(filter_investments)(
+            request, investment_queryset(user, request.query_params.get('expand')),
+        )
+        context = {'request': request}
+        if InvestmentKeysetPagination.requested(request):
+            paginator = InvestmentKeysetPagination()
+            rows = await paginator.apaginate_queryset(queryset, request)
+            return paginator.get_paginated_data(MonthlyInvestmentSerializer(rows, many=True, context=context).data)
+        paginator = await apaginate_pages(request, queryset)
+        return paginator.get_paginated_response(
+            MonthlyInvestmentSerializer(paginator.page, many=True, context=context).data
+        ).data
+
+
+class AsyncAssetList(AsyncReadView):
+    """
+    /api/assets/ served like AssetViewSet.list: from asset_catalog, with a
+    304 for a current If-None-Match. On a miss the page is counted and read
+    with the async ORM. The catalog itself is called directly, which with
+    RedisBackend means a short blocking round trip on the loop.
+    """
+    requires_authentication = False
+
+    async def respond(self, request, user, headers):
+        entry = asset_catalog.lookup(request)
+        if entry.not_modified:
+            return self.not_modified({'ETag': entry.etag})
+
+        data = entry.data
+        if data is None:
+            data = await self.get_data(request, user)
+            asset_catalog.store(entry, data)
+        return self.render(data, headers={'ETag': entry.etag})
+
+    async def get_data(self, request, user):
+        paginator = await apaginate_pages(request, Asset.objects.order_by('id'))
+        return paginator.get_paginated_response(AssetSerializer(paginator.page, many=True).data).data
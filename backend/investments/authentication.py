@@ -0,0 +1,113 @@
+# authentication.py
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .user_status import user_status_cache
+
+
+class ReadOnlyUserError(TypeError):
+    """Raised on an attempt to save or delete a ClaimsUser"""
+
+
+class ClaimsUser:
+    """
+    A user built from access-token claims and user_status_cache instead of
+    a fetched row (see TokenClaimsAuthentication). Not a model: it has the
+    attributes of AbstractBaseUser that authentication, permissions and the
+    read views use, plus the CustomUser columns they read. It holds only
+    some of the columns, so it refuses to be saved or deleted; filter with
+    ``user_id=user.pk`` rather than ``user=user``.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, pk, username, email, is_active, is_data_admin, data_version, data_updated_at,
+                 is_staff=False, is_superuser=False):
+        self.pk = self.id = pk
+        self.username = username
+        self.email = email
+        self.is_active = is_active
+        self.is_data_admin = is_data_admin
+        self.is_staff = is_staff
+        self.is_superuser = is_superuser
+        self.data_version = data_version
+        self.data_updated_at = data_updated_at
+
+    def __str__(self):
+        return self.username
+
+    def __eq__(self, other):
+        return isinstance(other, ClaimsUser) and self.pk == other.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def get_username(self):
+        return self.username
+
+    def save(self, *args, **kwargs):
+        raise ReadOnlyUserError("ClaimsUser is read-only; load the CustomUser to change it")
+
+    def delete(self, *args, **kwargs):
+        raise ReadOnlyUserError("ClaimsUser is read-only; load the CustomUser to change it")
+
+
+class TokenClaimsAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that, for reads, skips loading the user row: the
+    user is a ClaimsUser built from the token's claims (username, email,
+    is_staff and is_superuser, added by CustomTokenObtainPairSerializer;
+    tokens without them get False) and the few columns kept in
+    user_status_cache, so most GETs cost no user query at all.
+
+    The same checks as JWTAuthentication.get_user() run against the cached
+    status, so a deleted or deactivated user, or a changed password with
+    CHECK_REVOKE_TOKEN, is refused within TOKEN_USER_STATUS_TTL seconds.
+    Writes (and everything when TOKEN_CLAIMS_USER is off) authenticate
+    against a freshly loaded row as before.
+    """
+
+    def authenticate(self, request):
+        if request.method not in SAFE_METHODS or not getattr(settings, 'TOKEN_CLAIMS_USER', True):
+            return super().authenticate(request)
+
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return self.get_claims_user(validated_token), validated_token
+
+    def get_claims_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        status = user_status_cache.get(user_id)
+        if status is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not status['is_active']:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and \
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(status['password']):
+            raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+
+        return ClaimsUser(
+            pk=user_id,
+            username=validated_token.get('username', ''),
+            email=validated_token.get('email', ''),
+            is_active=status['is_active'],
+            # From the row rather than the claim: tokens outlive role changes
+            is_data_admin=status['is_data_admin'],
+            data_version=status['data_version'],
+            data_updated_at=status['data_updated_at'],
+            is_staff=bool(validated_token.get('is_staff', False)),
+            is_superuser=bool(validated_token.get('is_superuser', False)),
+        )
@@ -0,0 +1,84 @@
+# broadcasts.py
+import asyncio
+import time
+
+from .metrics import GROUP_SEND_SECONDS
+
+# Sockets that asked for every tick
+ALL_PRICES_GROUP = "price_updates"
+
+# group_send() calls in flight at once during a fan-out: enough to hide the
+# channel layer's round trips without opening a connection per asset
+GROUP_SEND_CONCURRENCY = 100
+
+
+def asset_group_name(asset_id):
+    """Channel layer group for sockets subscribed to one asset"""
+    return f"price_updates.asset.{asset_id}"
+
+
+def user_group_name(user_id):
+    """Channel layer group for every socket of one signed-in user"""
+    return f"portfolio_updates.user.{user_id}"
+
+
+async def group_send(channel_layer, group, message):
+    """channel_layer.group_send(), timed into GROUP_SEND_SECONDS by message type"""
+    started = time.perf_counter()
+    try:
+        await channel_layer.group_send(group, message)
+    finally:
+        GROUP_SEND_SECONDS.observe(time.perf_counter() - started, type=message["type"])
+
+
+async def group_send_many(channel_layer, messages):
+    """
+    group_send() each ``(group, message)`` pair, GROUP_SEND_CONCURRENCY at a
+    time rather than one round trip after another. The first failure is
+    raised once its batch has finished.
+    """
+    messages = list(messages)
+    for start in range(0, len(messages), GROUP_SEND_CONCURRENCY):
+        await asyncio.gather(*(
+            group_send(channel_layer, group, message)
+            for group, message in messages[start:start + GROUP_SEND_CONCURRENCY]
+        ))
+
+
+async def group_send_price_updates(channel_layer, updates, timestamp):
+    """
+    Fan ``updates`` (dicts with asset_id/new_price) out to each asset's group,
+    and as one combined frame to sockets subscribed to everything. An update
+    may carry its own ``timestamp``, overriding the shared one.
+    """
+    messages = [
+        (asset_group_name(update["asset_id"]), {
+            "type": "price.update",  # This matches the method name in consumer
+            "asset_id": update["asset_id"],
+            "new_price": update["new_price"],
+            "timestamp": update.get("timestamp", timestamp),
+        })
+        for update in updates
+    ]
+    if len(updates) == 1:
+        frame = {"type": "price.update", "timestamp": timestamp, **updates[0]}
+    else:
+        frame = {"type": "price.bulk_update", "updates": updates, "timestamp": timestamp}
+    messages.append((ALL_PRICES_GROUP, frame))
+    await group_send_many(channel_layer, messages)
+
+
+async def group_send_portfolio_updates(channel_layer, holdings_by_user, timestamp):
+    """
+    Send each user the holdings (asset_id/quantity/cost_basis/new_price)
+    they have in assets whose price just changed; their sockets turn that
+    into a portfolio.update frame of new totals.
+    """
+    await group_send_many(channel_layer, (
+        (user_group_name(user_id), {
+            "type": "portfolio.update",
+            "holdings": holdings,
+            "timestamp": timestamp,
+        })
+        for user_id, holdings in holdings_by_user.items()
+    ))
@@ -0,0 +1,177 @@
+# catalog.py
+import hashlib
+import json
+import threading
+import uuid
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.utils.http import parse_etags
+from django.utils.module_loading import import_string
+
+
+class LocMemLRUBackend:
+    """
+    Entries in process memory, evicting the least recently used. Each
+    process keeps its own version, so with several workers an invalidation
+    only reaches the worker that made it; use RedisBackend there.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get_version(self):
+        return self._version
+
+    def add_version(self, version):
+        with self._lock:
+            if self._version is None:
+                self._version = version
+            return self._version
+
+    def set_version(self, version):
+        with self._lock:
+            self._version = version
+            self._entries.clear()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisBackend:
+    """
+    Entries shared by every worker in Redis, as JSON with a TTL so versions
+    nobody asks for any more expire. Redis errors are treated as misses, so
+    the catalog degrades to being built per request rather than failing.
+    """
+
+    def __init__(self, location='redis://localhost:6379/0', key_prefix='asset_catalog', timeout=3600):
+        import redis
+        self._redis = redis
+        self._client = redis.Redis.from_url(location)
+        self.key_prefix = key_prefix
+        self.timeout = timeout
+
+    def _key(self, name):
+        return f'{self.key_prefix}:{name}'
+
+    def get_version(self):
+        try:
+            version = self._client.get(self._key('version'))
+        except self._redis.RedisError:
+            return None
+        return version.decode() if version is not None else None
+
+    def add_version(self, version):
+        try:
+            self._client.set(self._key('version'), version, nx=True)
+        except self._redis.RedisError:
+            return version
+        return self.get_version() or version
+
+    def set_version(self, version):
+        try:
+            self._client.set(self._key('version'), version)
+        except self._redis.RedisError:
+            pass
+
+    def get(self, key):
+        try:
+            value = self._client.get(self._key(key))
+        except self._redis.RedisError:
+            return None
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        try:
+            self._client.set(self._key(key), json.dumps(value), ex=self.timeout)
+        except self._redis.RedisError:
+            pass
+
+
+# What AssetCatalog.lookup() found for a request; data is None on a miss
+# (and on not_modified, which needs no body)
+CatalogEntry = namedtuple('CatalogEntry', ['version', 'variant', 'etag', 'not_modified', 'data'])
+
+
+class AssetCatalog:
+    """
+    Serialized /api/assets/ responses keyed by a catalog version and the
+    query string. Every asset write calls invalidate(), which swaps in a new
+    random version: old entries are never read again and ETags derived from
+    the version stay unique across restarts.
+    """
+
+    def __init__(self):
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            config = getattr(settings, 'ASSET_CATALOG_CACHE', {})
+            backend_class = import_string(config.get('BACKEND', 'investments.catalog.LocMemLRUBackend'))
+            self._backend = backend_class(**config.get('OPTIONS', {}))
+        return self._backend
+
+    def reset(self):
+        """Drop the backend so it's rebuilt from settings on next use"""
+        self._backend = None
+
+    def version(self):
+        version = self.backend.get_version()
+        if version is None:
+            version = self.backend.add_version(uuid.uuid4().hex)
+        return version
+
+    def invalidate(self):
+        self.backend.set_version(uuid.uuid4().hex)
+
+    @staticmethod
+    def _variant_key(version, variant):
+        return hashlib.sha256(f'{version}?{variant}'.encode()).hexdigest()[:32]
+
+    def etag(self, version, variant):
+        return f'"{self._variant_key(version, variant)}"'
+
+    def get(self, version, variant):
+        return self.backend.get(self._variant_key(version, variant))
+
+    def set(self, version, variant, data):
+        self.backend.set(self._variant_key(version, variant), data)
+
+    def lookup(self, request):
+        """
+        The catalog entry for ``request`` (host, path and sorted query
+        string): its ETag, whether If-None-Match already matches it, and the
+        cached data. On a miss, build the data and pass it to store().
+        Shared by AssetViewSet.list and its async variant so they agree.
+        """
+        version = self.version()
+        variant = request.get_host() + request.path + '?' + '&'.join(
+            sorted(request.GET.urlencode().split('&'))
+        )
+        etag = self.etag(version, variant)
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if '*' in if_none_match or etag in if_none_match or f'W/{etag}' in if_none_match:
+            return CatalogEntry(version, variant, etag, True, None)
+        return CatalogEntry(version, variant, etag, False, self.get(version, variant))
+
+    def store(self, entry, data):
+        self.set(entry.version, entry.variant, data)
+
+
+asset_catalog = AssetCatalog()
@@ -1,40 +1,302 @@
 # consumers.py
+import asyncio
 import json
+from collections import Counter
+from decimal import Decimal
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .broadcasts import (
+    ALL_PRICES_GROUP,
+    asset_group_name,
+    group_send_portfolio_updates,
+    group_send_price_updates,
+    user_group_name,
+)
+from .portfolio import PortfolioTotals, holder_updates
+from .prices import parse_price, price_cache, price_write_buffer
+
+# Process-wide tick counters, summed over every connection:
+#   received   - ticks delivered to a consumer by the channel layer
+#   sent       - ticks written to a socket
+#   superseded - ticks replaced by a newer price for the same asset before a flush
+#   dropped    - ticks still buffered when their socket closed
+TICK_STATS = Counter()
 
 
 class PriceUpdatesConsumer(AsyncWebsocketConsumer):
+    """
+    Streams price ticks. Authenticated sockets (``?token=<access token>``)
+    start subscribed to the assets in their own goals and investments,
+    anonymous ones to nothing; ``?all=1`` subscribes to every asset instead.
+    Each (re)subscription is followed by a price.snapshot frame of current
+    prices.
+    Authenticated sockets also get a portfolio.update frame with their new
+    overall totals whenever the price of an asset they hold changes, so
+    overall-goal-stats/ only needs fetching once. Clients change
+    subscriptions with::
+
+        {"type": "subscribe", "asset_ids": [1, 2]}
+        {"type": "unsubscribe", "asset_ids": [2]}
+        {"type": "subscribe", "all": true}
+    """
+
     async def connect(self):
+        self.asset_ids = set()
+        self.all_prices = False
+        # Latest pending tick per asset; flushed as one frame per interval
+        self.flush_interval = getattr(settings, 'PRICE_UPDATES_FLUSH_INTERVAL', 0.1)
+        self.pending_ticks = {}
+        self.flush_task = None
+        self.tick_stats = Counter()
+        # Running totals for the signed-in user; value changes per asset
+        # since the last portfolio.update frame
+        self.user_group = None
+        self.portfolio = None
+        self.pending_value_changes = {}
         await self.accept()
-        await self.channel_layer.group_add("price_updates", self.channel_name)
+
+        user = self.scope.get('user')
+        if user is not None and user.is_authenticated:
+            self.portfolio = await database_sync_to_async(PortfolioTotals.load)(user)
+            self.user_group = user_group_name(user.id)
+            await self.channel_layer.group_add(self.user_group, self.channel_name)
+            await self.subscribe(await self.get_user_asset_ids(user))
+        # The every-asset stream is opt-in: it costs a frame per tick
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        if query.get('all', [''])[0] in ('1', 'true'):
+            await self.subscribe_all()
+        await self.send_subscriptions()
+        await self.send_snapshot(None if self.all_prices else self.asset_ids)
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard("price_updates", self.channel_name)
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        self.count_ticks('dropped', len(self.pending_ticks))
+        self.pending_ticks.clear()
+
+        if self.user_group is not None:
+            await self.channel_layer.group_discard(self.user_group, self.channel_name)
+
+        if self.all_prices:
+            await self.channel_layer.group_discard(ALL_PRICES_GROUP, self.channel_name)
+        else:
+            for asset_id in self.asset_ids:
+                await self.channel_layer.group_discard(asset_group_name(asset_id), self.channel_name)
 
     @database_sync_to_async
-    def update_asset_price(self, asset_id, new_price):
-        from .models import Asset
-        asset = Asset.objects.get(id=asset_id)
-        asset.current_price = new_price
-        asset.save()
-        return asset
+    def get_user_asset_ids(self, user):
+        from .models import InvestmentGoal, Position
+        goal_assets = InvestmentGoal.objects.filter(user=user, asset__isnull=False)\
+            .values_list('asset_id', flat=True)
+        position_assets = Position.objects.filter(user=user).values_list('asset_id', flat=True)
+        return set(goal_assets) | set(position_assets)
+
+    # While subscribed to everything, per-asset groups are left so a tick is
+    # never delivered twice; self.asset_ids is kept and rejoined afterwards.
+    async def subscribe(self, asset_ids):
+        for asset_id in set(asset_ids) - self.asset_ids:
+            if not self.all_prices:
+                await self.channel_layer.group_add(asset_group_name(asset_id), self.channel_name)
+            self.asset_ids.add(asset_id)
+
+    async def unsubscribe(self, asset_ids):
+        for asset_id in set(asset_ids) & self.asset_ids:
+            if not self.all_prices:
+                await self.channel_layer.group_discard(asset_group_name(asset_id), self.channel_name)
+            self.asset_ids.discard(asset_id)
+
+    async def subscribe_all(self):
+        if self.all_prices:
+            return
+        await self.channel_layer.group_add(ALL_PRICES_GROUP, self.channel_name)
+        for asset_id in self.asset_ids:
+            await self.channel_layer.group_discard(asset_group_name(asset_id), self.channel_name)
+        self.all_prices = True
+
+    async def unsubscribe_all(self):
+        if not self.all_prices:
+            return
+        for asset_id in self.asset_ids:
+            await self.channel_layer.group_add(asset_group_name(asset_id), self.channel_name)
+        await self.channel_layer.group_discard(ALL_PRICES_GROUP, self.channel_name)
+        self.all_prices = False
+
+    async def send_subscriptions(self):
+        await self.send(text_data=json.dumps({
+            "type": "subscriptions",
+            "asset_ids": sorted(self.asset_ids),
+            "all": self.all_prices,
+        }))
+
+    async def send_snapshot(self, asset_ids):
+        """
+        Send the current price and version of ``asset_ids`` (every asset if
+        None) so clients don't have to wait for the next tick.
+        """
+        if asset_ids is not None and not asset_ids:
+            return
+        prices = await database_sync_to_async(price_cache.get_many)(asset_ids)
+        await self.send(text_data=json.dumps({
+            "type": "price.snapshot",
+            "prices": [
+                {"asset_id": asset_id, "new_price": price, "version": version}
+                for asset_id, (price, version) in sorted(prices.items())
+            ],
+        }))
 
     async def receive(self, text_data):
-        print("websocket received:", text_data) #debugging
-        data = json.loads(text_data)
-        if data.get('type') == 'price_update' and self.scope['user'].is_data_admin:
-            asset = await self.update_asset_price(data['asset_id'], data['new_price'])
-            await self.channel_layer.group_send(
-                "price_updates",
-                {
-                    "type": "price.update",
-                    "asset_id": asset.id,
-                    "new_price": str(asset.current_price),
-                    "timestamp": str(asset.last_updated)
-                }
-            )
-        print("Broadcasted price update for asset", asset.id)  # Debug
+        try:
+            data = json.loads(text_data)
+        except ValueError:
+            return
+        if not isinstance(data, dict):
+            return
+        message_type = data.get('type')
+
+        if message_type in ('subscribe', 'unsubscribe'):
+            await self.handle_subscription(message_type, data)
+            return
+
+        user = self.scope.get('user')
+        if message_type == 'price_update' and getattr(user, 'is_data_admin', False):
+            await self.handle_price_update(data)
+
+    async def handle_price_update(self, data):
+        """
+        Broadcast an admin tick straight away; the database write is left to
+        the write-behind buffer, which batches the latest price per asset.
+        """
+        price = parse_price(data.get('new_price'))
+        try:
+            asset_id = int(data.get('asset_id'))
+        except (TypeError, ValueError):
+            return
+        if price is None:
+            return
+        known = await database_sync_to_async(price_cache.get_many)([asset_id])
+        if not known:
+            return
+
+        now = timezone.now()
+        price_write_buffer.submit(asset_id, price, now)
+        price_cache.store_price(asset_id, price, now)
+        updates = [{"asset_id": asset_id, "new_price": str(price)}]
+        await group_send_price_updates(self.channel_layer, updates, str(now))
+        await group_send_portfolio_updates(
+            self.channel_layer,
+            await database_sync_to_async(holder_updates)(updates),
+            str(now),
+        )
+
+    async def handle_subscription(self, message_type, data):
+        asset_ids = set()
+        for asset_id in data.get('asset_ids') or []:
+            try:
+                asset_ids.add(int(asset_id))
+            except (TypeError, ValueError):
+                continue
+
+        if message_type == 'subscribe':
+            new_asset_ids = asset_ids - self.asset_ids
+            was_all_prices = self.all_prices
+            await self.subscribe(asset_ids)
+            if data.get('all'):
+                await self.subscribe_all()
+            await self.send_subscriptions()
+            if self.all_prices and not was_all_prices:
+                await self.send_snapshot(None)
+            elif not was_all_prices:
+                await self.send_snapshot(new_asset_ids)
+        else:
+            await self.unsubscribe(asset_ids)
+            if data.get('all'):
+                await self.unsubscribe_all()
+            await self.send_subscriptions()
+
+    def count_ticks(self, name, count=1):
+        self.tick_stats[name] += count
+        TICK_STATS[name] += count
 
     async def price_update(self, event):
-        await self.send(text_data=json.dumps(event))
\ No newline at end of file
+        await self.queue_ticks([{
+            "asset_id": event["asset_id"],
+            "new_price": event["new_price"],
+            "timestamp": event["timestamp"],
+        }])
+
+    async def price_bulk_update(self, event):
+        await self.queue_ticks([
+            {**update, "timestamp": update.get("timestamp", event["timestamp"])}
+            for update in event["updates"]
+        ])
+
+    async def queue_ticks(self, ticks):
+        self.count_ticks('received', len(ticks))
+        for tick in ticks:
+            if tick["asset_id"] in self.pending_ticks:
+                self.count_ticks('superseded')
+            self.pending_ticks[tick["asset_id"]] = tick
+        await self.schedule_flush()
+
+    async def portfolio_update(self, event):
+        if self.portfolio is None:
+            return
+        changes = self.portfolio.apply(
+            (holding["asset_id"], Decimal(holding["quantity"]), Decimal(holding["cost_basis"]),
+             Decimal(holding["new_price"]))
+            for holding in event["holdings"]
+        )
+        if not changes:
+            return
+        for asset_id, change in changes.items():
+            self.pending_value_changes[asset_id] = self.pending_value_changes.get(asset_id, 0) + change
+        await self.schedule_flush()
+
+    async def schedule_flush(self):
+        if not self.flush_interval:
+            await self.flush_ticks()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self.flush_task = None
+        await self.flush_ticks()
+
+    async def flush_ticks(self):
+        """
+        Send everything pending as a single frame, latest price per asset,
+        then the portfolio totals if any held asset moved
+        """
+        if self.pending_ticks:
+            await self.send_ticks()
+        if self.pending_value_changes:
+            await self.send_portfolio()
+
+    async def send_ticks(self):
+        ticks = list(self.pending_ticks.values())
+        self.pending_ticks = {}
+        if len(ticks) == 1:
+            frame = {"type": "price.update", **ticks[0]}
+        else:
+            frame = {"type": "price.bulk_update", "updates": ticks}
+        self.count_ticks('sent', len(ticks))
+        await self.send(text_data=json.dumps(frame))
+
+    async def send_portfolio(self):
+        changes = self.pending_value_changes
+        self.pending_value_changes = {}
+        await self.send(text_data=json.dumps({
+            "type": "portfolio.update",
+            **{name: float(value) for name, value in self.portfolio.as_dict().items()},
+            "value_changes": [
+                {"asset_id": asset_id, "value_change": float(change)}
+                for asset_id, change in sorted(changes.items())
+            ],
+            "last_updated": timezone.now().isoformat(),
+        }))
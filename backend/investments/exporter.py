@@ -0,0 +1,67 @@
+# exporter.py
+import csv
+import json
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# Columns read from the database, in values_list() order
+EXPORT_QUERY_FIELDS = (
+    'id', 'goal_id', 'goal__name', 'goal__investment_type', 'asset_id', 'asset__ticker',
+    'date', 'purchase_price', 'quantity', 'asset__current_price', 'notes',
+)
+# Columns written to the file
+EXPORT_COLUMNS = (
+    'id', 'goal', 'goal_name', 'investment_type', 'asset_id', 'ticker', 'date',
+    'purchase_price', 'quantity', 'total_cost', 'current_price', 'current_value', 'notes',
+)
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(rows):
+    """Turn values_list() tuples into export tuples, adding derived values"""
+    for (investment_id, goal_id, goal_name, investment_type, asset_id, ticker,
+         purchase_date, purchase_price, quantity, current_price, notes) in rows:
+        # Same fallback as MonthlyInvestment.current_value
+        price = current_price if current_price else purchase_price
+        yield (
+            investment_id, goal_id, goal_name, investment_type, asset_id, ticker,
+            purchase_date.isoformat(), purchase_price, quantity, quantity * purchase_price,
+            current_price, quantity * price, notes,
+        )
+
+
+def stream_export(rows, file_format, lines_per_chunk=500):
+    """
+    Yield the export as text chunks of ``lines_per_chunk`` lines each, so the
+    response isn't written one tiny row at a time.
+    """
+    if file_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(EXPORT_COLUMNS)
+        format_row = writer.writerow
+    else:
+        def format_row(row):
+            record = {
+                column: str(value) if value is not None and not isinstance(value, (int, str)) else value
+                for column, value in zip(EXPORT_COLUMNS, row)
+            }
+            return json.dumps(record) + '\n'
+
+    lines = []
+    for row in export_rows(rows):
+        lines.append(format_row(row))
+        if len(lines) >= lines_per_chunk:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
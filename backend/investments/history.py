@@ -0,0 +1,148 @@
+# history.py
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AssetPriceBar, AssetPriceTick, PriceRollupCursor
+
+# Rollup levels, finest first: (interval, truncate a UTC datetime to its bucket)
+ROLLUP_LEVELS = (
+    ('1m', lambda moment: moment.replace(second=0, microsecond=0)),
+    ('1h', lambda moment: moment.replace(minute=0, second=0, microsecond=0)),
+    ('1d', lambda moment: moment.replace(hour=0, minute=0, second=0, microsecond=0)),
+)
+BUCKET_LENGTHS = {
+    '1m': timedelta(minutes=1),
+    '1h': timedelta(hours=1),
+    '1d': timedelta(days=1),
+}
+# Ticks younger than this are left for the next run, so a slower writer
+# committing a lower id can't slip in behind the cursor
+ROLLUP_GRACE = timedelta(seconds=5)
+# Ranges of consecutive buckets read per query when rebuilding an asset's
+# bars: a sparse backfill touches many short runs far apart
+RANGES_PER_QUERY = 100
+# Longest range served from each level when no interval is requested
+AUTO_INTERVAL_SPANS = (
+    ('1m', timedelta(days=1)),
+    ('1h', timedelta(days=60)),
+)
+
+
+def rollup_price_ticks(batch_size=10000):
+    """
+    Fold ticks added since the last run into the minute/hour/day bars.
+
+    Only buckets that received new ticks are rebuilt: minute bars from their
+    ticks, hour bars from their minute bars and day bars from their hour
+    bars, so each batch costs work proportional to the new ticks rather than
+    the history. Returns the number of ticks consumed.
+    """
+    consumed = 0
+    while True:
+        with transaction.atomic():
+            cursor, _ = PriceRollupCursor.objects.select_for_update().get_or_create(name='ticks')
+            ticks = list(
+                AssetPriceTick.objects.filter(id__gt=cursor.last_tick_id)
+                .order_by('id')
+                .values_list('id', 'asset_id', 'timestamp')[:batch_size]
+            )
+            cutoff = timezone.now() - ROLLUP_GRACE
+            for position, (_, _, timestamp) in enumerate(ticks):
+                if timestamp >= cutoff:
+                    ticks = ticks[:position]
+                    break
+            if not ticks:
+                return consumed
+
+            touched = {(asset_id, timestamp) for _, asset_id, timestamp in ticks}
+            for interval, truncate in ROLLUP_LEVELS:
+                buckets = {(asset_id, truncate(moment)) for asset_id, moment in touched}
+                _rebuild_bars(interval, buckets)
+                touched = buckets
+
+            cursor.last_tick_id = ticks[-1][0]
+            cursor.save(update_fields=['last_tick_id'])
+            consumed += len(ticks)
+
+
+def _bucket_ranges(starts, length):
+    """Bucket ``starts`` merged into sorted ``(first, end)`` ranges of consecutive buckets"""
+    ranges = []
+    for start in sorted(starts):
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], start + length)
+        else:
+            ranges.append((start, start + length))
+    return ranges
+
+
+def _rebuild_bars(interval, buckets):
+    """
+    Recompute ``(asset_id, bucket_start)`` bars of ``interval`` from the
+    level below. Only the touched buckets are read, as runs of consecutive
+    ones, so a backfill of a few old buckets doesn't scan everything between.
+    """
+    length = BUCKET_LENGTHS[interval]
+    by_asset = {}
+    for asset_id, start in buckets:
+        by_asset.setdefault(asset_id, set()).add(start)
+
+    bars = []
+    truncate = dict(ROLLUP_LEVELS)[interval]
+    for asset_id, starts in by_asset.items():
+        ranges = _bucket_ranges(starts, length)
+        current = None
+        for offset in range(0, len(ranges), RANGES_PER_QUERY):
+            for moment, open_, high, low, close, count in _finer_rows(
+                interval, asset_id, ranges[offset:offset + RANGES_PER_QUERY],
+            ):
+                start = truncate(moment)
+                if current is None or current.start != start:
+                    current = AssetPriceBar(
+                        asset_id=asset_id, interval=interval, start=start,
+                        open=open_, high=high, low=low, close=close, tick_count=0,
+                    )
+                    bars.append(current)
+                current.high = max(current.high, high)
+                current.low = min(current.low, low)
+                current.close = close
+                current.tick_count += count
+
+    AssetPriceBar.objects.bulk_create(
+        bars,
+        update_conflicts=True,
+        unique_fields=['asset', 'interval', 'start'],
+        update_fields=['open', 'high', 'low', 'close', 'tick_count'],
+        batch_size=500,
+    )
+
+
+def _finer_rows(interval, asset_id, ranges):
+    """``(moment, open, high, low, close, count)`` of the level below ``interval`` within ``ranges``, in order"""
+    if interval == '1m':
+        within = Q()
+        for first, end in ranges:
+            within |= Q(timestamp__gte=first, timestamp__lt=end)
+        rows = AssetPriceTick.objects.filter(within, asset_id=asset_id)\
+            .order_by('timestamp', 'id').values_list('timestamp', 'price', 'price', 'price', 'price')
+        return ((moment, o, h, l, c, 1) for moment, o, h, l, c in rows)
+
+    finer = ROLLUP_LEVELS[[level for level, _ in ROLLUP_LEVELS].index(interval) - 1][0]
+    within = Q()
+    for first, end in ranges:
+        within |= Q(start__gte=first, start__lt=end)
+    return AssetPriceBar.objects.filter(within, asset_id=asset_id, interval=finer)\
+        .order_by('start').values_list('start', 'open', 'high', 'low', 'close', 'tick_count')
+
+
+def pick_interval(start, end):
+    """Finest rollup that keeps a chart of start..end to a couple of thousand points"""
+    if start is None or end is None:
+        return '1d'
+    for interval, longest in AUTO_INTERVAL_SPANS:
+        if end - start <= longest:
+            return interval
+    return '1d'
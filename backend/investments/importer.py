@@ -0,0 +1,196 @@
+# importer.py
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .models import Asset, InvestmentGoal, InvestmentImport, MonthlyInvestment
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def detect_format(filename, requested=None):
+    fmt = (requested or filename.rsplit('.', 1)[-1]).lower()
+    if fmt in ('json', 'ndjson'):
+        fmt = 'jsonl'
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format: {fmt} (expected csv or jsonl)")
+    return fmt
+
+
+def iter_records(stream, fmt):
+    """
+    Yield one dict per record from a text stream without reading it all in.
+    Blank JSONL lines are skipped; malformed ones are yielded as ImportRowError
+    so they count as rejected rows rather than aborting the import.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield ImportRowError('Invalid JSON')
+            continue
+        yield record if isinstance(record, dict) else ImportRowError('Expected a JSON object')
+
+
+def open_text(binary_stream):
+    """Wrap an uploaded/binary file for line-by-line text reading"""
+    return io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+
+
+def parse_decimal(value, max_digits, decimal_places, name):
+    try:
+        number = Decimal(str(value).strip())
+    except (InvalidOperation, ValueError):
+        raise ImportRowError(f'Invalid {name}')
+    if not number.is_finite():
+        raise ImportRowError(f'Invalid {name}')
+    if number.as_tuple().exponent < -decimal_places:
+        raise ImportRowError(f'{name} has more than {decimal_places} decimal places')
+    if abs(number) >= 10 ** (max_digits - decimal_places):
+        raise ImportRowError(f'{name} is too large')
+    return number
+
+
+class InvestmentImporter:
+    """
+    Streams records into MonthlyInvestment rows for one user.
+
+    Tickers and goals are resolved from dictionaries loaded once up front,
+    rows are inserted with MonthlyInvestment.objects.bulk_insert() in chunks
+    of ``chunk_size``, and the
+    InvestmentImport checkpoint is saved in the same transaction as each
+    chunk. Memory use is bounded by the chunk size, not the file size.
+
+    Each record needs ``date``, ``purchase_price``, ``quantity``, a
+    ``ticker`` or ``asset_id``, and a ``goal`` id or ``goal_name`` unless a
+    default goal is given; ``notes`` is optional.
+    """
+    MAX_ERRORS = 100
+
+    def __init__(self, job, default_goal_id=None, chunk_size=5000, progress=None):
+        self.job = job
+        self.default_goal_id = default_goal_id
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.asset_ids_by_ticker = dict(Asset.objects.values_list('ticker', 'id'))
+        self.asset_ids = set(self.asset_ids_by_ticker.values())
+        goals = list(InvestmentGoal.objects.filter(user=job.user).values_list('id', 'name'))
+        self.goal_ids = {goal_id for goal_id, _ in goals}
+        self.goal_ids_by_name = {name: goal_id for goal_id, name in goals}
+        if default_goal_id is not None and default_goal_id not in self.goal_ids:
+            raise ValueError(f"Goal {default_goal_id} does not belong to {job.user}")
+
+    def run(self, records):
+        """
+        Import ``records`` after the job's checkpoint. A file that isn't
+        UTF-8 leaves the job FAILED (with what came before it imported);
+        any other error is re-raised after marking it FAILED.
+        """
+        job = self.job
+        skip = job.rows_processed
+        chunk = []
+        errors = []
+        number = skip
+        try:
+            for number, record in enumerate(records, start=1):
+                if number <= skip:
+                    continue
+                try:
+                    if isinstance(record, ImportRowError):
+                        raise record
+                    chunk.append(self.build(record))
+                except ImportRowError as e:
+                    errors.append({'row': number, 'error': str(e)})
+                if len(chunk) + len(errors) >= self.chunk_size:
+                    self.commit(chunk, errors, number)
+                    chunk, errors = [], []
+            self.commit(chunk, errors, number, status='COMPLETED')
+        except UnicodeDecodeError:
+            # Records are decoded a block ahead, so keep what was read and
+            # stop: the checkpoint lets a re-encoded file resume from here
+            self.commit(chunk, errors, number, status='FAILED')
+            job.errors = (job.errors + [{'row': number + 1, 'error': 'File is not UTF-8 text'}])[:self.MAX_ERRORS]
+            job.save(update_fields=['errors', 'updated_at'])
+        except Exception:
+            job.status = 'FAILED'
+            job.save(update_fields=['status', 'updated_at'])
+            raise
+        return job
+
+    def build(self, record):
+        asset_id = self.resolve_asset(record)
+        goal_id = self.resolve_goal(record)
+        raw_date = record.get('date')
+        try:
+            purchase_date = raw_date if isinstance(raw_date, date) else date.fromisoformat(str(raw_date).strip())
+        except ValueError:
+            raise ImportRowError('Invalid date (expected YYYY-MM-DD)')
+        return (
+            goal_id,
+            asset_id,
+            purchase_date,
+            parse_decimal(record.get('purchase_price'), 10, 0, 'purchase_price'),
+            parse_decimal(record.get('quantity'), 10, 4, 'quantity'),
+            record.get('notes') or None,
+        )
+
+    def resolve_asset(self, record):
+        ticker = record.get('ticker')
+        if ticker:
+            asset_id = self.asset_ids_by_ticker.get(str(ticker).strip())
+            if asset_id is None:
+                raise ImportRowError(f'Unknown ticker: {ticker}')
+            return asset_id
+        try:
+            asset_id = int(record.get('asset_id'))
+        except (TypeError, ValueError):
+            raise ImportRowError('ticker or asset_id is required')
+        if asset_id not in self.asset_ids:
+            raise ImportRowError(f'Unknown asset: {asset_id}')
+        return asset_id
+
+    def resolve_goal(self, record):
+        if record.get('goal_name'):
+            goal_id = self.goal_ids_by_name.get(record['goal_name'])
+            if goal_id is None:
+                raise ImportRowError(f"Unknown goal: {record['goal_name']}")
+            return goal_id
+        if record.get('goal') not in (None, ''):
+            try:
+                goal_id = int(record['goal'])
+            except (TypeError, ValueError):
+                raise ImportRowError('Invalid goal')
+            if goal_id not in self.goal_ids:
+                raise ImportRowError(f'Unknown goal: {goal_id}')
+            return goal_id
+        if self.default_goal_id is None:
+            raise ImportRowError('goal or goal_name is required')
+        return self.default_goal_id
+
+    def commit(self, chunk, errors, processed, status='RUNNING'):
+        job = self.job
+        with transaction.atomic():
+            MonthlyInvestment.objects.bulk_insert(chunk)
+            job.rows_processed = processed
+            job.rows_imported += len(chunk)
+            job.rows_rejected += len(errors)
+            job.errors = (job.errors + errors)[:self.MAX_ERRORS]
+            job.status = status
+            job.save(update_fields=[
+                'rows_processed', 'rows_imported', 'rows_rejected', 'errors', 'status', 'updated_at',
+            ])
+        if self.progress is not None and (chunk or errors):
+            self.progress(job)
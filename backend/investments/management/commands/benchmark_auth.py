@@ -0,0 +1,54 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from investments.serializers import CustomTokenObtainPairSerializer
+from investments.user_status import user_status_cache
+from investments.views import InvestmentGoalViewSet
+
+
+class Command(BaseCommand):
+    help = "Compare queries and time per request of /api/goals/ with row-loading and token-backed authentication"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help="Username whose goals are listed")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per mode")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No such user: {options['user']}")
+
+        # An access token carrying the claims the login endpoint adds
+        token = AccessToken.for_user(user)
+        for claim, value in CustomTokenObtainPairSerializer.get_token(user).payload.items():
+            if claim not in token.payload:
+                token[claim] = value
+        view = InvestmentGoalViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+
+        etag = view(factory.get('/api/goals/', HTTP_AUTHORIZATION=f'Bearer {token}'))['ETag']
+        for label, claims_user in (("user row per request", False), ("token-backed user", True)):
+            for request_label, headers, expected in (
+                ("full", {}, 200),
+                ("revalidated", {'HTTP_IF_NONE_MATCH': etag}, 304),
+            ):
+                user_status_cache.clear()
+                with override_settings(TOKEN_CLAIMS_USER=claims_user), CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    for _ in range(options['requests']):
+                        response = view(factory.get('/api/goals/', HTTP_AUTHORIZATION=f'Bearer {token}', **headers))
+                        if response.status_code != expected:
+                            raise CommandError(f"Request failed with {response.status_code}: {response.data}")
+                        response.render()
+                    elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{label}, {request_label}: {len(queries) / options['requests']:.2f} queries/request, "
+                    f"{elapsed / options['requests'] * 1000:.2f} ms/request"
+                )
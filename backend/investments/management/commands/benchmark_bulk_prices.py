@@ -0,0 +1,83 @@
+import statistics
+import time
+
+from channels.layers import InMemoryChannelLayer
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from investments.models import Asset, InvestmentGoal, MonthlyInvestment
+from investments.outbox import dispatch_price_outbox
+from investments.views import AssetViewSet
+
+
+class Command(BaseCommand):
+    help = ("Time /api/assets/bulk_update_prices/ for a large feed against throwaway assets and "
+            "holders, then its outbox dispatch to an in-memory channel layer (everything is rolled "
+            "back), and fail if the median update exceeds --target")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assets', type=int, default=12000, help="Tickers in the feed")
+        parser.add_argument('--rounds', type=int, default=5, help="Feeds posted, each changing every price")
+        parser.add_argument('--target', type=float, default=1.0, help="Seconds the median feed must stay under")
+        parser.add_argument('--holders', type=int, default=1000, help="Users holding the benchmark assets")
+        parser.add_argument('--holdings', type=int, default=10, help="Assets each holder has bought")
+
+    def handle(self, *args, **options):
+        view = AssetViewSet.as_view({'post': 'bulk_update_prices'})
+        factory = APIRequestFactory()
+        timings = []
+        dispatch_timings = []
+        with transaction.atomic():
+            admin = get_user_model().objects.create_user('benchmark-bulk-prices', is_data_admin=True)
+            assets = Asset.objects.bulk_create([
+                Asset(name=f"Benchmark {n}", ticker=f"BENCH{n}", asset_type='STOCK', current_price=1)
+                for n in range(options['assets'])
+            ])
+            self.seed_holders(assets, options['holders'], options['holdings'])
+            tickers = [f"BENCH{n}" for n in range(options['assets'])]
+            channel_layer = InMemoryChannelLayer()
+            for round_number in range(options['rounds']):
+                prices = [{'ticker': ticker, 'price': f"{2 + round_number}.{n % 100:02d}"}
+                          for n, ticker in enumerate(tickers)]
+                request = factory.post('/api/assets/bulk_update_prices/', {'prices': prices}, format='json')
+                force_authenticate(request, user=admin)
+                started = time.perf_counter()
+                response = view(request)
+                timings.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(f"Update failed with {response.status_code}: {response.data}")
+
+                # Price frames per asset plus a portfolio frame per holder
+                started = time.perf_counter()
+                dispatched = dispatch_price_outbox(batch_size=options['assets'], channel_layer=channel_layer)
+                dispatch_timings.append(time.perf_counter() - started)
+                self.stdout.write(f"Round {round_number + 1}: {response.data['updated']} updated "
+                                  f"in {timings[-1]:.2f}s, {dispatched} dispatched in {dispatch_timings[-1]:.2f}s")
+            transaction.set_rollback(True)
+
+        median = statistics.median(timings)
+        self.stdout.write(f"Median {median:.2f}s for {options['assets']} tickers "
+                          f"({options['assets'] / median:,.0f} tickers/s), "
+                          f"dispatch {statistics.median(dispatch_timings):.2f}s to {options['holders']} holders")
+        if median > options['target']:
+            raise CommandError(f"Median {median:.2f}s exceeds the {options['target']:.2f}s target")
+
+    def seed_holders(self, assets, holders, holdings):
+        """One goal per holder with a purchase of each of ``holdings`` assets, spread over the feed"""
+        User = get_user_model()
+        users = User.objects.bulk_create([
+            User(username=f"benchmark-holder-{n}", password='!') for n in range(holders)
+        ])
+        goals = InvestmentGoal.objects.bulk_create([
+            InvestmentGoal(user=user, name="Benchmark", investment_type='STOCK', target_amount=100000,
+                           years_to_invest=10, monthly_contribution=100)
+            for user in users
+        ])
+        MonthlyInvestment.objects.bulk_create([
+            MonthlyInvestment(goal=goal, asset=assets[(n * holdings + k) % len(assets)], date='2024-01-01',
+                              purchase_price=1, quantity=1)
+            for n, goal in enumerate(goals)
+            for k in range(min(holdings, len(assets)))
+        ])
@@ -0,0 +1,57 @@
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from investments.views import MonthlyInvestmentViewSet
+
+
+class Command(BaseCommand):
+    help = "Measure throughput and peak memory of /api/investments/export/ for one user"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help="Username whose investments are exported")
+        parser.add_argument('--file-format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--filter', action='append', default=[], metavar='NAME=VALUE',
+                            help="Extra MonthlyInvestmentFilter parameter; may be repeated")
+        parser.add_argument('--no-tracemalloc', action='store_true',
+                            help="Skip memory tracing, which slows the export down")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No such user: {options['user']}")
+
+        params = {'file_format': options['file_format']}
+        for item in options['filter']:
+            name, _, value = item.partition('=')
+            params[name] = value
+
+        request = APIRequestFactory().get('/api/investments/export/', params)
+        force_authenticate(request, user=user)
+        view = MonthlyInvestmentViewSet.as_view({'get': 'export'})
+
+        trace = not options['no_tracemalloc']
+        if trace:
+            tracemalloc.start()
+        started = time.perf_counter()
+        response = view(request)
+        if response.status_code != 200:
+            raise CommandError(f"Export failed with {response.status_code}: {response.data}")
+        size = lines = 0
+        for chunk in response.streaming_content:
+            size += len(chunk)
+            lines += chunk.count(b'\n')
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace else None
+        if trace:
+            tracemalloc.stop()
+
+        rows = lines - 1 if options['file_format'] == 'csv' else lines
+        self.stdout.write(f"{rows} rows, {size / 1_000_000:.1f} MB in {elapsed:.2f}s")
+        self.stdout.write(f"{rows / elapsed:,.0f} rows/s, {size / 1_000_000 / elapsed:.1f} MB/s")
+        if peak is not None:
+            self.stdout.write(f"Peak traced memory: {peak / 1_000_000:.1f} MB")
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from investments.outbox import dispatch_price_outbox
+
+
+class Command(BaseCommand):
+    help = "Broadcast queued price changes from the outbox to WebSocket clients"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Outbox rows published per channel layer fan-out")
+        parser.add_argument('--interval', type=float, default=0.2,
+                            help="Seconds to sleep when the outbox is empty")
+        parser.add_argument('--max-backoff', type=float, default=30.0,
+                            help="Longest wait between retries while the channel layer is failing")
+        parser.add_argument('--once', action='store_true',
+                            help="Drain the outbox once and exit")
+
+    def handle(self, *args, **options):
+        backoff = options['interval']
+        while True:
+            try:
+                dispatched = dispatch_price_outbox(options['batch_size'])
+            except Exception as e:
+                self.stderr.write(f"Price broadcast failed, retrying in {backoff:.1f}s: {e}")
+                if options['once']:
+                    raise SystemExit(1)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, options['max_backoff'])
+                continue
+
+            backoff = options['interval']
+            if dispatched:
+                self.stdout.write(f"Dispatched {dispatched} price update(s)")
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from investments.importer import InvestmentImporter, detect_format, iter_records
+from investments.models import InvestmentImport
+
+
+class Command(BaseCommand):
+    help = "Stream historical transactions from a CSV or JSONL file into MonthlyInvestment rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV (with a header row) or JSONL file")
+        parser.add_argument('--user', required=True, help="Username that owns the goals being imported into")
+        parser.add_argument('--goal', type=int, help="Goal id for records without goal/goal_name")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension")
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help="Records per insert transaction and checkpoint")
+        parser.add_argument('--resume', type=int, metavar='IMPORT_ID',
+                            help="Continue an interrupted import from its last checkpoint")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No such user: {options['user']}")
+        try:
+            fmt = detect_format(options['path'], options['format'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['resume']:
+            try:
+                job = InvestmentImport.objects.get(id=options['resume'], user=user)
+            except InvestmentImport.DoesNotExist:
+                raise CommandError(f"No import {options['resume']} for {user}")
+            if job.status == 'COMPLETED':
+                raise CommandError(f"Import {job.id} already completed")
+            self.stdout.write(f"Resuming import {job.id} after row {job.rows_processed}")
+        else:
+            job = InvestmentImport.objects.create(user=user, source=options['path'][-255:])
+            self.stdout.write(f"Started import {job.id}")
+
+        try:
+            importer = InvestmentImporter(job, default_goal_id=options['goal'],
+                                          chunk_size=options['chunk_size'], progress=self.report)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            importer.run(iter_records(stream, fmt))
+        if job.status == 'FAILED':
+            raise CommandError(f"Import {job.id} stopped after row {job.rows_processed}: {job.errors[-1]['error']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Import {job.id} finished: {job.rows_imported} imported, {job.rows_rejected} rejected"
+        ))
+        for error in job.errors[:10]:
+            self.stdout.write(f"  row {error['row']}: {error['error']}")
+
+    def report(self, job):
+        self.stdout.write(
+            f"  {job.rows_processed} rows processed ({job.rows_imported} imported, {job.rows_rejected} rejected)"
+        )
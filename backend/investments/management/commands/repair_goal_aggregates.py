@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from investments.models import InvestmentGoal
+
+
+class Command(BaseCommand):
+    help = "Recompute each goal's stored investment totals and positions, reporting and fixing drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Goals checked per batch")
+        parser.add_argument('--check', action='store_true',
+                            help="Only report drift; exit with status 1 if any is found")
+
+    def handle(self, *args, **options):
+        goals = InvestmentGoal.objects.order_by('pk')
+        batch_size = options['batch_size']
+        drifted = []
+        last_pk = 0
+        while True:
+            batch = list(goals.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1]
+            drifted += InvestmentGoal.objects.filter(pk__in=batch).recompute_aggregates(fix=not options['check'])
+
+        if options['verbosity'] > 1:
+            for goal_id in drifted:
+                self.stdout.write(f"  goal {goal_id}")
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("No drift found"))
+        elif options['check']:
+            raise CommandError(f"{len(drifted)} goal(s) have drifted aggregates")
+        else:
+            self.stdout.write(self.style.WARNING(f"Repaired {len(drifted)} goal(s)"))
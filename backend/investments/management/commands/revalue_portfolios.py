@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from investments.revaluation import revalue_portfolios
+
+
+class Command(BaseCommand):
+    help = "Recompute every goal's and user's invested amount, value, gain and ROI"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help="Users valued per batch")
+        parser.add_argument('--workers', type=int,
+                            help="Worker processes (default: one per CPU for large user sets, else 1)")
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        started = time.perf_counter()
+        totals = revalue_portfolios(
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            progress=self.report,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Revalued {totals['goals']} goals for {totals['users']} users "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
+
+    def report(self, totals):
+        if self.verbosity > 1:
+            self.stdout.write(f"  {totals['users']} users, {totals['goals']} goals")
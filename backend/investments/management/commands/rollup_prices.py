@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from investments.history import rollup_price_ticks
+
+
+class Command(BaseCommand):
+    help = "Roll new asset price ticks up into minute, hour and day OHLC bars"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help="Ticks folded in per transaction")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep running, rolling up new ticks every --interval seconds")
+        parser.add_argument('--interval', type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        while True:
+            consumed = rollup_price_ticks(options['batch_size'])
+            if consumed:
+                self.stdout.write(f"Rolled up {consumed} tick(s)")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,247 @@
+# metrics.py
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Request latency and timing buckets, in seconds
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """
+    Metrics of this process, rendered in the Prometheus text format. Each
+    worker process keeps its own, so scrape every worker (or run one per
+    scrape target) and let Prometheus sum them.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """``collector()`` returns exposition lines, HELP/TYPE included, at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in values]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=TIME_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # Counts per bucket (not cumulative) plus one past the last bound;
+        # summed up at render time so an observation costs one bisect
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        lines = []
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = (('le', _format_value(float(bound))),)
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+# --- HTTP, recorded by middleware.MetricsMiddleware ---
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Time to produce a response, per route', ('route', 'method', 'status'),
+)
+HTTP_REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL queries run per request', ('route', 'method'), buckets=QUERY_COUNT_BUCKETS,
+)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    'http_request_db_duration_seconds', 'Time spent in SQL per request', ('route', 'method'),
+)
+HTTP_REQUEST_SERIALIZER_SECONDS = Histogram(
+    'http_request_serializer_duration_seconds',
+    'Time spent producing the investments serializers\' .data per request (including any queries it runs)',
+    ('route', 'method'),
+)
+
+# --- WebSockets, recorded by middleware.WebSocketMetricsMiddleware and broadcasts ---
+WEBSOCKET_CONNECTIONS = Gauge('websocket_connections', 'Open WebSocket connections', ('route',))
+WEBSOCKET_CONNECTIONS_OPENED = Counter('websocket_connections_opened_total', 'Accepted WebSocket connections', ('route',))
+WEBSOCKET_FRAMES_SENT = Counter('websocket_frames_sent_total', 'Frames sent to WebSocket clients', ('route',))
+WEBSOCKET_FRAMES_RECEIVED = Counter('websocket_frames_received_total', 'Frames received from WebSocket clients', ('route',))
+GROUP_SEND_SECONDS = Histogram(
+    'channel_layer_group_send_duration_seconds', 'Time for one channel layer group_send', ('type',),
+)
+
+
+class RequestStats:
+    """Query and serializer time of the request being handled (see request_stats)"""
+    __slots__ = ('queries', 'db_seconds', 'serializer_seconds', 'serializing')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializing = False
+
+
+# Set by MetricsMiddleware for the duration of a request. A ContextVar
+# rather than a thread-local so queries an async view runs through
+# sync_to_async (another thread, a copy of the context) are still counted
+request_stats = ContextVar('request_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Connection execute wrapper adding each query to the current request's stats"""
+    stats = request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    """connection_created receiver; wrappers live on the connection object, so add it once"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed_serialization():
+    """
+    Adds the time spent in the block to the current request's
+    serializer_seconds (see serializers.TimedDataMixin). Nested blocks,
+    such as a serializer's .data read inside another's, count once.
+    """
+    stats = request_stats.get()
+    if stats is None or stats.serializing:
+        yield
+        return
+    stats.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_seconds += time.perf_counter() - started
+        stats.serializing = False
+
+
+def _tick_stats():
+    from .consumers import TICK_STATS
+    lines = [
+        '# HELP price_ticks_total Price ticks handled by PriceUpdatesConsumer, by outcome',
+        '# TYPE price_ticks_total counter',
+    ]
+    lines += [f'price_ticks_total{{outcome="{_escape(name)}"}} {count}' for name, count in sorted(TICK_STATS.items())]
+    return lines
+
+
+registry.register_collector(_tick_stats)
+
+
+def metrics_enabled():
+    return getattr(settings, 'METRICS_ENABLED', True)
@@ -0,0 +1,143 @@
+# middleware.py
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import metrics
+
+
+@database_sync_to_async
+def get_user_for_token(raw_token):
+    try:
+        token = AccessToken(raw_token)
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return AnonymousUser()
+    user = get_user_model().objects.filter(
+        **{api_settings.USER_ID_FIELD: user_id}, is_active=True
+    ).first()
+    return user or AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Populates scope["user"] for WebSocket connections from a ``?token=``
+    access token, since browsers can't send an Authorization header there.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        query = parse_qs(scope.get("query_string", b"").decode())
+        tokens = query.get("token")
+        scope["user"] = await get_user_for_token(tokens[0]) if tokens else AnonymousUser()
+        return await self.inner(scope, receive, send)
+
+
+class MetricsMiddleware:
+    """
+    Records each request's latency, SQL query count and time, and
+    serializer time under its URL pattern (``api/goals/<pk>/``, not the
+    path, to keep label sets bounded). Put it first in MIDDLEWARE so the
+    latency covers the rest of the stack. Works for sync and async views.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics.metrics_enabled():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = metrics.RequestStats()
+        token = metrics.request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.request_stats.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats = metrics.RequestStats()
+        token = metrics.request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.request_stats.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def record(request, response, stats, elapsed):
+        # The frontend catch-all matches with an empty route
+        match = request.resolver_match
+        route = match.route if match is not None and match.route else '<unmatched>'
+        method = request.method
+        metrics.HTTP_REQUEST_SECONDS.observe(elapsed, route=route, method=method, status=response.status_code)
+        metrics.HTTP_REQUEST_QUERIES.observe(stats.queries, route=route, method=method)
+        metrics.HTTP_REQUEST_DB_SECONDS.observe(stats.db_seconds, route=route, method=method)
+        metrics.HTTP_REQUEST_SERIALIZER_SECONDS.observe(stats.serializer_seconds, route=route, method=method)
+
+
+class WebSocketMetricsMiddleware(BaseMiddleware):
+    """
+    Counts open sockets and the frames going each way, per route of
+    ``routes`` (the patterns given to URLRouter); anything else is
+    labelled ``<unmatched>``.
+    """
+
+    def __init__(self, inner, routes=()):
+        super().__init__(inner)
+        self.routes = routes
+
+    def route_of(self, path):
+        path = path.lstrip('/')
+        for route in self.routes:
+            if route.pattern.match(path):
+                return str(route.pattern)
+        return '<unmatched>'
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'websocket' or not metrics.metrics_enabled():
+            return await self.inner(scope, receive, send)
+        route = self.route_of(scope['path'])
+        accepted = False
+
+        async def counting_receive():
+            message = await receive()
+            if message['type'] == 'websocket.receive':
+                metrics.WEBSOCKET_FRAMES_RECEIVED.inc(route=route)
+            return message
+
+        async def counting_send(message):
+            nonlocal accepted
+            if message['type'] == 'websocket.send':
+                metrics.WEBSOCKET_FRAMES_SENT.inc(route=route)
+            elif message['type'] == 'websocket.accept' and not accepted:
+                accepted = True
+                metrics.WEBSOCKET_CONNECTIONS.inc(route=route)
+                metrics.WEBSOCKET_CONNECTIONS_OPENED.inc(route=route)
+            await send(message)
+
+        try:
+            return await self.inner(scope, counting_receive, counting_send)
+        finally:
+            if accepted:
+                metrics.WEBSOCKET_CONNECTIONS.dec(route=route)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0002_investmentgoal_asset'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='asset',
+            name='last_updated',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
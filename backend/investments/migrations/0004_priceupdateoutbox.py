@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0003_asset_last_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceUpdateOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField()),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='investments.asset')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0006_asset_price_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoalValuation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_invested', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('current_value', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('gain_loss', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('roi', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('investment_count', models.PositiveIntegerField(default=0)),
+                ('valued_at', models.DateTimeField()),
+                ('goal', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='valuation', to='investments.investmentgoal')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='goal_valuations', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserValuation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_invested', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('current_value', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('gain_loss', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('roi', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('investment_count', models.PositiveIntegerField(default=0)),
+                ('valued_at', models.DateTimeField()),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='valuation', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
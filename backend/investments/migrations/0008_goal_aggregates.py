@@ -0,0 +1,72 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_aggregates(apps, schema_editor):
+    InvestmentGoal = apps.get_model('investments', 'InvestmentGoal')
+    MonthlyInvestment = apps.get_model('investments', 'MonthlyInvestment')
+    GoalHolding = apps.get_model('investments', 'GoalHolding')
+    money = DecimalField(max_digits=30, decimal_places=4)
+    per_goal = MonthlyInvestment.objects.filter(goal=OuterRef('pk')).order_by().values('goal')
+    InvestmentGoal.objects.update(
+        total_cost=Coalesce(
+            Subquery(per_goal.annotate(cost=Sum(F('quantity') * F('purchase_price'), output_field=money))
+                     .values('cost')),
+            Value(0, output_field=money),
+        ),
+        investment_count=Coalesce(Subquery(per_goal.annotate(count=Count('pk')).values('count')), 0),
+    )
+    holdings = MonthlyInvestment.objects.filter(asset__isnull=False).order_by().values(
+        'goal_id', 'asset_id',
+    ).annotate(
+        units=Sum('quantity'),
+        cost=Sum(F('quantity') * F('purchase_price'), output_field=money),
+        count=Count('pk'),
+    )
+    GoalHolding.objects.bulk_create(
+        (
+            GoalHolding(goal_id=row['goal_id'], asset_id=row['asset_id'], quantity=row['units'],
+                        cost=row['cost'], investment_count=row['count'])
+            for row in holdings.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0007_valuations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='investmentgoal',
+            name='investment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='investmentgoal',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=24),
+        ),
+        migrations.CreateModel(
+            name='GoalHolding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('cost', models.DecimalField(decimal_places=4, default=0, max_digits=24)),
+                ('investment_count', models.PositiveIntegerField(default=0)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='goal_holdings', to='investments.asset')),
+                ('goal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holdings', to='investments.investmentgoal')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('goal', 'asset'), name='unique_goal_holding')],
+            },
+        ),
+        migrations.RunPython(backfill_aggregates, migrations.RunPython.noop),
+    ]
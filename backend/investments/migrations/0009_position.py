@@ -0,0 +1,63 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_position_users(apps, schema_editor):
+    InvestmentGoal = apps.get_model('investments', 'InvestmentGoal')
+    Position = apps.get_model('investments', 'Position')
+    Position.objects.update(
+        user=Subquery(InvestmentGoal.objects.filter(pk=OuterRef('goal_id')).values('user_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0008_goal_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='goalholding',
+            name='unique_goal_holding',
+        ),
+        migrations.RenameModel(
+            old_name='GoalHolding',
+            new_name='Position',
+        ),
+        migrations.RenameField(
+            model_name='position',
+            old_name='cost',
+            new_name='cost_basis',
+        ),
+        migrations.AlterField(
+            model_name='position',
+            name='goal',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='investments.investmentgoal'),
+        ),
+        migrations.AlterField(
+            model_name='position',
+            name='asset',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='investments.asset'),
+        ),
+        migrations.AddField(
+            model_name='position',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='positions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(copy_position_users, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='position',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='position',
+            constraint=models.UniqueConstraint(fields=('goal', 'asset'), name='unique_position'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0010_user_data_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='monthlyinvestment',
+            index=models.Index(fields=['goal', 'date', 'id'], name='investment_goal_date_id'),
+        ),
+    ]
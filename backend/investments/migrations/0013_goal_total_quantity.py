@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:20
+
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_total_quantity(apps, schema_editor):
+    InvestmentGoal = apps.get_model('investments', 'InvestmentGoal')
+    MonthlyInvestment = apps.get_model('investments', 'MonthlyInvestment')
+    units = DecimalField(max_digits=20, decimal_places=4)
+    per_goal = MonthlyInvestment.objects.filter(goal=OuterRef('pk')).order_by().values('goal')
+    InvestmentGoal.objects.update(
+        total_quantity=Coalesce(
+            Subquery(per_goal.annotate(units=Sum('quantity')).values('units')),
+            Value(0, output_field=units),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0011_investment_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='investmentgoal',
+            name='total_quantity',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=20),
+        ),
+        migrations.RunPython(backfill_total_quantity, migrations.RunPython.noop),
+    ]
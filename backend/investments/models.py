@@ -1,5 +1,13 @@
-from django.db import models
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import models, connections, router, transaction
+from django.db.models import Count, F, Q, Sum, Value, DecimalField
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
+
+from .user_status import user_status_cache
 
 # --- 1. Custom user model ---
 class CustomUser(AbstractUser):
@@ -7,12 +15,146 @@ class CustomUser(AbstractUser):
     Extends default user to add a data admin flag.
     """
     is_data_admin = models.BooleanField(default=False)
+    # Advanced by every write to the user's goals and investments (see
+    # bump_data_versions); their ETag and Last-Modified headers come from
+    # these and the prices of the assets they hold (prices.holdings_prices)
+    data_version = models.PositiveBigIntegerField(default=0)
+    data_updated_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return self.username
 
 
+def insert_rows(queryset, field_names, rows):
+    """
+    INSERT ``rows`` (tuples of values in ``field_names`` order) into the
+    queryset's table with one prepared statement via executemany(), for
+    append-only tables written in bulk, where building a model instance per
+    row for bulk_create() costs more than the insert itself.
+    """
+    if not rows:
+        return 0
+    connection = connections[queryset.db]
+    meta = queryset.model._meta
+    fields = [meta.get_field(name) for name in field_names]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    params = prepare_rows(fields, rows, connection)
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+    return len(params)
+
+
+def prepare_rows(fields, rows, connection):
+    """
+    Each row's values through ``fields``' get_db_prep_save(). Bulk price
+    writes repeat the same timestamp (and often price) on every row, so
+    each distinct value of a column is prepared once.
+    """
+    prepared = [{} for _ in fields]
+    params = []
+    for row in rows:
+        values = []
+        for field, cache, value in zip(fields, prepared, row):
+            try:
+                values.append(cache[value])
+            except KeyError:
+                values.append(cache.setdefault(value, field.get_db_prep_save(value, connection)))
+        params.append(tuple(values))
+    return params
+
+
+def bump_data_versions(user_ids, using=None):
+    """
+    Advance the data version of every user in ``user_ids`` in one UPDATE,
+    and drop just those users from user_status_cache once it commits.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    CustomUser.objects.db_manager(using).filter(pk__in=user_ids).update(
+        data_version=F('data_version') + 1,
+        data_updated_at=timezone.now(),
+    )
+    # Token-backed requests read the version from user_status_cache
+    transaction.on_commit(lambda: user_status_cache.forget(user_ids), using=using)
+
+
+def bump_holder_data_versions(asset_ids, using=None):
+    """
+    Advance the data version of users holding ``asset_ids`` or tracking them
+    on a goal, for writes that change those holdings. Price changes don't
+    call this: their validators follow the prices instead.
+    """
+    bump_data_versions(
+        Position.objects.using(using).filter(asset_id__in=asset_ids).order_by()
+        .values_list('user_id', flat=True)
+        .union(
+            InvestmentGoal.objects.using(using).filter(asset_id__in=asset_ids).order_by()
+            .values_list('user_id', flat=True),
+        ),
+        using=using,
+    )
+
+
+def bump_goal_data_versions(goal_ids, using=None):
+    """Advance the data version of the owners of ``goal_ids``"""
+    bump_data_versions(
+        InvestmentGoal.objects.using(using).filter(pk__in=goal_ids).order_by()
+        .values_list('user_id', flat=True).distinct(),
+        using=using,
+    )
+
+
 # --- 2. Asset model: central list of stocks/mutual funds and their live prices ---
+class AssetQuerySet(models.QuerySet):
+    def bulk_update_prices(self, assets):
+        """
+        Persist current_price/last_updated for many assets (Asset instances
+        or prices.PriceChange tuples) at once.
+
+        QuerySet.bulk_update() builds a CASE per batch, which is quadratic on
+        SQLite; a single prepared UPDATE run through executemany() keeps large
+        price feeds linear.
+        """
+        if not assets:
+            return 0
+        connection = connections[self.db]
+        meta = self.model._meta
+        price_field = meta.get_field('current_price')
+        updated_field = meta.get_field('last_updated')
+        quote = connection.ops.quote_name
+        sql = 'UPDATE {} SET {} = %s, {} = %s WHERE {} = %s'.format(
+            quote(meta.db_table),
+            quote(price_field.column),
+            quote(updated_field.column),
+            quote(meta.pk.column),
+        )
+        params = prepare_rows(
+            (price_field, updated_field, meta.pk),
+            [(asset.current_price, asset.last_updated, asset.id) for asset in assets],
+            connection,
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+        return len(params)
+
+    def delete(self):
+        # Cascading to investments would bypass the goal aggregates, so
+        # remove them through MonthlyInvestmentQuerySet.delete() first
+        with transaction.atomic(using=self.db):
+            bump_holder_data_versions(self.values('pk'), using=self.db)
+            MonthlyInvestment.objects.using(self.db).filter(asset__in=self).delete()
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Asset(models.Model):
     ASSET_TYPE_CHOICES = [
         ('STOCK', 'Stock'),
@@ -23,13 +165,213 @@ class Asset(models.Model):
     ticker = models.CharField(max_length=20, unique=True)     # e.g., "AAPL"
     asset_type = models.CharField(max_length=20, choices=ASSET_TYPE_CHOICES)
     current_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    last_updated = models.DateTimeField(auto_now=True)
+    last_updated = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = AssetQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.name} ({self.ticker})"
 
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            bump_holder_data_versions([self.pk], using=using)
+            MonthlyInvestment.objects.using(using).filter(asset=self).delete()
+            return super().delete(using=using, keep_parents=keep_parents)
+
 
 # --- 3. Investment Goal: tracks user's overall saving or investing goal ---
+def investment_deltas(rows, sign=1, deltas=None):
+    """
+    Sum ``(goal_id, asset_id, quantity, purchase_price)`` rows into
+    ``{(goal_id, asset_id): [quantity, cost, count]}``, the changes to the
+    goal aggregates that adding (sign=1) or removing (sign=-1) them causes.
+    """
+    if deltas is None:
+        deltas = defaultdict(lambda: [Decimal(0), Decimal(0), 0])
+    for goal_id, asset_id, quantity, purchase_price in rows:
+        delta = deltas[goal_id, asset_id]
+        delta[0] += sign * quantity
+        delta[1] += sign * quantity * purchase_price
+        delta[2] += sign
+    return deltas
+
+
+class InvestmentGoalQuerySet(models.QuerySet):
+    def with_portfolio_totals(self):
+        """
+        Annotate each goal with its current value so current_portfolio_value
+        doesn't re-query the goal's positions. Only positions whose asset has
+        a price differ from their cost basis, so the value is the stored
+        total_cost plus their unrealised gains.
+        """
+        money = DecimalField(max_digits=30, decimal_places=6)
+        return self.annotate(
+            annotated_current_portfolio_value=F('total_cost') + Coalesce(
+                Sum(
+                    F('positions__quantity') * F('positions__asset__current_price') - F('positions__cost_basis'),
+                    filter=~Q(positions__asset__current_price=0),
+                    output_field=money,
+                ),
+                Value(0, output_field=money),
+            ),
+        )
+
+    def apply_investment_deltas(self, deltas):
+        """
+        Add investment_deltas() to the stored aggregates: total_cost,
+        total_quantity and investment_count on each goal and one Position
+        row per asset.
+        Increments happen in SQL, so concurrent writers to the same goal
+        can't lose each other's changes.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return
+        connection = connections[self.db]
+        ops = connection.ops
+        quote = ops.quote_name
+
+        goal_meta = self.model._meta
+        cost_field = goal_meta.get_field('total_cost')
+        units_field = goal_meta.get_field('total_quantity')
+        goal_totals = defaultdict(lambda: [Decimal(0), Decimal(0), 0])
+        for (goal_id, _), (quantity, cost, count) in deltas.items():
+            goal_totals[goal_id][0] += cost
+            goal_totals[goal_id][1] += quantity
+            goal_totals[goal_id][2] += count
+        goal_sql = (
+            'UPDATE {table} SET {cost} = {cost} + %s, {units} = {units} + %s, {count} = {count} + %s '
+            'WHERE {pk} = %s'
+        ).format(
+            table=quote(goal_meta.db_table),
+            cost=quote(cost_field.column),
+            units=quote(units_field.column),
+            count=quote(goal_meta.get_field('investment_count').column),
+            pk=quote(goal_meta.pk.column),
+        )
+        goal_params = [
+            (
+                ops.adapt_decimalfield_value(cost, cost_field.max_digits, cost_field.decimal_places),
+                ops.adapt_decimalfield_value(quantity, units_field.max_digits, units_field.decimal_places),
+                count,
+                goal_id,
+            )
+            for goal_id, (cost, quantity, count) in goal_totals.items()
+        ]
+
+        # New positions are upserted with an increment (ON CONFLICT ... DO
+        # UPDATE is shared by SQLite and PostgreSQL, unlike the replace-only
+        # clause bulk_create() builds); changes that don't add investments
+        # only ever touch existing rows, and a negative count in the VALUES
+        # row would fail the column's check constraint
+        position_meta = Position._meta
+        table = quote(position_meta.db_table)
+        columns = [position_meta.get_field(name).column
+                   for name in ('goal', 'asset', 'user', 'quantity', 'cost_basis', 'investment_count')]
+        increments = ', '.join(f'{quote(column)} = {table}.{quote(column)} + %s' for column in columns[3:])
+        upsert_sql = 'INSERT INTO {} ({}) VALUES ({}) ON CONFLICT ({}) DO UPDATE SET {}'.format(
+            table,
+            ', '.join(quote(column) for column in columns),
+            ', '.join(['%s'] * len(columns)),
+            ', '.join(quote(column) for column in columns[:2]),
+            ', '.join(f'{quote(column)} = {table}.{quote(column)} + EXCLUDED.{quote(column)}'
+                      for column in columns[3:]),
+        )
+        update_sql = 'UPDATE {} SET {} WHERE {} = %s AND {} = %s'.format(
+            table, increments, quote(columns[0]), quote(columns[1]),
+        )
+        quantity_field = position_meta.get_field('quantity')
+        goal_users = dict(self.model.objects.using(self.db).filter(
+            pk__in={goal_id for (goal_id, _), (_, _, count) in deltas.items() if count > 0},
+        ).values_list('pk', 'user_id'))
+        upsert_params, update_params = [], []
+        for (goal_id, asset_id), (quantity, cost, count) in deltas.items():
+            if asset_id is None:
+                continue
+            values = (
+                ops.adapt_decimalfield_value(quantity, quantity_field.max_digits, quantity_field.decimal_places),
+                ops.adapt_decimalfield_value(cost, cost_field.max_digits, cost_field.decimal_places),
+                count,
+            )
+            if count > 0:
+                upsert_params.append((goal_id, asset_id, goal_users[goal_id]) + values)
+            else:
+                update_params.append(values + (goal_id, asset_id))
+
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            cursor.executemany(goal_sql, goal_params)
+            if upsert_params:
+                cursor.executemany(upsert_sql, upsert_params)
+            if update_params:
+                cursor.executemany(update_sql, update_params)
+                Position.objects.using(self.db).filter(
+                    goal_id__in=goal_totals, investment_count=0,
+                ).delete()
+
+    def recompute_aggregates(self, fix=True):
+        """
+        Recompute the aggregates of these goals from their investments and
+        return the ids of goals whose stored values had drifted. With fix,
+        drifted goals are rewritten to the recomputed values.
+        """
+        goal_ids = list(self.order_by().values_list('pk', flat=True))
+        if not goal_ids:
+            return []
+        investments = MonthlyInvestment.objects.using(self.db).filter(goal_id__in=goal_ids).order_by()
+        money = DecimalField(max_digits=30, decimal_places=4)
+        quantum = Decimal('0.0001')
+
+        expected_goals = {
+            goal_id: (cost.quantize(quantum), units.quantize(quantum), count)
+            for goal_id, cost, units, count in investments.values('goal_id').annotate(
+                cost=Sum(F('quantity') * F('purchase_price'), output_field=money),
+                units=Sum('quantity'),
+                count=Count('pk'),
+            ).values_list('goal_id', 'cost', 'units', 'count')
+        }
+        expected_positions = defaultdict(dict)
+        for goal_id, asset_id, user_id, quantity, cost, count in investments.filter(asset__isnull=False).values(
+            'goal_id', 'asset_id', 'goal__user_id',
+        ).annotate(
+            units=Sum('quantity'),
+            cost=Sum(F('quantity') * F('purchase_price'), output_field=money),
+            count=Count('pk'),
+        ).values_list('goal_id', 'asset_id', 'goal__user_id', 'units', 'cost', 'count'):
+            expected_positions[goal_id][asset_id] = (user_id, quantity.quantize(quantum), cost.quantize(quantum), count)
+
+        stored_positions = defaultdict(dict)
+        for goal_id, asset_id, user_id, quantity, cost, count in Position.objects.using(self.db).filter(
+            goal_id__in=goal_ids,
+        ).values_list('goal_id', 'asset_id', 'user_id', 'quantity', 'cost_basis', 'investment_count'):
+            stored_positions[goal_id][asset_id] = (user_id, quantity.quantize(quantum), cost.quantize(quantum), count)
+
+        empty = (Decimal(0), Decimal(0), 0)
+        drifted = [
+            goal_id
+            for goal_id, cost, units, count in self.model.objects.using(self.db).filter(
+                pk__in=goal_ids,
+            ).order_by('pk').values_list('pk', 'total_cost', 'total_quantity', 'investment_count')
+            if (cost.quantize(quantum), units.quantize(quantum), count) != expected_goals.get(goal_id, empty)
+            or stored_positions.get(goal_id, {}) != expected_positions.get(goal_id, {})
+        ]
+        if fix and drifted:
+            with transaction.atomic(using=self.db):
+                goals = self.model.objects.using(self.db).in_bulk(drifted)
+                for goal_id, goal in goals.items():
+                    goal.total_cost, goal.total_quantity, goal.investment_count = \
+                        expected_goals.get(goal_id, empty)
+                    goal.save(update_fields=['total_cost', 'total_quantity', 'investment_count'])
+                Position.objects.using(self.db).filter(goal_id__in=drifted).delete()
+                Position.objects.using(self.db).bulk_create([
+                    Position(goal_id=goal_id, asset_id=asset_id, user_id=user_id,
+                             quantity=quantity, cost_basis=cost, investment_count=count)
+                    for goal_id in drifted
+                    for asset_id, (user_id, quantity, cost, count) in expected_positions.get(goal_id, {}).items()
+                ])
+        return drifted
+
+
 class InvestmentGoal(models.Model):
     INVESTMENT_TYPES = [
         ('STOCK', 'Stock'),
@@ -45,36 +387,62 @@ class InvestmentGoal(models.Model):
     monthly_contribution = models.DecimalField(max_digits=10, decimal_places=0)  # e.g., 1000
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Kept in step with the goal's investments by every MonthlyInvestment
+    # write path (InvestmentGoalQuerySet.apply_investment_deltas); the
+    # per-asset units live in Position, while total_quantity also counts
+    # investments without an asset. manage.py repair_goal_aggregates finds
+    # and fixes drift.
+    total_cost = models.DecimalField(max_digits=24, decimal_places=4, default=0)
+    total_quantity = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    investment_count = models.PositiveIntegerField(default=0)
+
+    objects = InvestmentGoalQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.name} ({self.get_investment_type_display()})"
 
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            bump_data_versions([self.user_id], using=using)
+
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            bump_data_versions([self.user_id], using=using)
+            return super().delete(using=using, keep_parents=keep_parents)
+
     @property
     def total_invested(self):
-        return sum(
-            inv.total_cost
-            for inv in self.investments.all()
-            if inv.total_cost is not None
-        )
+        return self.total_cost
 
+    # Prefers the value annotated by with_portfolio_totals() and only falls
+    # back to walking self.positions when the goal was loaded without it.
     @property
     def current_portfolio_value(self):
-        return sum(
-            inv.current_value
-            for inv in self.investments.all()
-            if inv.current_value is not None
+        if hasattr(self, 'annotated_current_portfolio_value'):
+            return self.annotated_current_portfolio_value
+        return self.total_cost + sum(
+            position.quantity * position.asset.current_price - position.cost_basis
+            for position in self.positions.select_related('asset')
+            if position.asset.current_price
         )
 
     @property
     def net_gain_loss(self):
-        if self.current_portfolio_value is None:
+        current_value = self.current_portfolio_value
+        if current_value is None:
             return None
-        return self.current_portfolio_value - self.total_invested
+        return current_value - self.total_invested
 
     @property
     def portfolio_roi(self):
-        if self.net_gain_loss is None or self.total_invested == 0:
+        total_invested = self.total_invested
+        net_gain_loss = self.net_gain_loss
+        if net_gain_loss is None or total_invested == 0:
             return None
-        return (self.net_gain_loss / self.total_invested) * 100
+        return (net_gain_loss / total_invested) * 100
 
     @property
     def progress(self):
@@ -84,6 +452,92 @@ class InvestmentGoal(models.Model):
 
 
 # --- 4. MonthlyInvestment: individual purchases under each goal ---
+class MonthlyInvestmentQuerySet(models.QuerySet):
+    BULK_INSERT_FIELDS = ('goal', 'asset', 'date', 'purchase_price', 'quantity', 'notes')
+
+    def bulk_insert(self, rows):
+        """
+        Insert ``(goal_id, asset_id, date, purchase_price, quantity, notes)``
+        tuples with one prepared INSERT via executemany(). Used by the bulk
+        importer, where building a model instance per row for bulk_create()
+        costs more than the insert itself.
+        """
+        if not rows:
+            return 0
+        connection = connections[self.db]
+        meta = self.model._meta
+        fields = [meta.get_field(name) for name in self.BULK_INSERT_FIELDS]
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(meta.db_table),
+            ', '.join(quote(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)),
+        )
+        ops = connection.ops
+        price_field, quantity_field = fields[3], fields[4]
+        params = [
+            (
+                goal_id,
+                asset_id,
+                ops.adapt_datefield_value(purchase_date),
+                ops.adapt_decimalfield_value(purchase_price, price_field.max_digits, price_field.decimal_places),
+                ops.adapt_decimalfield_value(quantity, quantity_field.max_digits, quantity_field.decimal_places),
+                notes,
+            )
+            for goal_id, asset_id, purchase_date, purchase_price, quantity, notes in rows
+        ]
+        with transaction.atomic(using=self.db):
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+            InvestmentGoal.objects.using(self.db).apply_investment_deltas(investment_deltas(
+                (goal_id, asset_id, Decimal(quantity), Decimal(purchase_price))
+                for goal_id, asset_id, _, purchase_price, quantity, _ in rows
+            ))
+            bump_goal_data_versions({row[0] for row in rows}, using=self.db)
+        return len(params)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            InvestmentGoal.objects.using(self.db).apply_investment_deltas(investment_deltas(
+                obj.aggregate_row() for obj in objs
+            ))
+            bump_goal_data_versions({obj.goal_id for obj in objs}, using=self.db)
+        return created
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            rows = list(self.order_by().values_list(*AGGREGATE_ROW_FIELDS))
+            result = super().delete()
+            InvestmentGoal.objects.using(self.db).apply_investment_deltas(investment_deltas(rows, sign=-1))
+            bump_goal_data_versions({row[0] for row in rows}, using=self.db)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def update(self, **kwargs):
+        with transaction.atomic(using=self.db):
+            goal_ids = set(self.order_by().values_list('goal_id', flat=True).distinct())
+            bump_goal_data_versions(goal_ids, using=self.db)
+            if not set(kwargs) & set(AGGREGATE_ROW_FIELDS + ('goal', 'asset')):
+                return super().update(**kwargs)
+            # Arbitrary expressions can't be turned into deltas, so recompute
+            # the goals the rows belonged to before and after the update
+            pks = list(self.values_list('pk', flat=True))
+            updated = super().update(**kwargs)
+            goal_ids.update(self.model.objects.using(self.db).filter(pk__in=pks).values_list('goal_id', flat=True))
+            InvestmentGoal.objects.using(self.db).filter(pk__in=goal_ids).recompute_aggregates()
+        return updated
+
+    update.alters_data = True
+
+
+# Fields of an investment that feed the goal aggregates, in investment_deltas() order
+AGGREGATE_ROW_FIELDS = ('goal_id', 'asset_id', 'quantity', 'purchase_price')
+
+
 class MonthlyInvestment(models.Model):
     goal = models.ForeignKey(InvestmentGoal, on_delete=models.CASCADE, related_name='investments')
     asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='investments', null=True, blank=True)
@@ -92,10 +546,43 @@ class MonthlyInvestment(models.Model):
     quantity = models.DecimalField(max_digits=10, decimal_places=4)  # Number of units bought
     notes = models.TextField(null=True, blank=True)
 
+    objects = MonthlyInvestmentQuerySet.as_manager()
+
     class Meta:
         ordering = ['-date']
         verbose_name = "Monthly Investment"
         verbose_name_plural = "Monthly Investments"
+        # Keyset pagination (pagination.InvestmentKeysetPagination) walks
+        # a goal's investments in (date, id) order
+        indexes = [models.Index(fields=['goal', 'date', 'id'], name='investment_goal_date_id')]
+
+    def aggregate_row(self):
+        quantity = self._meta.get_field('quantity').to_python(self.quantity)
+        purchase_price = self._meta.get_field('purchase_price').to_python(self.purchase_price)
+        return self.goal_id, self.asset_id, quantity, purchase_price
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            previous = None
+            if self.pk is not None:
+                previous = type(self)._base_manager.using(using).filter(pk=self.pk)\
+                    .values_list(*AGGREGATE_ROW_FIELDS).first()
+            super().save(*args, **kwargs)
+            deltas = investment_deltas([self.aggregate_row()])
+            if previous is not None:
+                investment_deltas([previous], sign=-1, deltas=deltas)
+            InvestmentGoal.objects.using(using).apply_investment_deltas(deltas)
+            bump_goal_data_versions({self.goal_id, previous[0] if previous else self.goal_id}, using=using)
+
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            row = self.aggregate_row()
+            result = super().delete(using=using, keep_parents=keep_parents)
+            InvestmentGoal.objects.using(using).apply_investment_deltas(investment_deltas([row], sign=-1))
+            bump_goal_data_versions([row[0]], using=using)
+        return result
 
     @property
     def total_cost(self):
@@ -127,3 +614,242 @@ class MonthlyInvestment(models.Model):
 
     def __str__(self):
         return f"{self.goal.name} - {self.asset.ticker} - {self.date.strftime('%b %Y')}"
+
+
+# --- 5. PriceUpdateOutbox: price changes waiting to be broadcast ---
+class PriceUpdateOutboxQuerySet(models.QuerySet):
+    def record(self, assets):
+        """
+        Queue a broadcast for each asset's current price. Call inside the
+        transaction that saves the price so the two commit together.
+        """
+        return insert_rows(self, ('asset', 'price', 'created_at', 'attempts', 'last_error'), [
+            (asset.id, asset.current_price, asset.last_updated, 0, '') for asset in assets
+        ])
+
+
+class PriceUpdateOutbox(models.Model):
+    """
+    Transactional outbox for price broadcasts. Rows are written with the
+    Asset update and deleted by the dispatcher (manage.py
+    dispatch_price_outbox) once the channel layer has accepted them, so
+    every change is published at least once.
+    """
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='+')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    objects = PriceUpdateOutboxQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.asset_id} @ {self.price} ({self.created_at})"
+
+
+# --- 6. InvestmentImport: progress and checkpoint of a bulk transaction import ---
+class InvestmentImport(models.Model):
+    """
+    One run of the historical transaction importer. rows_processed is the
+    checkpoint: it is committed with each chunk of inserted investments, so
+    a resumed import skips exactly the records that already landed.
+    """
+    STATUS_CHOICES = [
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='investment_imports')
+    source = models.CharField(max_length=255)  # file name the records came from
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='RUNNING')
+    rows_processed = models.PositiveBigIntegerField(default=0)
+    rows_imported = models.PositiveBigIntegerField(default=0)
+    rows_rejected = models.PositiveBigIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)  # first few rejected rows
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} ({self.get_status_display()}, {self.rows_imported} rows)"
+
+
+# --- 7. Price history: raw ticks and OHLC rollups ---
+class AssetPriceTickQuerySet(models.QuerySet):
+    def record(self, assets):
+        """Append each asset's current price, stamped with its last_updated"""
+        return self.insert((asset.id, asset.current_price, asset.last_updated) for asset in assets)
+
+    def insert(self, ticks):
+        """Append ``(asset_id, price, timestamp)`` ticks"""
+        return insert_rows(self, ('asset', 'price', 'timestamp'), list(ticks))
+
+
+class AssetPriceTick(models.Model):
+    """Every price an asset has had; rolled up into AssetPriceBar by rollup_prices"""
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='price_ticks')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    timestamp = models.DateTimeField()
+
+    objects = AssetPriceTickQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=['asset', 'timestamp'])]
+
+    def __str__(self):
+        return f"{self.asset_id} @ {self.price} ({self.timestamp})"
+
+
+class AssetPriceBar(models.Model):
+    """
+    Open/high/low/close of an asset over one minute, hour or day, keyed by
+    the bucket's start time (UTC).
+    """
+    INTERVAL_CHOICES = [
+        ('1m', 'Minute'),
+        ('1h', 'Hour'),
+        ('1d', 'Day'),
+    ]
+
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='price_bars')
+    interval = models.CharField(max_length=2, choices=INTERVAL_CHOICES)
+    start = models.DateTimeField()
+    open = models.DecimalField(max_digits=10, decimal_places=2)
+    high = models.DecimalField(max_digits=10, decimal_places=2)
+    low = models.DecimalField(max_digits=10, decimal_places=2)
+    close = models.DecimalField(max_digits=10, decimal_places=2)
+    tick_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['asset', 'interval', 'start'], name='unique_asset_price_bar'),
+        ]
+
+    def __str__(self):
+        return f"{self.asset_id} {self.interval} {self.start}"
+
+
+class PriceRollupCursor(models.Model):
+    """Id of the last AssetPriceTick folded into the rollups"""
+    name = models.CharField(max_length=50, unique=True)
+    last_tick_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_tick_id}"
+
+
+# --- 8. Valuations: nightly snapshot of every goal's and user's portfolio ---
+class ValuationQuerySet(models.QuerySet):
+    def upsert(self, key_field, rows):
+        """
+        Insert-or-update ``(key_id, *UPSERT_FIELDS)`` tuples keyed on the
+        unique ``key_field`` with one prepared statement via executemany().
+        bulk_create(update_conflicts=True) builds a model per row, which is
+        most of the cost when every goal is revalued at once.
+        """
+        if not rows:
+            return 0
+        connection = connections[self.db]
+        meta = self.model._meta
+        fields = [meta.get_field(name) for name in (key_field,) + self.model.UPSERT_FIELDS]
+        columns = [field.column for field in fields]
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({}) {}'.format(
+            quote(meta.db_table),
+            ', '.join(quote(column) for column in columns),
+            ', '.join(['%s'] * len(columns)),
+            connection.ops.on_conflict_suffix_sql(
+                fields, models.constants.OnConflict.UPDATE, columns[1:], columns[:1],
+            ),
+        )
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+        return len(rows)
+
+
+class GoalValuation(models.Model):
+    """Written by manage.py revalue_portfolios; one row per goal"""
+    goal = models.OneToOneField(InvestmentGoal, on_delete=models.CASCADE, related_name='valuation')
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='goal_valuations')
+    total_invested = models.DecimalField(max_digits=20, decimal_places=2)
+    current_value = models.DecimalField(max_digits=20, decimal_places=2)
+    gain_loss = models.DecimalField(max_digits=20, decimal_places=2)
+    roi = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    investment_count = models.PositiveIntegerField(default=0)
+    valued_at = models.DateTimeField()
+
+    UPSERT_FIELDS = ('user', 'total_invested', 'current_value', 'gain_loss', 'roi',
+                     'investment_count', 'valued_at')
+
+    objects = ValuationQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.goal_id}: {self.current_value} ({self.valued_at})"
+
+
+class UserValuation(models.Model):
+    """Written by manage.py revalue_portfolios; one row per user with goals"""
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='valuation')
+    total_invested = models.DecimalField(max_digits=20, decimal_places=2)
+    current_value = models.DecimalField(max_digits=20, decimal_places=2)
+    gain_loss = models.DecimalField(max_digits=20, decimal_places=2)
+    roi = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    investment_count = models.PositiveIntegerField(default=0)
+    valued_at = models.DateTimeField()
+
+    UPSERT_FIELDS = ('total_invested', 'current_value', 'gain_loss', 'roi',
+                     'investment_count', 'valued_at')
+
+    objects = ValuationQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.user_id}: {self.current_value} ({self.valued_at})"
+
+
+# --- 9. Position: units and cost basis of each asset held by a goal ---
+class PositionQuerySet(models.QuerySet):
+    def holder_totals(self, asset_ids):
+        """
+        Quantity, cost basis and market value per (user, asset) of the
+        positions in ``asset_ids``: what a price change in those assets does
+        to each holder, read through the asset index rather than every
+        investment.
+        """
+        money = DecimalField(max_digits=30, decimal_places=6)
+        return self.filter(asset_id__in=asset_ids).order_by().values('user_id', 'asset_id').annotate(
+            total_quantity=Sum('quantity'),
+            total_cost_basis=Sum('cost_basis'),
+            market_value=Sum(
+                F('quantity') * F('asset__current_price'),
+                filter=~Q(asset__current_price=0),
+                output_field=money,
+            ),
+        )
+
+
+class Position(models.Model):
+    """
+    Per-asset aggregate of a goal's investments, maintained alongside
+    InvestmentGoal.total_cost. user is copied from the goal so holders of
+    an asset can be found without joining goals. Investments without an
+    asset only count towards the goal totals.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='positions')
+    goal = models.ForeignKey(InvestmentGoal, on_delete=models.CASCADE, related_name='positions')
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='positions')
+    quantity = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    cost_basis = models.DecimalField(max_digits=24, decimal_places=4, default=0)
+    investment_count = models.PositiveIntegerField(default=0)
+
+    objects = PositionQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['goal', 'asset'], name='unique_position'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}/{self.goal_id}: {self.quantity} x {self.asset_id}"
@@ -0,0 +1,50 @@
+# outbox.py
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db.models import F
+from django.utils import timezone
+
+from .broadcasts import group_send_portfolio_updates, group_send_price_updates
+from .models import PriceUpdateOutbox
+from .portfolio import holder_updates
+
+
+def dispatch_price_outbox(batch_size=500, channel_layer=None):
+    """
+    Publish up to ``batch_size`` queued price changes, oldest first, as one
+    fan-out with the latest price per asset, followed by a portfolio update
+    for each user holding a changed asset. Rows are deleted only after the
+    channel layer accepted them; on failure they're kept, their attempts
+    counted, and the error re-raised for the caller to back off.
+
+    Returns the number of outbox rows dispatched.
+    """
+    rows = list(PriceUpdateOutbox.objects.order_by('id')[:batch_size])
+    if not rows:
+        return 0
+
+    latest = {}
+    for row in rows:
+        latest[row.asset_id] = {
+            "asset_id": row.asset_id,
+            "new_price": str(row.price),
+            "timestamp": str(row.created_at),
+        }
+    row_ids = [row.id for row in rows]
+    updates = list(latest.values())
+    holdings_by_user = holder_updates(updates)
+
+    channel_layer = channel_layer or get_channel_layer()
+    timestamp = str(timezone.now())
+    try:
+        async_to_sync(group_send_price_updates)(channel_layer, updates, timestamp)
+        async_to_sync(group_send_portfolio_updates)(channel_layer, holdings_by_user, timestamp)
+    except Exception as e:
+        PriceUpdateOutbox.objects.filter(id__in=row_ids).update(
+            attempts=F('attempts') + 1,
+            last_error=str(e)[:1000],
+        )
+        raise
+
+    PriceUpdateOutbox.objects.filter(id__in=row_ids).delete()
+    return len(row_ids)
@@ -0,0 +1,114 @@
+# pagination.py
+import base64
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+class InvestmentKeysetPagination(BasePagination):
+    """
+    Newest-first pages of investments keyed on (date, id). A cursor holds
+    the (date, id) of the row a page ends at, so the next page is a range
+    read from there: no OFFSET, no COUNT(*), and rows inserted meanwhile
+    can't shift or repeat entries. Opt in with ``?pagination=cursor``;
+    the ``cursor`` in next/previous links keeps the mode.
+    """
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    @classmethod
+    def requested(cls, request):
+        params = request.query_params
+        return params.get(cls.mode_query_param) == 'cursor' or cls.cursor_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, cursor = self.page_queryset(queryset, request)
+        return self.set_page(list(queryset), cursor)
+
+    async def apaginate_queryset(self, queryset, request):
+        """paginate_queryset() for async views: the page is read with the async ORM"""
+        queryset, cursor = self.page_queryset(queryset, request)
+        return self.set_page([row async for row in queryset], cursor)
+
+    def page_queryset(self, queryset, request):
+        """The (unevaluated) query for the requested page, plus the decoded cursor"""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        reverse = cursor is not None and cursor[2]
+        if cursor is not None:
+            day, pk = cursor[0], cursor[1]
+            if reverse:
+                queryset = queryset.filter(Q(date__gt=day) | Q(date=day, id__gt=pk))
+            else:
+                queryset = queryset.filter(Q(date__lt=day) | Q(date=day, id__lt=pk))
+        ordering = ('date', 'id') if reverse else ('-date', '-id')
+        return queryset.order_by(*ordering)[:self.page_size + 1], cursor
+
+    def set_page(self, rows, cursor):
+        reverse = cursor is not None and cursor[2]
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Walking forwards there's a previous page whenever we started from a
+        # cursor; walking backwards there's always a next one
+        self.next_position = self.previous_position = None
+        if rows:
+            if has_more or reverse:
+                self.next_position = (rows[-1].date, rows[-1].pk, False)
+            if (has_more and reverse) or (cursor is not None and not reverse):
+                self.previous_position = (rows[0].date, rows[0].pk, True)
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.encode_cursor(self.next_position),
+            'previous': self.encode_cursor(self.previous_position),
+            'results': data,
+        }
+
+    def get_page_size(self, request):
+        page_size = api_settings.PAGE_SIZE or 25
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return page_size
+        return max(1, min(requested, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            day, pk, direction = base64.urlsafe_b64decode(encoded.encode()).decode().split('|')
+            day, pk = parse_date(day), int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if day is None or direction not in ('n', 'p'):
+            raise NotFound(self.invalid_cursor_message)
+        return day, pk, direction == 'p'
+
+    def encode_cursor(self, position):
+        if position is None:
+            return None
+        day, pk, reverse = position
+        token = base64.urlsafe_b64encode(f"{day.isoformat()}|{pk}|{'p' if reverse else 'n'}".encode()).decode()
+        scheme, netloc, path, query, fragment = urlsplit(self.request.build_absolute_uri())
+        params = [(key, value) for key, value in parse_qsl(query, keep_blank_values=True)
+                  if key not in (self.cursor_query_param, self.mode_query_param)]
+        params.append((self.cursor_query_param, token))
+        return urlunsplit((scheme, netloc, path, urlencode(params), fragment))
@@ -0,0 +1,115 @@
+# portfolio.py
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Sum
+
+from .models import InvestmentGoal, Position
+
+
+class PortfolioTotals:
+    """
+    A user's overall totals (the numbers OverallGoalStats returns), kept as
+    quantity, cost basis and last price per held asset so a price change can
+    be applied as quantity × price change without re-reading anything.
+    """
+
+    def __init__(self, total_target, total_invested, total_units, positions):
+        self.total_target = total_target
+        # Investments without an asset count towards the invested and unit
+        # totals but have no market value
+        self.unallocated_cost = total_invested - sum((cost for _, cost, _ in positions.values()), Decimal(0))
+        self.unallocated_units = total_units - sum((quantity for quantity, _, _ in positions.values()), Decimal(0))
+        # asset_id -> [quantity, cost_basis, price]
+        self.positions = {asset_id: list(position) for asset_id, position in positions.items()}
+
+    GOAL_TOTALS = (Sum('target_amount'), Sum('total_cost'), Sum('total_quantity'))
+
+    @classmethod
+    def load(cls, user):
+        goal_totals = InvestmentGoal.objects.filter(user_id=user.pk).aggregate(*cls.GOAL_TOTALS)
+        return cls._from_rows(goal_totals, cls._position_rows(user))
+
+    @classmethod
+    async def aload(cls, user):
+        """load() for async views, through the async ORM"""
+        goal_totals = await InvestmentGoal.objects.filter(user_id=user.pk).aaggregate(*cls.GOAL_TOTALS)
+        return cls._from_rows(goal_totals, [row async for row in cls._position_rows(user)])
+
+    @staticmethod
+    def _position_rows(user):
+        return Position.objects.filter(user_id=user.pk).order_by().values('asset_id').annotate(
+            units=Sum('quantity'), cost=Sum('cost_basis'),
+        ).values_list('asset_id', 'units', 'cost', 'asset__current_price')
+
+    @classmethod
+    def _from_rows(cls, goal_totals, rows):
+        return cls(
+            goal_totals['target_amount__sum'] or 0,
+            goal_totals['total_cost__sum'] or Decimal(0),
+            goal_totals['total_quantity__sum'] or Decimal(0),
+            {asset_id: (units, cost, price) for asset_id, units, cost, price in rows},
+        )
+
+    @staticmethod
+    def market_value(quantity, price):
+        # Unpriced (zero) assets don't count towards the current value
+        return quantity * price if price else Decimal(0)
+
+    def apply(self, holdings):
+        """
+        Apply ``(asset_id, quantity, cost_basis, new_price)`` for assets whose
+        price changed and return the change in current value per asset.
+        Deltas are taken against the last price applied here, so a repeated
+        update changes nothing.
+        """
+        changes = {}
+        for asset_id, quantity, cost_basis, price in holdings:
+            old_quantity, _, old_price = self.positions.get(asset_id, (Decimal(0), Decimal(0), Decimal(0)))
+            delta = self.market_value(quantity, price) - self.market_value(old_quantity, old_price)
+            self.positions[asset_id] = [quantity, cost_basis, price]
+            if delta:
+                changes[asset_id] = delta
+        return changes
+
+    def as_dict(self):
+        # Zero totals are the integer 0, as the sums over investments this
+        # replaced returned for users with nothing (rendered 0, not 0.0)
+        total_invested = self.unallocated_cost + sum(
+            (cost for _, cost, _ in self.positions.values()), Decimal(0),
+        ) or 0
+        total_units_bought = self.unallocated_units + sum(
+            (quantity for quantity, _, _ in self.positions.values()), Decimal(0),
+        ) or 0
+        total_current_value = sum(
+            (self.market_value(quantity, price) for quantity, _, price in self.positions.values()), Decimal(0),
+        ) or 0
+        total_gain_loss = total_current_value - total_invested
+        return {
+            "total_target": self.total_target,
+            "total_invested": total_invested,
+            "overall_progress": (total_invested / self.total_target * 100) if self.total_target else 0,
+            "total_units_bought": total_units_bought,
+            "total_current_value": total_current_value,
+            "total_gain_loss": total_gain_loss,
+            "total_return": (total_gain_loss / total_invested * 100) if total_invested else 0,
+        }
+
+
+def holder_updates(updates):
+    """
+    For price ``updates`` (dicts with asset_id/new_price), each holder's
+    quantity and cost basis in the changed assets: ``{user_id: [holding]}``
+    ready for group_send_portfolio_updates(). One query over the positions
+    of those assets, however long their purchase history.
+    """
+    prices = {update["asset_id"]: update["new_price"] for update in updates}
+    by_user = defaultdict(list)
+    for holder in Position.objects.holder_totals(prices):
+        by_user[holder['user_id']].append({
+            "asset_id": holder['asset_id'],
+            "quantity": str(holder['total_quantity']),
+            "cost_basis": str(holder['total_cost_basis']),
+            "new_price": prices[holder['asset_id']],
+        })
+    return by_user
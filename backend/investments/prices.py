@@ -0,0 +1,369 @@
+# prices.py
+import asyncio
+import atexit
+import logging
+import sys
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+CENTS = Decimal('0.01')
+_PRICE_LIMIT = Decimal('100000000')  # Asset.current_price has 8 integer digits
+
+
+def parse_price(value):
+    """Return ``value`` as a 2dp Decimal, or None if it isn't a usable price"""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        price = Decimal(str(value)).quantize(CENTS)
+    except (InvalidOperation, ValueError):
+        return None
+    if not price.is_finite() or price < 0 or price >= _PRICE_LIMIT:
+        return None
+    return price
+
+
+# A new price for an asset, in the attributes of Asset that bulk price
+# writes read (Asset.objects.bulk_update_prices(), the outbox and tick
+# records, PriceCache.store()); far cheaper to build than an Asset
+PriceChange = namedtuple('PriceChange', ['id', 'current_price', 'last_updated'])
+
+# Newest and summed price versions of a set of assets (PriceCache.committed_versions())
+HoldingsPrices = namedtuple('HoldingsPrices', ['latest', 'total'])
+
+
+def price_version(last_updated):
+    """Asset.last_updated as integer microseconds; increases with every price write"""
+    return int(last_updated.timestamp() * 1_000_000)
+
+
+class PriceCache:
+    """
+    Process-wide map of asset id -> (price, version) used to answer
+    WebSocket snapshots without scanning the asset table per connection.
+
+    Writers in this process store their changes directly. Everything else
+    (other workers, the admin) is picked up by an incremental refresh of
+    rows whose last_updated moved, at most once every PRICE_CACHE_TTL seconds.
+    last_updated is stamped before a write commits, so a row can commit
+    behind a newer one already read: each refresh re-reads the last
+    PRICE_CACHE_REFRESH_OVERLAP seconds before its high-water mark too.
+
+    Socket ticks are stored before the write-behind buffer commits them, so
+    the versions of committed rows are kept apart (committed_versions())
+    for validators of responses read from the database.
+    """
+
+    def __init__(self):
+        self._prices = {}
+        self._committed = {}  # asset_id -> version of the last committed price
+        self._high_water = None
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def get_many(self, asset_ids=None):
+        """Return {asset_id: (price, version)}, for every asset if ids is None"""
+        self._refresh_if_stale()
+        with self._lock:
+            if asset_ids is None:
+                return dict(self._prices)
+            return {
+                asset_id: self._prices[asset_id]
+                for asset_id in asset_ids
+                if asset_id in self._prices
+            }
+
+    def committed_versions(self, asset_ids):
+        """
+        HoldingsPrices of the committed prices of ``asset_ids``: the newest
+        version, and the sum of all of them, which moves whenever any does,
+        even for a price that committed late with an older version.
+        """
+        self._refresh_if_stale()
+        with self._lock:
+            versions = [self._committed.get(asset_id, 0) for asset_id in asset_ids]
+        return HoldingsPrices(max(versions, default=0), sum(versions))
+
+    def store(self, assets):
+        """Store prices that have been committed"""
+        with self._lock:
+            for asset in assets:
+                self._store(asset.id, asset.current_price, asset.last_updated)
+
+    def store_price(self, asset_id, price, last_updated):
+        """Store a price that has yet to be written"""
+        with self._lock:
+            self._store(asset_id, price, last_updated, committed=False)
+
+    def discard(self, asset_id):
+        with self._lock:
+            self._prices.pop(asset_id, None)
+            self._committed.pop(asset_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._prices = {}
+            self._committed = {}
+            self._high_water = None
+            self._refreshed_at = None
+
+    def _store(self, asset_id, price, last_updated, committed=True):
+        version = price_version(last_updated)
+        current = self._prices.get(asset_id)
+        if current is None or current[1] <= version:
+            self._prices[asset_id] = (str(Decimal(str(price)).quantize(CENTS)), version)
+        if committed and self._committed.get(asset_id, 0) < version:
+            self._committed[asset_id] = version
+
+    def _refresh_if_stale(self):
+        ttl = getattr(settings, 'PRICE_CACHE_TTL', 5)
+        if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < ttl:
+            return
+        from .models import Asset
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < ttl:
+                return
+            rows = Asset.objects.order_by()
+            if self._high_water is not None:
+                overlap = timedelta(seconds=getattr(settings, 'PRICE_CACHE_REFRESH_OVERLAP', 30))
+                rows = rows.filter(last_updated__gte=self._high_water - overlap)
+            for asset_id, price, last_updated in rows.values_list('id', 'current_price', 'last_updated'):
+                self._store(asset_id, price, last_updated)
+                if self._high_water is None or last_updated > self._high_water:
+                    self._high_water = last_updated
+            self._refreshed_at = time.monotonic()
+
+
+price_cache = PriceCache()
+
+
+class HeldAssetsCache:
+    """
+    Ids of the assets in each user's goals and positions, keyed by user id
+    and data_version. Every change to either bumps the version, so entries
+    are never invalidated, they just stop being asked for.
+    """
+
+    def __init__(self):
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            from .catalog import LocMemLRUBackend
+            self._backend = LocMemLRUBackend(max_entries=getattr(settings, 'HELD_ASSETS_CACHE_SIZE', 10000))
+        return self._backend
+
+    def reset(self):
+        self._backend = None
+
+    def get(self, user):
+        key = f'{user.pk}:{user.data_version}'
+        asset_ids = self.backend.get(key)
+        if asset_ids is None:
+            from .models import InvestmentGoal, Position
+            asset_ids = frozenset(
+                Position.objects.filter(user_id=user.pk).order_by().values_list('asset_id', flat=True).union(
+                    InvestmentGoal.objects.filter(user_id=user.pk, asset__isnull=False).order_by()
+                    .values_list('asset_id', flat=True),
+                )
+            )
+            self.backend.set(key, asset_ids)
+        return asset_ids
+
+
+held_assets_cache = HeldAssetsCache()
+
+
+def holdings_prices(user):
+    """
+    HoldingsPrices of the committed prices of the assets ``user`` holds or
+    tracks on a goal. Their goal and investment responses embed those
+    prices, so ``total`` goes into their validators and cache keys next to
+    data_version, which price changes leave alone, and ``latest`` into
+    Last-Modified. Costs no query while held_assets_cache and price_cache
+    are warm.
+    """
+    return price_cache.committed_versions(held_assets_cache.get(user))
+
+
+class PriceWriteBuffer:
+    """
+    Write-behind buffer for price ticks that arrive over the WebSocket.
+
+    submit() returns immediately; the latest price per asset is written with
+    Asset.objects.bulk_update_prices(), and every tick appended to the
+    AssetPriceTick history, once PRICE_WRITE_BEHIND_INTERVAL
+    seconds have passed or PRICE_WRITE_BEHIND_MAX_PENDING assets are waiting.
+    Flushes run one at a time and a failed flush is put back for the next one.
+
+    Pending prices are written on server shutdown: from a "before shutdown"
+    reactor trigger under daphne, from lifespan.shutdown under servers that
+    speak the ASGI lifespan protocol (see flush_price_writes_on_shutdown()),
+    and synchronously at interpreter exit as a last resort. A process that
+    is killed outright (SIGKILL, OOM) loses what was still pending: at most
+    PRICE_WRITE_BEHIND_INTERVAL seconds of ticks, or
+    PRICE_WRITE_BEHIND_MAX_PENDING assets' prices. Those ticks have already
+    been broadcast, so clients saw them, but the Asset rows keep the previous
+    price until the next tick for the asset.
+    """
+
+    def __init__(self):
+        self._pending = {}  # asset_id -> (price, last_updated)
+        self._ticks = []  # every (asset_id, price, timestamp), for the history
+        self._timer = None
+        self._tasks = set()
+        self._flush_lock = None
+        self._loop = None
+        self.stats = {'submitted': 0, 'written': 0, 'superseded': 0, 'failed_flushes': 0}
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+    def submit(self, asset_id, price, last_updated):
+        self._bind_loop()
+        self.stats['submitted'] += 1
+        if asset_id in self._pending:
+            self.stats['superseded'] += 1
+        self._pending[asset_id] = (price, last_updated)
+        self._ticks.append((asset_id, price, last_updated))
+
+        max_pending = getattr(settings, 'PRICE_WRITE_BEHIND_MAX_PENDING', 500)
+        if len(self._pending) >= max_pending:
+            self._schedule(0)
+        else:
+            self._schedule(getattr(settings, 'PRICE_WRITE_BEHIND_INTERVAL', 0.5))
+
+    async def flush(self):
+        """Write everything pending now; safe to call concurrently"""
+        self._bind_loop()
+        async with self._flush_lock:
+            batch, self._pending = self._pending, {}
+            ticks, self._ticks = self._ticks, []
+            if not batch:
+                return 0
+            try:
+                written = await database_sync_to_async(self._write)(batch, ticks)
+            except Exception:
+                self.stats['failed_flushes'] += 1
+                # Newer ticks that arrived during the flush win over the failed batch
+                self._pending = {**batch, **self._pending}
+                self._ticks = ticks + self._ticks
+                logger.exception("Price write-behind flush of %d asset(s) failed; retrying with the next flush",
+                                 len(batch))
+                return 0
+            self.stats['written'] += written
+            return written
+
+    async def close(self):
+        """Stop the timer and write everything still pending"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+
+    def flush_sync(self):
+        """Synchronous flush for shutdown, when no event loop is running"""
+        batch, self._pending = self._pending, {}
+        ticks, self._ticks = self._ticks, []
+        if batch:
+            self.stats['written'] += self._write(batch, ticks)
+
+    def _write(self, batch, ticks):
+        from .catalog import asset_catalog
+        from .models import Asset, AssetPriceTick
+        assets = [
+            PriceChange(asset_id, price, last_updated)
+            for asset_id, (price, last_updated) in batch.items()
+        ]
+        with transaction.atomic():
+            written = Asset.objects.bulk_update_prices(assets)
+            AssetPriceTick.objects.insert(ticks)
+        price_cache.store(assets)
+        asset_catalog.invalidate()
+        return written
+
+    def _schedule(self, delay):
+        if not delay:
+            # Size threshold reached: flush now, leaving any timer in place
+            task = asyncio.ensure_future(self.flush())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.ensure_future(self._flush_later(delay))
+
+    async def _flush_later(self, delay):
+        await asyncio.sleep(delay)
+        self._timer = None
+        await self.flush()
+        # Ticks that arrived during a failed or slow flush get a new timer
+        if self._pending:
+            self._schedule(delay)
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Timers and locks belong to one loop; tests and reloads start new ones
+            self._loop = loop
+            self._flush_lock = asyncio.Lock()
+            self._timer = None
+            self._tasks = set()
+
+
+price_write_buffer = PriceWriteBuffer()
+atexit.register(price_write_buffer.flush_sync)
+
+
+def flush_price_writes_on_shutdown():
+    """
+    Have daphne write price_write_buffer out before it stops. Its reactor
+    runs "before shutdown" triggers on SIGTERM/SIGINT, while the event loop
+    is still up; atexit alone runs too late, if at all. Does nothing when
+    the process isn't running Twisted. Call from asgi.py.
+    """
+    if 'twisted.internet.reactor' not in sys.modules:
+        return
+    from twisted.internet import defer, reactor
+
+    def flush():
+        closed = defer.Deferred.fromFuture(asyncio.ensure_future(price_write_buffer.close()))
+        closed.addErrback(lambda failure: logger.error(
+            "Price write-behind flush on shutdown failed", exc_info=failure.value,
+        ))
+        return closed
+
+    reactor.addSystemEventTrigger('before', 'shutdown', flush)
+
+
+async def lifespan(scope, receive, send):
+    """
+    ASGI lifespan application flushing price_write_buffer on
+    lifespan.shutdown, for servers that speak the protocol (uvicorn,
+    hypercorn; daphne doesn't, see flush_price_writes_on_shutdown())
+    """
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            try:
+                await price_write_buffer.close()
+            except Exception as e:
+                logger.exception("Price write-behind flush on shutdown failed")
+                await send({'type': 'lifespan.shutdown.failed', 'message': str(e)})
+            else:
+                await send({'type': 'lifespan.shutdown.complete'})
+            return
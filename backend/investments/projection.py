@@ -0,0 +1,204 @@
+# projection.py
+import hashlib
+import json
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+
+from .analytics import daily_closes
+from .catalog import LocMemLRUBackend
+from .models import Position
+
+PERCENTILES = (5, 25, 50, 75, 95)
+# Fewer daily closes than this and the estimate is mostly noise; the
+# defaults are used instead
+MIN_HISTORY_CLOSES = 30
+DAYS_PER_YEAR = 365.25
+
+
+def estimate_parameters(asset_weights):
+    """
+    Annualised drift and volatility of log returns for a mix of assets,
+    from their daily closes: ``{asset_id: weight}`` -> ``(mu, sigma)``, or
+    None when no asset has enough history.
+
+    Closes can be days apart (weekends, gaps in the feed), so each asset's
+    rate and variance are taken per elapsed day rather than per close. The
+    mix uses weighted drifts and volatilities, i.e. treats the assets as
+    perfectly correlated, which errs towards wider bands.
+    """
+    closes = daily_closes(list(asset_weights))
+    estimates = []
+    for asset_id, weight in asset_weights.items():
+        if asset_id not in closes or weight <= 0:
+            continue
+        days, values = closes[asset_id]
+        usable = values > 0
+        days, values = days[usable], values[usable]
+        if len(values) < MIN_HISTORY_CLOSES:
+            continue
+        log_returns = np.diff(np.log(values))
+        gaps = np.diff(days).astype(np.float64)
+        rate = log_returns.sum() / gaps.sum()
+        variance = ((log_returns - rate * gaps) ** 2).sum() / gaps.sum()
+        estimates.append((weight, rate * DAYS_PER_YEAR, np.sqrt(variance * DAYS_PER_YEAR)))
+    if not estimates:
+        return None
+
+    weights, drifts, volatilities = (np.array(column) for column in zip(*estimates))
+    weights = weights / weights.sum()
+    # Drift of the log price -> expected annual return of the price
+    sigma = float(weights @ volatilities)
+    mu = float(weights @ drifts) + sigma ** 2 / 2
+    return mu, sigma
+
+
+def goal_asset_weights(goal):
+    """The goal's own asset, else its held assets weighted by cost basis"""
+    if goal.asset_id is not None:
+        return {goal.asset_id: 1.0}
+    return {
+        asset_id: float(cost)
+        for asset_id, cost in Position.objects.filter(goal=goal).values_list('asset_id', 'cost_basis')
+    }
+
+
+def remaining_months(goal, today=None):
+    today = today or date.today()
+    start = goal.created_at.date() if goal.created_at else today
+    elapsed = (today.year - start.year) * 12 + today.month - start.month
+    return max(goal.years_to_invest * 12 - elapsed, 0)
+
+
+def simulate(start_value, monthly_contribution, target, months, mu, sigma, paths, seed):
+    """
+    Monte Carlo of a portfolio topped up by ``monthly_contribution`` at the
+    start of each month and growing by a lognormal monthly return with
+    annual expected return ``mu`` and volatility ``sigma``.
+
+    V(t) = (V(t-1) + c) * g(t) unrolls to P(t) * (V0 + c * sum_{k<t} 1 / P(k))
+    with P the running product of growth, so every path comes out of two
+    cumulative sums over a (paths x months) array instead of a month loop.
+    """
+    if months == 0:
+        return {
+            'probability': float(start_value >= target),
+            'final': dict.fromkeys(PERCENTILES, round(start_value, 2)),
+            'bands': [],
+        }
+
+    # Drawing the normals is most of the cost: draw half and mirror them
+    # (antithetic variates, which also tighten the estimate), in float32,
+    # whose precision is far below the simulation's own noise
+    rng = np.random.default_rng(seed)
+    monthly_drift = (mu - sigma ** 2 / 2) / 12
+    monthly_volatility = sigma / np.sqrt(12)
+    log_growth = np.empty((paths, months), dtype=np.float32)
+    drawn = (paths + 1) // 2
+    rng.standard_normal(out=log_growth[:drawn], dtype=np.float32)
+    np.negative(log_growth[:paths - drawn], out=log_growth[drawn:])
+    log_growth *= monthly_volatility
+    log_growth += monthly_drift
+    np.cumsum(log_growth, axis=1, out=log_growth)
+
+    # 1 / P(k) for k = 0..months-1: the discount of each month's contribution
+    discount = np.empty_like(log_growth)
+    discount[:, 0] = 1.0
+    np.exp(-log_growth[:, :-1], out=discount[:, 1:])
+    np.cumsum(discount, axis=1, out=discount)
+    discount *= monthly_contribution
+    discount += start_value
+    values = np.exp(log_growth, out=log_growth)
+    values *= discount
+
+    # Bands at each year end and at the horizon; the full month grid is
+    # rarely charted and its percentiles would cost more than the simulation
+    checkpoints = sorted(set(range(11, months, 12)) | {months - 1})
+    bands = np.percentile(values[:, checkpoints].astype(np.float64), PERCENTILES, axis=0)
+    final = bands[:, -1]
+    return {
+        'probability': float(np.count_nonzero(values[:, -1] >= target) / paths),
+        'final': dict(zip(PERCENTILES, np.round(final, 2).tolist())),
+        'bands': [
+            {'month': month + 1, **{f'p{p}': value for p, value in zip(PERCENTILES, np.round(band, 2).tolist())}}
+            for month, band in zip(checkpoints, bands.T)
+        ],
+    }
+
+
+class ProjectionCache:
+    """
+    Simulation results keyed by a hash of every input. The generator is
+    seeded from the same hash, so a cached result is exactly what a rerun
+    would return and a miss costs nothing but time.
+    """
+
+    def __init__(self):
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = LocMemLRUBackend(max_entries=getattr(settings, 'PROJECTION_CACHE_SIZE', 256))
+        return self._backend
+
+    def reset(self):
+        self._backend = None
+
+    def run(self, **parameters):
+        key = hashlib.sha256(json.dumps(parameters, sort_keys=True).encode()).hexdigest()
+        result = self.backend.get(key)
+        if result is None:
+            result = simulate(**parameters, seed=int(key[:16], 16))
+            self.backend.set(key, result)
+        return result
+
+
+projection_cache = ProjectionCache()
+
+
+def project_goal(goal, paths, annual_return=None, volatility=None, months=None):
+    """
+    Probability of ``goal`` reaching its target by the end of its term and
+    percentile bands of its value, starting from today's portfolio value.
+    ``annual_return``/``volatility`` override the estimate from price
+    history; what's missing from both comes from the settings defaults.
+    ``months`` defaults to remaining_months(goal); the caller bounds
+    ``paths`` x ``months`` (see PROJECTION_MAX_CELLS).
+    """
+    source = 'supplied'
+    if annual_return is None or volatility is None:
+        estimate = estimate_parameters(goal_asset_weights(goal))
+        if estimate is None:
+            source = 'default'
+            estimate = (settings.PROJECTION_DEFAULT_RETURN, settings.PROJECTION_DEFAULT_VOLATILITY)
+        else:
+            source = 'history' if annual_return is None and volatility is None else 'mixed'
+        annual_return = estimate[0] if annual_return is None else annual_return
+        volatility = estimate[1] if volatility is None else volatility
+
+    start_value = float(goal.current_portfolio_value or 0)
+    months = remaining_months(goal) if months is None else months
+    result = projection_cache.run(
+        start_value=round(start_value, 2),
+        monthly_contribution=float(goal.monthly_contribution),
+        target=float(goal.target_amount),
+        months=months,
+        mu=round(annual_return, 6),
+        sigma=round(volatility, 6),
+        paths=paths,
+    )
+    return {
+        'goal_id': goal.id,
+        'months': months,
+        'paths': paths,
+        'annual_return': round(annual_return, 6),
+        'volatility': round(volatility, 6),
+        'parameter_source': source,
+        'start_value': round(start_value, 2),
+        'target_amount': float(goal.target_amount),
+        'probability_of_reaching_target': result['probability'],
+        'final_value_percentiles': {f'p{p}': value for p, value in result['final'].items()},
+        'bands': result['bands'],
+    }
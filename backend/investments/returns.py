@@ -0,0 +1,261 @@
+# returns.py
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+
+from .analytics import daily_closes
+from .catalog import LocMemLRUBackend
+from .models import Asset, InvestmentGoal, MonthlyInvestment
+from .prices import holdings_prices
+
+DAYS_PER_YEAR = 365.0
+# Bracket of log(1 + rate) searched for the XIRR: -99.99% to +10,000% a year
+XIRR_BRACKET = (np.log1p(-0.9999), np.log1p(100.0))
+XIRR_TOLERANCE = 1e-10
+XIRR_MAX_ITERATIONS = 100
+
+
+def solve_xirr(group, amounts, years_before_end, end_values, groups):
+    """
+    Annual internal rate of return of ``groups`` cash-flow series at once.
+
+    Flow i of series ``group[i]`` is ``amounts[i]`` (negative: money put in)
+    made ``years_before_end[i]`` before the series is valued at
+    ``end_values[g]``. With x = log(1 + rate) the rate solves
+
+        g(x) = end_value + sum_i amount_i * exp(x * years_before_end_i) = 0
+
+    which, when every flow is a purchase, is strictly decreasing, so each
+    series has at most one root inside XIRR_BRACKET. Newton steps run for
+    all series together (np.bincount sums the flows per series); a step
+    that leaves the bracket kept around the root is replaced by bisection,
+    so every series converges whatever its starting point. A series valued
+    at zero lost everything, a rate of -1 that no x reaches; other series
+    without a root in the bracket come back as NaN.
+    """
+    low = np.full(groups, XIRR_BRACKET[0])
+    high = np.full(groups, XIRR_BRACKET[1])
+
+    def evaluate(x):
+        growth = amounts * np.exp(x[group] * years_before_end)
+        value = end_values + np.bincount(group, growth, minlength=groups)
+        slope = np.bincount(group, growth * years_before_end, minlength=groups)
+        return value, slope
+
+    low_value, _ = evaluate(low)
+    high_value, _ = evaluate(high)
+    solvable = (low_value >= 0) & (high_value <= 0) & np.isfinite(low_value) & np.isfinite(high_value)
+
+    x = np.zeros(groups)
+    active = solvable.copy()
+    for _ in range(XIRR_MAX_ITERATIONS):
+        if not active.any():
+            break
+        value, slope = evaluate(x)
+        # Keep [low, high] around the root: g is positive below it
+        above = value > 0
+        low = np.where(active & above, x, low)
+        high = np.where(active & ~above, x, high)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = x - value / slope
+        converged = (np.abs(step - x) < XIRR_TOLERANCE) | (value == 0)
+        bisect = ~np.isfinite(step) | (step < low) | (step > high)
+        step = np.where(bisect & ~converged, (low + high) / 2, step)
+        x = np.where(active, step, x)
+        active &= ~converged
+
+    return np.where(solvable, np.expm1(x), np.where(end_values == 0, -1.0, np.nan))
+
+
+def _series_flows(rows, end_marks):
+    """
+    Purchases and holdings of one series (a goal, or all of a user's goals)
+    from its ``(asset_id, date, quantity, purchase_price)`` rows:
+    ``(days, cash, units, marks, end)`` with one entry per purchase day and
+    one column per asset. ``cash`` is what was invested that day, ``units``
+    what was held after it, ``marks`` each asset's price on the day and
+    ``end`` its price today.
+
+    Investments without an asset can't be revalued, so each is held as
+    ``cost`` units of a pseudo-asset marked at 1.
+    """
+    columns = {}
+    for asset_id, *_ in rows:
+        columns.setdefault(asset_id, len(columns))
+    days = np.unique(np.array([day for _, day, _, _ in rows], dtype='datetime64[D]'))
+    units = np.zeros((len(days), len(columns)))
+    marks = np.full((len(days), len(columns)), np.nan)
+    cash = np.zeros(len(days))
+    for asset_id, day, quantity, price in rows:
+        index = np.searchsorted(days, np.datetime64(day, 'D'))
+        column = columns[asset_id]
+        if asset_id is None:
+            quantity, price = quantity * price, 1.0
+        units[index, column] += quantity
+        marks[index, column] = price
+        cash[index] += quantity * price
+    units = np.cumsum(units, axis=0)
+
+    # Between purchases an asset is marked at its daily close, else at its
+    # latest purchase price (as in portfolio_value_series)
+    for asset_id, column in columns.items():
+        known = ~np.isnan(marks[:, column])
+        last_purchase = np.maximum.accumulate(np.where(known, np.arange(len(days)), 0))
+        # Before its first purchase an asset isn't held; any mark will do
+        marks[:, column] = np.nan_to_num(marks[last_purchase, column])
+        if asset_id in end_marks.closes:
+            close_days, close_values = end_marks.closes[asset_id]
+            close_upto = np.searchsorted(close_days, days, side='right') - 1
+            marks[:, column] = np.where(close_upto >= 0, close_values[np.maximum(close_upto, 0)], marks[:, column])
+
+    # Valued today at the current price, or at average cost when unpriced,
+    # like InvestmentGoal.current_portfolio_value
+    cost = {}
+    for asset_id, _, quantity, price in rows:
+        cost[asset_id] = cost.get(asset_id, 0.0) + quantity * price
+    end = np.array([
+        end_marks.prices.get(asset_id) or (cost[asset_id] / units[-1, column] if units[-1, column] else 0.0)
+        if asset_id is not None else 1.0
+        for asset_id, column in columns.items()
+    ])
+    return days, cash, units, marks, end
+
+
+def _twr(days, units, marks, end, end_day):
+    """
+    Time-weighted return: the growth of each stretch between purchases,
+    chained, so how much was invested when doesn't weigh on the result.
+    """
+    opening = np.einsum('ij,ij->i', units, marks)
+    closing = np.einsum('ij,ij->i', units, np.vstack([marks[1:], end]))
+    if days[-1] >= end_day:
+        closing[-1] = opening[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.where(opening > 0, closing / opening, 1.0)
+    return float(np.prod(growth) - 1)
+
+
+class _EndMarks:
+    def __init__(self, asset_ids):
+        asset_ids = [asset_id for asset_id in asset_ids if asset_id is not None]
+        self.prices = {
+            asset_id: float(price)
+            for asset_id, price in Asset.objects.filter(pk__in=asset_ids).values_list('id', 'current_price')
+            if price
+        }
+        self.closes = daily_closes(asset_ids)
+
+
+def compute_returns(series, today=None):
+    """
+    XIRR and TWR of each series in ``series`` (``{key: rows}``, rows as in
+    _series_flows). All XIRRs are solved in one solve_xirr batch. Returns
+    ``{key: {...}}``; rates a series doesn't define (nothing invested yet,
+    or everything bought today) are None.
+    """
+    today = today or date.today()
+    end_day = np.datetime64(today, 'D')
+    end_marks = _EndMarks({asset_id for rows in series.values() for asset_id, *_ in rows})
+
+    keys, results = [], {}
+    group, amounts, years, end_values = [], [], [], []
+    for key, rows in series.items():
+        if not rows:
+            results[key] = _result(None, None, None, 0.0, 0.0, None)
+            continue
+        days, cash, units, marks, end = _series_flows(rows, end_marks)
+        value = float(units[-1] @ end)
+        held_years = float((end_day - days[0]).astype(np.float64)) / DAYS_PER_YEAR
+        twr = _twr(days, units, marks, end, end_day)
+        results[key] = _result(
+            None, twr, (1 + twr) ** (1 / held_years) - 1 if held_years >= 1 else None,
+            float(cash.sum()), value, days[0],
+        )
+        if held_years > 0:
+            group.extend([len(keys)] * len(days))
+            amounts.extend(-cash)
+            years.extend((end_day - days).astype(np.float64) / DAYS_PER_YEAR)
+            end_values.append(value)
+            keys.append(key)
+
+    if keys:
+        rates = solve_xirr(
+            np.array(group), np.array(amounts), np.array(years), np.array(end_values), len(keys),
+        )
+        for key, rate in zip(keys, rates):
+            results[key]['xirr'] = None if np.isnan(rate) else float(rate)
+    return results
+
+
+def _result(xirr, twr, annualized_twr, invested, value, since):
+    return {
+        'xirr': xirr,
+        'twr': twr,
+        'annualized_twr': annualized_twr,
+        'invested': round(invested, 2),
+        'current_value': round(value, 2),
+        'since': str(since) if since is not None else None,
+    }
+
+
+class ReturnsCache:
+    """
+    Computed returns keyed by goal (or user), the owner's data_version and
+    the committed prices of the assets they hold. Every write that can
+    move a return (an investment, or a price change of a held asset) moves
+    one of those, so entries are never invalidated explicitly, they just
+    stop being asked for. The date is part of the key
+    too since the rates depend on how long money has been invested.
+    """
+
+    def __init__(self):
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = LocMemLRUBackend(max_entries=getattr(settings, 'RETURNS_CACHE_SIZE', 1024))
+        return self._backend
+
+    def reset(self):
+        self._backend = None
+
+    def user_returns(self, user, goal_ids=None):
+        """
+        ``{'goals': {goal_id: returns}, 'portfolio': returns}`` for ``user``'s
+        goals, or only ``goal_ids`` (and no portfolio) when given. Whatever
+        isn't cached is computed in one batch.
+        """
+        today = date.today()
+        prefix = f'{user.pk}:{user.data_version}:{holdings_prices(user).total}:{today.isoformat()}'
+        portfolio_key = f'{prefix}:portfolio' if goal_ids is None else None
+        goal_ids = list(InvestmentGoal.objects.filter(user_id=user.pk).values_list('id', flat=True)) if goal_ids is None else goal_ids
+
+        goals = {goal_id: self.backend.get(f'{prefix}:goal:{goal_id}') for goal_id in goal_ids}
+        portfolio = self.backend.get(portfolio_key) if portfolio_key else None
+        missing = [goal_id for goal_id, cached in goals.items() if cached is None]
+        if missing or (portfolio_key and portfolio is None):
+            rows = MonthlyInvestment.objects.filter(goal__user_id=user.pk, goal_id__in=goal_ids).values_list(
+                'goal_id', 'asset_id', 'date', 'quantity', 'purchase_price',
+            )
+            series = {goal_id: [] for goal_id in missing}
+            portfolio_rows = []
+            for goal_id, asset_id, day, quantity, price in rows:
+                row = (asset_id, day, float(quantity), float(price))
+                if goal_id in series:
+                    series[goal_id].append(row)
+                portfolio_rows.append(row)
+            if portfolio_key:
+                series['portfolio'] = portfolio_rows
+            computed = compute_returns(series, today)
+            for goal_id in missing:
+                goals[goal_id] = computed[goal_id]
+                self.backend.set(f'{prefix}:goal:{goal_id}', computed[goal_id])
+            if portfolio_key:
+                portfolio = computed['portfolio']
+                self.backend.set(portfolio_key, portfolio)
+        return {'goals': goals, 'portfolio': portfolio}
+
+
+returns_cache = ReturnsCache()
@@ -0,0 +1,162 @@
+# revaluation.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from multiprocessing import get_context
+
+import numpy as np
+from django.db import connections
+from django.db.models import FloatField
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from .models import Asset, GoalValuation, InvestmentGoal, MonthlyInvestment, UserValuation
+
+# Below this many users the pool start-up costs more than it saves
+PARALLEL_USER_THRESHOLD = 20000
+
+_worker_prices = None
+
+
+def load_price_table():
+    """Current prices as a float array indexed by asset id (0 where unknown)"""
+    rows = list(Asset.objects.order_by().annotate(price=Cast('current_price', FloatField()))
+                .values_list('id', 'price'))
+    table = np.zeros(max((asset_id for asset_id, _ in rows), default=0) + 1)
+    if rows:
+        ids, prices = zip(*rows)
+        table[list(ids)] = prices
+    return table
+
+
+def value_user_range(first_user_id, last_user_id, prices):
+    """
+    Value every goal of users first_user_id..last_user_id in one pass.
+
+    Investments are read as a float matrix (goal, asset, quantity, price),
+    priced from ``prices`` with the same purchase-price fallback as
+    MonthlyInvestment.current_value, and summed per goal and per user with
+    np.bincount. Returns plain tuples so results can cross processes.
+    """
+    goals = np.array(
+        InvestmentGoal.objects.filter(user_id__gte=first_user_id, user_id__lte=last_user_id)
+        .order_by('id').values_list('id', 'user_id'),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    if not len(goals):
+        return [], []
+
+    rows = MonthlyInvestment.objects.filter(
+        goal__user_id__gte=first_user_id, goal__user_id__lte=last_user_id,
+    ).order_by().annotate(
+        asset_key=Coalesce('asset_id', 0),
+        units=Cast('quantity', FloatField()),
+        unit_cost=Cast('purchase_price', FloatField()),
+    ).values_list('goal_id', 'asset_key', 'units', 'unit_cost')
+    # Every column is already numeric, so run the compiled query directly
+    # and skip the per-row converters values_list() would apply
+    sql, params = rows.query.sql_with_params()
+    with connections[rows.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        investments = np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, 4)
+
+    goal_index = np.searchsorted(goals[:, 0], investments[:, 0].astype(np.int64))
+    asset_ids = investments[:, 1].astype(np.int64)
+    units, unit_cost = investments[:, 2], investments[:, 3]
+    known = asset_ids < len(prices)
+    price = np.where(known, prices[np.where(known, asset_ids, 0)], 0.0)
+    price = np.where(price > 0, price, unit_cost)
+
+    goal_count = len(goals)
+    goal_invested = np.bincount(goal_index, units * unit_cost, minlength=goal_count)
+    goal_value = np.bincount(goal_index, units * price, minlength=goal_count)
+    goal_investments = np.bincount(goal_index, minlength=goal_count)
+
+    users, user_index = np.unique(goals[:, 1], return_inverse=True)
+    user_invested = np.bincount(user_index, goal_invested, minlength=len(users))
+    user_value = np.bincount(user_index, goal_value, minlength=len(users))
+    user_investments = np.bincount(user_index, goal_investments, minlength=len(users))
+
+    goal_rows = list(zip(goals[:, 0].tolist(), goals[:, 1].tolist(), goal_invested.tolist(),
+                         goal_value.tolist(), goal_investments.tolist()))
+    user_rows = list(zip(users.tolist(), user_invested.tolist(), user_value.tolist(),
+                         user_investments.tolist()))
+    return goal_rows, user_rows
+
+
+def _init_worker(prices):
+    # Connections were closed before forking, so each worker opens its own
+    global _worker_prices
+    _worker_prices = prices
+
+
+def _value_in_worker(user_range):
+    return value_user_range(*user_range, _worker_prices)
+
+
+def _money(value):
+    return Decimal(f"{value:.2f}")
+
+
+def _valuation_values(invested, value, count, valued_at):
+    """Values in ValuationQuerySet.upsert order, after the key (and user)"""
+    gain = value - invested
+    roi = _money(gain / invested * 100) if invested else None
+    return (_money(invested), _money(value), _money(gain), roi, count, valued_at)
+
+
+def save_valuations(goal_rows, user_rows, valued_at):
+    """Upsert one chunk of results"""
+    connection = connections[GoalValuation.objects.db]
+    valued_at = connection.ops.adapt_datetimefield_value(valued_at)
+    GoalValuation.objects.upsert('goal', [
+        (goal_id, user_id) + _valuation_values(invested, value, count, valued_at)
+        for goal_id, user_id, invested, value, count in goal_rows
+    ])
+    UserValuation.objects.upsert('user', [
+        (user_id,) + _valuation_values(invested, value, count, valued_at)
+        for user_id, invested, value, count in user_rows
+    ])
+
+
+def user_ranges(chunk_size):
+    """Consecutive (first, last) user id ranges holding chunk_size users with goals each"""
+    user_ids = list(InvestmentGoal.objects.order_by('user_id').values_list('user_id', flat=True).distinct())
+    return [
+        (user_ids[start], user_ids[min(start + chunk_size, len(user_ids)) - 1])
+        for start in range(0, len(user_ids), chunk_size)
+    ], len(user_ids)
+
+
+def revalue_portfolios(chunk_size=2000, workers=None, progress=None):
+    """
+    Recompute GoalValuation and UserValuation for everyone. Chunks of users
+    are valued in worker processes when there are many users (or
+    ``workers`` says so); all writes happen in this process.
+    """
+    valued_at = timezone.now()
+    prices = load_price_table()
+    ranges, user_count = user_ranges(chunk_size)
+    if workers is None:
+        workers = (os.cpu_count() or 1) if user_count >= PARALLEL_USER_THRESHOLD else 1
+    workers = max(1, min(workers, len(ranges)))
+
+    totals = {'users': 0, 'goals': 0}
+
+    def collect(goal_rows, user_rows):
+        save_valuations(goal_rows, user_rows, valued_at)
+        totals['goals'] += len(goal_rows)
+        totals['users'] += len(user_rows)
+        if progress is not None:
+            progress(totals)
+
+    if workers == 1:
+        for first, last in ranges:
+            collect(*value_user_range(first, last, prices))
+    else:
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('fork'),
+                                 initializer=_init_worker, initargs=(prices,)) as pool:
+            for goal_rows, user_rows in pool.map(_value_in_worker, ranges):
+                collect(goal_rows, user_rows)
+    return totals
@@ -1,11 +1,34 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import InvestmentGoal, MonthlyInvestment, Asset
+from .metrics import timed_serialization
+from .models import InvestmentGoal, MonthlyInvestment, Asset, InvestmentImport, Position
 from django.contrib.auth import get_user_model
 
+# --- Serializer time for the request metrics ---
+class TimedDataMixin:
+    """
+    Records the time spent producing ``.data`` as the request's
+    serializer time (metrics.HTTP_REQUEST_SERIALIZER_SECONDS). Nested
+    serializers are reached through to_representation() and are part of
+    their parent's time; ``many=True`` goes through TimedListSerializer,
+    which each serializer names as its Meta.list_serializer_class.
+    """
+
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    pass
+
+
 # --- Asset serializer ---
-class AssetSerializer(serializers.ModelSerializer):
+class AssetSerializer(TimedDataMixin, serializers.ModelSerializer):
     class Meta:
         model = Asset
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'name', 'ticker', 'asset_type', 'current_price', 'last_updated'
         ]
@@ -15,8 +38,16 @@ class AssetSerializer(serializers.ModelSerializer):
         }
 
 
+# --- Per-asset position held by a goal ---
+class PositionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Position
+        fields = ['asset_id', 'quantity', 'cost_basis', 'investment_count']
+        read_only_fields = fields
+
+
 # --- InvestmentGoal serializer ---
-class InvestmentGoalSerializer(serializers.ModelSerializer):
+class InvestmentGoalSerializer(TimedDataMixin, serializers.ModelSerializer):
     total_invested = serializers.DecimalField(
         max_digits=15,
         decimal_places=2,
@@ -41,9 +72,17 @@ class InvestmentGoalSerializer(serializers.ModelSerializer):
         allow_null=True
     )
     progress = serializers.SerializerMethodField(read_only=True)
+    positions = PositionSerializer(many=True, read_only=True)
 
     def get_progress(self, obj):
         return round(obj.progress, 2) if obj.progress is not None else 0
+
+    def validate_years_to_invest(self, value):
+        # Projections simulate every month of the term
+        if value * 12 > settings.PROJECTION_MAX_MONTHS:
+            raise serializers.ValidationError(
+                f"Ensure this value is less than or equal to {settings.PROJECTION_MAX_MONTHS // 12}.")
+        return value
     
     # Include nested Asset info (read-only)
     asset = AssetSerializer(read_only=True)
@@ -57,6 +96,7 @@ class InvestmentGoalSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = InvestmentGoal
+        list_serializer_class = TimedListSerializer
         fields = [
             "id",
             "name",
@@ -71,7 +111,8 @@ class InvestmentGoalSerializer(serializers.ModelSerializer):
             "progress",
             "total_invested",
             "current_portfolio_value",
-            "net_gain_loss"
+            "net_gain_loss",
+            "positions",
             # Exclude 'user' (it's auto-set in the view)
         ]
         extra_kwargs = {
@@ -79,8 +120,46 @@ class InvestmentGoalSerializer(serializers.ModelSerializer):
         }
 
 
+# --- Lightweight goal info nested in each investment ---
+class InvestmentGoalSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = InvestmentGoal
+        fields = ['id', 'name', 'investment_type']
+
+
+# --- Query-param driven field selection ---
+class DynamicFieldsMixin:
+    """
+    Reads ``?expand=`` and ``?fields=`` from the request in the serializer
+    context. Fields named in ``expandable_fields`` are swapped for their
+    heavier serializer when expanded; ``fields`` trims the output of reads.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+
+        for name in parse_field_list(request.query_params.get('expand')):
+            if name in self.expandable_fields:
+                self.fields[name] = self.expandable_fields[name](read_only=True)
+
+        requested = parse_field_list(request.query_params.get('fields'))
+        if requested and request.method == 'GET':
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+
+def parse_field_list(value):
+    if not value:
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
 # --- MonthlyInvestment serializer ---
-class MonthlyInvestmentSerializer(serializers.ModelSerializer):
+class MonthlyInvestmentSerializer(TimedDataMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     total_cost = serializers.DecimalField(
         max_digits=15,
         decimal_places=2,
@@ -106,7 +185,9 @@ class MonthlyInvestmentSerializer(serializers.ModelSerializer):
     # Include nested Asset info
     asset = AssetSerializer(read_only=True)
 
-    goal = InvestmentGoalSerializer(read_only=True)
+    # Only id/name/type by default; use ?expand=goal for the full goal
+    goal = InvestmentGoalSummarySerializer(read_only=True)
+    expandable_fields = {'goal': InvestmentGoalSerializer}
 
     # Optionally, if you POST/PUT, accept asset ID instead of nested asset
     asset_id = serializers.PrimaryKeyRelatedField(
@@ -117,12 +198,25 @@ class MonthlyInvestmentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = MonthlyInvestment
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'goal', 'asset', 'asset_id', 'date', 'purchase_price', 'quantity',
             'notes', 'total_cost', 'current_value', 'gain_loss', 'roi', 'is_profitable'
         ]
 
 
+# --- Bulk import progress ---
+class InvestmentImportSerializer(TimedDataMixin, serializers.ModelSerializer):
+    class Meta:
+        model = InvestmentImport
+        list_serializer_class = TimedListSerializer
+        fields = [
+            'id', 'source', 'status', 'rows_processed', 'rows_imported',
+            'rows_rejected', 'errors', 'created_at', 'updated_at',
+        ]
+        read_only_fields = fields
+
+
 # --- Login / JWT ---
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
@@ -135,6 +229,9 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['username'] = user.username
         token['email'] = user.email
         token['is_data_admin'] = getattr(user, 'is_data_admin', False)
+        # Read requests authenticate a ClaimsUser, which takes these from the token
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
 
         return token
 
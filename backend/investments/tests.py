@@ -1,3 +1,1014 @@
-from django.test import TestCase
+import asyncio
+import base64
+import io
+import json
+import re
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import metrics
+from .authentication import ClaimsUser, ReadOnlyUserError
+from .broadcasts import GROUP_SEND_CONCURRENCY, group_send_portfolio_updates, group_send_price_updates
+from .history import _bucket_ranges, rollup_price_ticks
+from .importer import InvestmentImporter, iter_records
+from .middleware import JWTAuthMiddleware
+from .models import (
+    Asset, AssetPriceBar, AssetPriceTick, CustomUser, InvestmentGoal, InvestmentImport, MonthlyInvestment, Position,
+    PriceRollupCursor, PriceUpdateOutbox,
+)
+from .portfolio import holder_updates
+from .prices import held_assets_cache, price_cache, price_write_buffer
+from .projection import PERCENTILES, simulate
+from .returns import compute_returns, solve_xirr
+from .routing import websocket_urlpatterns
+from .serializers import AssetSerializer, CustomTokenObtainPairSerializer
+from .user_status import user_status_cache
+
+
+class OverallGoalStatsTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('investor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.goal = InvestmentGoal.objects.create(
+            user=self.user, name="Retirement", investment_type='STOCK',
+            target_amount=10000, years_to_invest=10, monthly_contribution=100,
+        )
+
+    def stats(self):
+        response = self.client.get('/api/overall-goal-stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_empty_totals_are_integers(self):
+        response = self.client.get('/api/overall-goal-stats/')
+        body = response.content.decode()
+        for name in ('total_invested', 'total_units_bought', 'total_current_value',
+                     'total_gain_loss', 'total_return'):
+            self.assertIn(f'"{name}":0,', body)
+
+    def test_units_include_investments_without_an_asset(self):
+        asset = Asset.objects.create(name="Asset", ticker="T", asset_type='STOCK', current_price=20)
+        MonthlyInvestment.objects.create(goal=self.goal, asset=asset, date='2024-01-01',
+                                         purchase_price=10, quantity='4.2345')
+        MonthlyInvestment.objects.create(goal=self.goal, asset=None, date='2024-02-01',
+                                         purchase_price=5, quantity='2')
+        stats = self.stats()
+        self.assertEqual(stats['total_units_bought'], 6.2345)
+        self.assertEqual(stats['total_invested'], 52.345)
+        self.assertEqual(stats['total_current_value'], 84.69)
+
+        MonthlyInvestment.objects.filter(asset=None).delete()
+        self.assertEqual(self.stats()['total_units_bought'], 4.2345)
+
+    def test_body_matches_the_per_row_totals(self):
+        assets = [Asset.objects.create(name=ticker, ticker=ticker, asset_type='STOCK', current_price=price)
+                  for ticker, price in (('A', '20.17'), ('B', '3.5'), ('C', 0))]
+        InvestmentGoal.objects.create(user=self.user, name="House", investment_type='STOCK',
+                                      target_amount=2500, years_to_invest=5, monthly_contribution=50)
+        for month, (asset, price, quantity) in enumerate([
+            (assets[0], 10, '4.2345'), (assets[1], 3, '10'), (assets[2], 7, '3'),
+            (None, 5, '2'), (assets[0], 16, '0.3333'),
+        ], start=1):
+            MonthlyInvestment.objects.create(goal=self.goal, asset=asset, date=f'2024-{month:02}-01',
+                                             purchase_price=price, quantity=quantity)
+
+        # What the endpoint computed over model instances before it used aggregates
+        investments = list(MonthlyInvestment.objects.filter(goal__user=self.user).select_related('asset'))
+        total_target = sum(goal.target_amount for goal in InvestmentGoal.objects.filter(user=self.user))
+        total_invested = sum(inv.total_cost for inv in investments if inv.total_cost)
+        total_units_bought = sum(inv.quantity for inv in investments if inv.quantity)
+        total_current_value = sum(inv.quantity * inv.asset.current_price for inv in investments
+                                  if inv.asset and inv.asset.current_price)
+        total_gain_loss = total_current_value - total_invested
+        expected = JSONRenderer().render({
+            "total_target": total_target,
+            "total_invested": total_invested,
+            "overall_progress": total_invested / total_target * 100,
+            "total_units_bought": total_units_bought,
+            "total_current_value": total_current_value,
+            "total_gain_loss": total_gain_loss,
+            "total_return": total_gain_loss / total_invested * 100,
+        })
+
+        body = self.client.get('/api/overall-goal-stats/').content
+        self.assertEqual(re.sub(rb',"last_updated":"[^"]*"', b'', body), expected)
+
+
+@override_settings(PRICE_CACHE_TTL=60)
+class ReadQueryCountTests(TestCase):
+    """The read endpoints run a fixed number of queries however many goals there are"""
+    PATHS = {
+        '/api/goals/': 2,
+        '/api/investments/': 2,
+        '/api/investments/?expand=goal': 4,
+        '/api/overall-goal-stats/': 2,
+    }
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('investor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.assets = [Asset.objects.create(name=ticker, ticker=ticker, asset_type='STOCK', current_price=price)
+                       for ticker, price in (('A', 20), ('B', '3.5'), ('C', 0))]
+
+    def add_goals(self, count):
+        for _ in range(count):
+            number = InvestmentGoal.objects.filter(user=self.user).count()
+            goal = InvestmentGoal.objects.create(
+                user=self.user, name=f"Goal {number}", investment_type='STOCK', target_amount=1000 + number,
+                years_to_invest=10, monthly_contribution=100, asset=self.assets[number % 3],
+            )
+            for month, asset in enumerate(self.assets + [None], start=1):
+                MonthlyInvestment.objects.create(goal=goal, asset=asset, date=f'2024-{month:02}-01',
+                                                 purchase_price='12.34', quantity=f'{number}.5')
+
+    def test_query_count_is_constant(self):
+        for total in (1, 10, 100):
+            self.add_goals(total - InvestmentGoal.objects.filter(user=self.user).count())
+            # The new data_version, and the price map and held assets the
+            # validators read once per process and version
+            self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+            self.client.get('/api/goals/')
+            for path, queries in self.PATHS.items():
+                with self.subTest(goals=total, path=path), self.assertNumQueries(queries):
+                    self.assertEqual(self.client.get(path).status_code, 200)
+
+
+class GoalAggregateTests(TestCase):
+    """Every write path keeps the stored goal totals and positions equal to a recompute"""
+
+    def setUp(self):
+        user = CustomUser.objects.create_user('investor')
+        self.a, self.b = (Asset.objects.create(name=ticker, ticker=ticker, asset_type='STOCK', current_price=10)
+                          for ticker in ('A', 'B'))
+        self.goal, self.other = (InvestmentGoal.objects.create(user=user, name=name, investment_type='STOCK',
+                                                               target_amount=1000, years_to_invest=1,
+                                                               monthly_contribution=1)
+                                 for name in ("Goal", "Other"))
+
+    def assertNoDrift(self):
+        self.assertEqual(InvestmentGoal.objects.recompute_aggregates(fix=False), [])
+
+    def invest(self, goal, asset, price, quantity, day='2024-01-01'):
+        return MonthlyInvestment.objects.create(goal=goal, asset=asset, date=day,
+                                                purchase_price=price, quantity=quantity)
+
+    def test_instance_writes(self):
+        first = self.invest(self.goal, self.a, 10, '1.5')
+        self.invest(self.goal, None, 7, 3)
+        self.assertNoDrift()
+        self.goal.refresh_from_db()
+        self.assertEqual((self.goal.total_cost, self.goal.total_quantity, self.goal.investment_count),
+                         (Decimal('36'), Decimal('4.5'), 2))
+        self.assertEqual(list(Position.objects.values_list('goal', 'asset', 'quantity')),
+                         [(self.goal.id, self.a.id, Decimal('1.5'))])
+
+        first.quantity, first.purchase_price = '2.25', 12
+        first.save()
+        self.assertNoDrift()
+        # Moved to another goal and asset: the old position goes
+        first.goal, first.asset = self.other, self.b
+        first.save()
+        self.assertNoDrift()
+        self.assertEqual(list(Position.objects.values_list('goal', 'asset')), [(self.other.id, self.b.id)])
+        first.delete()
+        self.assertNoDrift()
+        self.assertFalse(Position.objects.exists())
+
+    def test_bulk_writes(self):
+        MonthlyInvestment.objects.bulk_create([
+            MonthlyInvestment(goal=goal, asset=asset, date='2024-01-01', purchase_price=price, quantity=quantity)
+            for goal, asset, price, quantity in ((self.goal, self.a, 10, 1), (self.goal, self.a, 11, '0.5'),
+                                                 (self.goal, self.b, 5, 2), (self.other, None, 3, 4))
+        ])
+        self.assertNoDrift()
+        MonthlyInvestment.objects.bulk_insert([(self.other.id, self.a.id, date(2024, 2, 1), 9, Decimal('1.25'), '')])
+        self.assertNoDrift()
+
+        MonthlyInvestment.objects.filter(asset=self.a).update(quantity=F('quantity') * 2)
+        self.assertNoDrift()
+        MonthlyInvestment.objects.filter(asset=self.b).update(goal=self.other, asset=self.a)
+        self.assertNoDrift()
+        MonthlyInvestment.objects.filter(goal=self.goal).update(notes="untouched totals")
+        self.assertNoDrift()
+        MonthlyInvestment.objects.filter(asset=self.a, goal=self.goal).delete()
+        self.assertNoDrift()
+        self.assertEqual(Position.objects.filter(goal=self.goal).count(), 0)
+        self.assertEqual(InvestmentGoal.objects.get(pk=self.other.pk).investment_count, 3)
+
+    def test_repair_command_fixes_drift(self):
+        self.invest(self.goal, self.a, 10, 2)
+        self.invest(self.other, self.b, 5, 1)
+        InvestmentGoal.objects.filter(pk=self.goal.pk).update(total_cost=1)
+        Position.objects.filter(goal=self.other).delete()
+        self.assertEqual(InvestmentGoal.objects.recompute_aggregates(fix=False), [self.goal.id, self.other.id])
+
+        with self.assertRaises(CommandError):
+            call_command('repair_goal_aggregates', '--check', stdout=io.StringIO())
+        call_command('repair_goal_aggregates', '--batch-size', '1', stdout=io.StringIO())
+        self.assertNoDrift()
+        self.assertEqual(InvestmentGoal.objects.get(pk=self.goal.pk).total_cost, Decimal('20'))
+        call_command('repair_goal_aggregates', '--check', stdout=io.StringIO())
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('investor')
+        goal = InvestmentGoal.objects.create(user=self.user, name="Goal", investment_type='STOCK',
+                                             target_amount=1000, years_to_invest=1, monthly_contribution=1)
+        # 29 rows over 6 dates, so pages end in the middle of a date
+        MonthlyInvestment.objects.bulk_create([
+            MonthlyInvestment(goal=goal, date=date(2024, 1 + n % 6, 1), purchase_price=1, quantity=1)
+            for n in range(29)
+        ])
+        self.expected = list(MonthlyInvestment.objects.order_by('-date', '-id').values_list('id', flat=True))
+        # The async views authenticate the token themselves
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def walk(self, url, link):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.json()['results']])
+            url = response.json()[link]
+        return pages
+
+    def test_walks_every_row_once_across_ties(self):
+        for path in ('/api/investments/', '/api/async/investments/'):
+            pages = self.walk(f'{path}?pagination=cursor&page_size=4', 'next')
+            self.assertEqual([len(page) for page in pages], [4] * 7 + [1], path)
+            self.assertEqual([pk for page in pages for pk in page], self.expected, path)
+
+            # And back again from the last page
+            last = self.client.get(f'{path}?pagination=cursor&page_size=4')
+            while last.json()['next']:
+                last = self.client.get(last.json()['next'])
+            back = self.walk(last.json()['previous'], 'previous')
+            self.assertEqual([pk for page in reversed(back) for pk in page], self.expected[:28], path)
+
+    def test_bad_cursor_is_not_found(self):
+        for cursor in ('garbage', base64.urlsafe_b64encode(b'2024-01-01|1|x').decode(),
+                       base64.urlsafe_b64encode(b'not-a-date|1|n').decode(),
+                       base64.urlsafe_b64encode(b'2024-01-01|one|n').decode()):
+            for path in ('/api/investments/', '/api/async/investments/'):
+                response = self.client.get(path, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404, (path, cursor))
+                self.assertEqual(response.json(), {'detail': 'Invalid cursor'})
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        user_status_cache.clear()
+        self.user = CustomUser.objects.create_user('investor', password='secret')
+        asset = Asset.objects.create(name="Asset", ticker="T", asset_type='STOCK', current_price=10)
+        self.goals = [InvestmentGoal.objects.create(user=self.user, name=name, investment_type=kind,
+                                                    target_amount=1000, years_to_invest=1, monthly_contribution=1)
+                      for name, kind in (("Retirement", 'STOCK'), ("House", 'BOND'))]
+        MonthlyInvestment.objects.bulk_create([
+            MonthlyInvestment(goal=self.goals[n % 2], asset=asset if n % 3 else None,
+                              date=date(2024, 1 + n % 12, 1), purchase_price=8 + n % 5, quantity=1)
+            for n in range(30)
+        ])
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_investment_list_matches_the_sync_one(self):
+        for query in ('', 'page=2', 'page_size=5', f'goal={self.goals[1].id}', 'goal__name=house',
+                      'goal__investment_type=STOCK', 'profitable=true', 'profitable=false',
+                      'date_range_after=2024-03-01&date_range_before=2024-06-01', 'asset__ticker=T',
+                      'expand=goal&page=2', 'pagination=cursor&page_size=7', 'goal=999999', 'page=9'):
+            sync, async_ = (self.client.get(f'{path}?{query}') for path in ('/api/investments/', '/api/async/investments/'))
+            self.assertEqual(async_.status_code, sync.status_code, query)
+            # Page links point back at the view that served them
+            self.assertEqual(json.loads(async_.content.decode().replace('/api/async/', '/api/')), sync.json(), query)
+
+    # simplejwt's modules keep the api_settings they imported, which
+    # override_settings(SIMPLE_JWT=...) would replace rather than change
+    @mock.patch.object(jwt_settings, 'CHECK_REVOKE_TOKEN', True)
+    def test_authentication_matches_the_sync_views(self):
+        # Carrying the password hash claim revocation is checked against
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        for claims_user in (True, False):
+            with self.subTest(claims_user=claims_user), self.settings(TOKEN_CLAIMS_USER=claims_user):
+                self.assertEqual(self.client.get('/api/async/goals/').status_code, 200)
+                # A password change revokes the token; deactivation refuses it
+                for change in ({'password': 'changed'}, {'is_active': False}):
+                    original = CustomUser.objects.filter(pk=self.user.pk).values(*change).get()
+                    CustomUser.objects.filter(pk=self.user.pk).update(**change)
+                    user_status_cache.clear()
+                    for path in ('/api/goals/', '/api/async/goals/'):
+                        self.assertEqual(self.client.get(path).status_code, 401, (change, path))
+                    CustomUser.objects.filter(pk=self.user.pk).update(**original)
+                    user_status_cache.clear()
+
+
+class AssetCatalogTests(TestCase):
+    def test_sync_and_async_lists_agree(self):
+        Asset.objects.create(name="Asset", ticker="T", asset_type='STOCK', current_price=5)
+        client = APIClient()
+        for path in ('/api/assets/', '/api/async/assets/'):
+            first = client.get(path)
+            self.assertEqual(first.status_code, 200)
+            self.assertEqual(client.get(path, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+            # Served from the catalog the second time
+            with self.assertNumQueries(0):
+                again = client.get(path)
+            self.assertEqual(again['ETag'], first['ETag'])
+            self.assertEqual(again.json(), first.json())
+        self.assertEqual(client.get('/api/assets/').json(), client.get('/api/async/assets/').json())
+
+
+class UserStatusCacheTests(TestCase):
+    def setUp(self):
+        user_status_cache.clear()
+
+    def test_writes_forget_only_the_owner(self):
+        holder, bystander = CustomUser.objects.create_user('holder'), CustomUser.objects.create_user('bystander')
+        held = Asset.objects.create(name="Held", ticker="H", asset_type='STOCK', current_price=1)
+        goal = InvestmentGoal.objects.create(user=holder, name="Goal", investment_type='STOCK',
+                                             target_amount=100, years_to_invest=1, monthly_contribution=1)
+        MonthlyInvestment.objects.create(goal=goal, asset=held, date='2024-01-01', purchase_price=1, quantity=1)
+        for user in (holder, bystander):
+            user_status_cache.get(user.pk)
+
+        # Prices are no part of the data version
+        with self.captureOnCommitCallbacks(execute=True):
+            held.current_price = 2
+            held.save()
+        with self.assertNumQueries(0):
+            user_status_cache.get(holder.pk)
+            user_status_cache.get(bystander.pk)
+
+        version = CustomUser.objects.get(pk=holder.pk).data_version
+        with self.captureOnCommitCallbacks(execute=True):
+            MonthlyInvestment.objects.create(goal=goal, asset=held, date='2024-02-01', purchase_price=2, quantity=1)
+        with self.assertNumQueries(0):
+            user_status_cache.get(bystander.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(user_status_cache.get(holder.pk)['data_version'], version + 1)
+
+
+# Real tokens rather than force_authenticate(), which hands every request
+# the same in-memory user and would hide a stale data_version
+@override_settings(PRICE_CACHE_TTL=0)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        user_status_cache.clear()
+        price_cache.clear()
+        held_assets_cache.reset()
+        self.user = CustomUser.objects.create_user('investor')
+        self.held, self.unheld = (Asset.objects.create(name=ticker, ticker=ticker, asset_type='STOCK', current_price=10)
+                                  for ticker in ('H', 'U'))
+        self.goal = InvestmentGoal.objects.create(user=self.user, name="Goal", investment_type='STOCK',
+                                                  target_amount=1000, years_to_invest=1, monthly_contribution=1)
+        MonthlyInvestment.objects.create(goal=self.goal, asset=self.held, date='2024-01-01',
+                                         purchase_price=8, quantity=2)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def revalidate(self, etags):
+        """Status of a conditional GET of each path against ``etags``, and the new ETags"""
+        responses = {path: self.client.get(path, HTTP_IF_NONE_MATCH=etag) for path, etag in etags.items()}
+        return {path: r.status_code for path, r in responses.items()}, {path: r['ETag'] for path, r in responses.items()}
+
+    def test_repeat_gets_are_not_modified_until_a_write(self):
+        paths = ('/api/goals/', '/api/investments/', '/api/async/goals/', '/api/async/investments/')
+        etags = {path: self.client.get(path)['ETag'] for path in paths}
+        statuses, _ = self.revalidate(etags)
+        self.assertEqual(set(statuses.values()), {304})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.unheld.current_price = 11
+            self.unheld.save()
+        statuses, _ = self.revalidate(etags)
+        self.assertEqual(set(statuses.values()), {304})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MonthlyInvestment.objects.create(goal=self.goal, asset=self.held, date='2024-02-01',
+                                             purchase_price=9, quantity=1)
+        statuses, etags = self.revalidate(etags)
+        self.assertEqual(set(statuses.values()), {200})
+        statuses, _ = self.revalidate(etags)
+        self.assertEqual(set(statuses.values()), {304})
+
+    def test_held_prices_change_the_etag_but_not_the_data_version(self):
+        etag = self.client.get('/api/goals/')['ETag']
+        version = CustomUser.objects.get(pk=self.user.pk).data_version
+        with self.captureOnCommitCallbacks(execute=True):
+            self.held.current_price = 12
+            self.held.save()
+        response = self.client.get('/api/goals/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CustomUser.objects.get(pk=self.user.pk).data_version, version)
+        self.assertEqual(self.client.get('/api/goals/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+class TokenClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        user_status_cache.clear()
+        self.user = CustomUser.objects.create_user('investor', email='investor@example.com')
+        asset = Asset.objects.create(name="Asset", ticker="T", asset_type='STOCK', current_price=20)
+        self.goal = InvestmentGoal.objects.create(
+            user=self.user, name="Retirement", investment_type='STOCK',
+            target_amount=10000, years_to_invest=10, monthly_contribution=100, asset=asset,
+        )
+        MonthlyInvestment.objects.create(goal=self.goal, asset=asset, date='2024-01-01',
+                                         purchase_price=10, quantity=2)
+
+    def test_reads_match_the_loaded_user(self):
+        token = AccessToken.for_user(self.user)
+        token['username'], token['email'] = self.user.username, self.user.email
+        claims_client, row_client = APIClient(), APIClient()
+        claims_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        row_client.force_authenticate(self.user)
+        for path in ('/api/goals/', f'/api/goals/{self.goal.pk}/', '/api/goals/returns/',
+                     '/api/investments/', '/api/investments/?expand=goal', '/api/investments/export/'):
+            response = claims_client.get(path)
+            self.assertEqual(response.status_code, 200, path)
+            self.assertIsInstance(response.wsgi_request.user, ClaimsUser)
+            self.assertEqual(response.getvalue(), row_client.get(path).getvalue(), path)
+
+        # Stamped with the time of the request
+        stats, expected = (client.get('/api/overall-goal-stats/').json() for client in (claims_client, row_client))
+        stats.pop('last_updated'), expected.pop('last_updated')
+        self.assertEqual(stats, expected)
+
+    def test_staff_flags_come_from_the_token(self):
+        staff = CustomUser.objects.create_user('staff', is_staff=True, is_superuser=True)
+        for user, token, expected in (
+            (staff, CustomTokenObtainPairSerializer.get_token(staff).access_token, (True, True)),
+            (self.user, CustomTokenObtainPairSerializer.get_token(self.user).access_token, (False, False)),
+            (staff, AccessToken.for_user(staff), (False, False)),  # no claims: no privileges
+        ):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+            request_user = client.get('/api/goals/').wsgi_request.user
+            self.assertIsInstance(request_user, ClaimsUser)
+            self.assertEqual((request_user.is_staff, request_user.is_superuser), expected, user)
+
+    def test_claims_user_is_read_only(self):
+        user = ClaimsUser(pk=self.user.pk, username='investor', email='', is_active=True,
+                          is_data_admin=False, data_version=0, data_updated_at=None)
+        with self.assertRaises(ReadOnlyUserError):
+            user.save()
+        with self.assertRaises(ReadOnlyUserError):
+            user.delete()
+
+
+class MetricsTests(TestCase):
+    @override_settings(DEBUG=False, METRICS_TOKEN='')
+    def test_no_token_fails_closed_without_debug(self):
+        self.assertEqual(APIClient().get('/metrics').status_code, 403)
+        with self.settings(DEBUG=True):
+            self.assertEqual(APIClient().get('/metrics').status_code, 200)
+
+    @override_settings(DEBUG=False, METRICS_TOKEN='secret')
+    def test_token_is_required(self):
+        self.assertEqual(APIClient().get('/metrics').status_code, 401)
+        self.assertEqual(APIClient().get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        self.assertEqual(APIClient().get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_list_serialization_is_timed(self):
+        Asset.objects.create(name="Asset", ticker="T", asset_type='STOCK', current_price=5)
+        stats = metrics.RequestStats()
+        token = metrics.request_stats.set(stats)
+        try:
+            data = AssetSerializer(Asset.objects.all(), many=True).data
+        finally:
+            metrics.request_stats.reset(token)
+        self.assertEqual(len(data), 1)
+        self.assertGreater(stats.serializer_seconds, 0)
+        self.assertFalse(stats.serializing)
+
+
+class BulkPriceUpdateTests(TestCase):
+    """
+    The write side of /api/assets/bulk_update_prices/ must stay a fixed
+    number of statements: per-row inserts or bulk_create() batches are what
+    pushed large feeds past a second (see manage.py benchmark_bulk_prices).
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user('admin', is_data_admin=True))
+
+    def post_prices(self, count, price):
+        Asset.objects.bulk_create([
+            Asset(name=f"Asset {n}", ticker=f"T{n}", asset_type='STOCK', current_price=1)
+            for n in range(Asset.objects.count(), count)
+        ])
+        prices = [{'ticker': f"T{n}", 'price': price} for n in range(count)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/assets/bulk_update_prices/', {'prices': prices}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], count)
+        return len(queries)
+
+    def test_writes_are_constant_in_feed_size(self):
+        small = self.post_prices(20, '2.50')
+        # Still one lookup batch, but several bulk_create() batches
+        large = self.post_prices(450, '3.75')
+        self.assertEqual(small, large)
+
+        self.assertEqual(set(Asset.objects.values_list('current_price', flat=True)), {Decimal('3.75')})
+        self.assertEqual(AssetPriceTick.objects.count(), 20 + 450)
+        self.assertEqual(PriceUpdateOutbox.objects.count(), 20 + 450)
+        tick = AssetPriceTick.objects.get(asset__ticker='T0', price=Decimal('3.75'))
+        self.assertEqual(tick.timestamp, Asset.objects.get(ticker='T0').last_updated)
+
+
+class UpdatePriceTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user('admin', is_data_admin=True))
+        self.asset = Asset.objects.create(name="Asset", ticker="T", asset_type='STOCK', current_price=1)
+
+    def test_rejects_prices_the_column_cannot_hold(self):
+        for price in ('1e12', '-5', 'NaN', 'abc'):
+            response = self.client.post(f'/api/assets/{self.asset.id}/update_price/', {'price': price}, format='json')
+            self.assertEqual(response.status_code, 400, price)
+        self.assertFalse(PriceUpdateOutbox.objects.exists())
+        self.assertEqual(Asset.objects.get().current_price, Decimal('1.00'))
+
+    def test_queues_a_valid_price(self):
+        response = self.client.post(f'/api/assets/{self.asset.id}/update_price/', {'price': '12.5'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Asset.objects.get().current_price, Decimal('12.50'))
+        self.assertEqual(PriceUpdateOutbox.objects.get().price, Decimal('12.50'))
+
+
+@override_settings(PRICE_CACHE_TTL=0)
+class PriceCacheTests(TestCase):
+    def setUp(self):
+        price_cache.clear()
+        self.early, self.late = (Asset.objects.create(name=ticker, ticker=ticker, asset_type='STOCK', current_price=1)
+                                 for ticker in ('E', 'L'))
+        Asset.objects.update(last_updated=timezone.now() - timedelta(hours=1))
+
+    def test_refresh_picks_up_rows_committed_behind_the_high_water_mark(self):
+        now = timezone.now()
+        Asset.objects.filter(pk=self.early.pk).update(current_price=2, last_updated=now)
+        versions = price_cache.committed_versions([self.early.id, self.late.id])
+        self.assertEqual(price_cache.get_many([self.early.id])[self.early.id][0], '2.00')
+
+        # Stamped before the row above, committed after it was read
+        Asset.objects.filter(pk=self.late.pk).update(current_price=3, last_updated=now - timedelta(seconds=1))
+        self.assertEqual(price_cache.get_many([self.late.id])[self.late.id][0], '3.00')
+        late = price_cache.committed_versions([self.early.id, self.late.id])
+        self.assertEqual(late.latest, versions.latest)
+        self.assertGreater(late.total, versions.total)
+
+    def test_ticks_are_not_committed_versions(self):
+        versions = price_cache.committed_versions([self.early.id])
+        price_cache.store_price(self.early.id, Decimal('5'), timezone.now())
+        self.assertEqual(price_cache.get_many([self.early.id])[self.early.id][0], '5.00')
+        self.assertEqual(price_cache.committed_versions([self.early.id]), versions)
+
+
+# Flushes run on a database_sync_to_async thread, which has to see the
+# assets: hence committed data rather than TestCase's transaction
+class PriceWriteBufferTests(TransactionTestCase):
+    def test_burst_loses_no_updates(self):
+        assets = Asset.objects.bulk_create([
+            Asset(name=f"Asset {n}", ticker=f"T{n}", asset_type='STOCK', current_price=1) for n in range(3)
+        ])
+        rounds = 40
+        written = price_write_buffer.stats['written']
+
+        async def burst():
+            for n in range(rounds):
+                for asset in assets:
+                    price_write_buffer.submit(asset.id, Decimal(f'{10 + n}.25'), timezone.now())
+                # Let size-triggered flushes run between (and during) rounds
+                await asyncio.sleep(0)
+            await price_write_buffer.close()
+
+        # A flush every couple of assets, none from the timer
+        with override_settings(PRICE_WRITE_BEHIND_INTERVAL=60, PRICE_WRITE_BEHIND_MAX_PENDING=2):
+            async_to_sync(burst)()
+
+        self.assertEqual(price_write_buffer.pending_count, 0)
+        # Asset rows written over many flushes, not one at the end
+        self.assertGreater(price_write_buffer.stats['written'] - written, len(assets))
+        self.assertEqual(
+            dict(Asset.objects.values_list('id', 'current_price')),
+            {asset.id: Decimal(f'{10 + rounds - 1}.25') for asset in assets},
+        )
+        self.assertEqual(AssetPriceTick.objects.count(), rounds * len(assets))
+        for asset in assets:
+            self.assertEqual(
+                list(AssetPriceTick.objects.filter(asset=asset).order_by('id').values_list('price', flat=True)),
+                [Decimal(f'{10 + n}.25') for n in range(rounds)],
+            )
+
+
+class ValueSeriesTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user('investor')
+        self.goal = InvestmentGoal.objects.create(user=user, name="Goal", investment_type='STOCK',
+                                                  target_amount=1000, years_to_invest=1, monthly_contribution=1)
+        self.first = date.today() - timedelta(days=9)
+        MonthlyInvestment.objects.create(goal=self.goal, date=self.first, purchase_price=10, quantity=2)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def series(self, **params):
+        response = self.client.get(f'/api/goals/{self.goal.id}/value-series/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_range_is_clamped_to_the_first_purchase_and_today(self):
+        series = self.series(start='0001-01-01', end='9999-12-31')
+        self.assertEqual((series['dates'][0], series['dates'][-1]),
+                         (self.first.isoformat(), date.today().isoformat()))
+        self.assertEqual(set(series['invested']), {20})
+        self.assertEqual(self.series(end='0001-01-01')['dates'], [])
+
+    @override_settings(VALUE_SERIES_MAX_DAYS=4)
+    def test_long_ranges_keep_their_latest_days(self):
+        series = self.series()
+        self.assertEqual(series['dates'], [(date.today() - timedelta(days=n)).isoformat() for n in (3, 2, 1, 0)])
+
+
+class ProjectionTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('investor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.goal = InvestmentGoal.objects.create(
+            user=self.user, name="Retirement", investment_type='STOCK',
+            target_amount=5000, years_to_invest=2, monthly_contribution=100,
+        )
+
+    def test_simulation_shape(self):
+        result = simulate(start_value=1000.0, monthly_contribution=100.0, target=4000.0, months=30,
+                          mu=0.07, sigma=0.15, paths=201, seed=1)
+        self.assertEqual([band['month'] for band in result['bands']], [12, 24, 30])
+        self.assertEqual(set(result['final']), set(PERCENTILES))
+        self.assertEqual(result['final'][50], result['bands'][-1]['p50'])
+        self.assertTrue(0 <= result['probability'] <= 1)
+        for band in result['bands']:
+            values = [band[f'p{p}'] for p in PERCENTILES]
+            self.assertEqual(values, sorted(values))
+        # Seeded: a rerun is identical
+        self.assertEqual(result, simulate(start_value=1000.0, monthly_contribution=100.0, target=4000.0,
+                                          months=30, mu=0.07, sigma=0.15, paths=201, seed=1))
+
+    def test_projection(self):
+        response = self.client.get(f'/api/goals/{self.goal.id}/projection/', {'paths': 100})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['months'], body['paths'], body['parameter_source']), (24, 100, 'default'))
+        self.assertEqual([band['month'] for band in body['bands']], [12, 24])
+
+    @override_settings(PROJECTION_MAX_CELLS=2400)
+    def test_rejects_projections_too_large_to_simulate(self):
+        self.assertEqual(self.client.get(f'/api/goals/{self.goal.id}/projection/', {'paths': 100}).status_code, 200)
+        response = self.client.get(f'/api/goals/{self.goal.id}/projection/', {'paths': 101})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('at most 100', response.json()['error'])
+
+        # Saved before years_to_invest was validated
+        InvestmentGoal.objects.filter(pk=self.goal.pk).update(years_to_invest=100000)
+        self.assertEqual(self.client.get(f'/api/goals/{self.goal.id}/projection/', {'paths': 1}).status_code, 400)
+
+    def test_years_to_invest_is_capped(self):
+        response = self.client.patch(f'/api/goals/{self.goal.id}/', {'years_to_invest': 100000}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('years_to_invest', response.json())
+        response = self.client.patch(f'/api/goals/{self.goal.id}/', {'years_to_invest': 100}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+
+class ReturnsTests(TestCase):
+    def solve(self, *series):
+        """solve_xirr over ``series`` of ``([(amount, years_before_end)], end_value)``"""
+        group, amounts, years = zip(*((g, amount, before) for g, (flows, _) in enumerate(series)
+                                      for amount, before in flows))
+        return solve_xirr(np.array(group), np.array(amounts, dtype=float), np.array(years, dtype=float),
+                          np.array([end for _, end in series], dtype=float), len(series))
+
+    def test_known_rate(self):
+        self.assertAlmostEqual(self.solve(([(-1000, 1)], 1100))[0], 0.10, places=9)
+
+    def test_batch_matches_each_series_alone(self):
+        series = [
+            ([(-1000, 1)], 1100),
+            ([(-1000, 2)], 1210),
+            ([(-500, 3), (-500, 1.5), (-250, 0.25)], 1000),  # a loss
+            ([(-100, 0.5), (-100, 0.25)], 260),
+        ]
+        batch = self.solve(*series)
+        np.testing.assert_allclose(batch, [self.solve(one)[0] for one in series], rtol=1e-9)
+        np.testing.assert_allclose(batch[:2], [0.10, 0.10], rtol=1e-9)
+        self.assertLess(batch[2], 0)
+        for (flows, end), rate in zip(series, batch):
+            self.assertAlmostEqual(end + sum(amount * (1 + rate) ** before for amount, before in flows), 0, places=6)
+
+    def test_total_loss_and_degenerate_series(self):
+        total_loss, out_of_bracket, gain = self.solve(([(-1000, 1)], 0), ([(-1, 1)], 1e9), ([(-1000, 1)], 1100))
+        self.assertEqual(total_loss, -1.0)
+        self.assertTrue(np.isnan(out_of_bracket))
+        self.assertAlmostEqual(gain, 0.10, places=9)
+
+    def test_goal_returns(self):
+        user = CustomUser.objects.create_user('investor')
+        asset = Asset.objects.create(name="Asset", ticker="T", asset_type='STOCK', current_price=11)
+        goal, empty, fresh = (InvestmentGoal.objects.create(user=user, name=name, investment_type='STOCK',
+                                                            target_amount=1000, years_to_invest=1,
+                                                            monthly_contribution=1)
+                              for name in ("Goal", "Empty", "Fresh"))
+        MonthlyInvestment.objects.create(goal=goal, asset=asset, date=date(2023, 1, 1), purchase_price=10, quantity=100)
+        MonthlyInvestment.objects.create(goal=fresh, asset=asset, date=date(2024, 1, 1), purchase_price=10, quantity=1)
+        # Rows as ReturnsCache builds them
+        series = {goal_id: [(asset_id, day, float(quantity), float(price)) for asset_id, day, quantity, price in
+                            MonthlyInvestment.objects.filter(goal_id=goal_id)
+                            .values_list('asset_id', 'date', 'quantity', 'purchase_price')]
+                  for goal_id in (goal.id, empty.id, fresh.id)}
+        results = compute_returns(series, today=date(2024, 1, 1))
+
+        self.assertAlmostEqual(results[goal.id]['xirr'], 0.10, places=9)
+        self.assertAlmostEqual(results[goal.id]['twr'], 0.10, places=9)
+        self.assertAlmostEqual(results[goal.id]['annualized_twr'], 0.10, places=9)
+        self.assertEqual((results[goal.id]['invested'], results[goal.id]['current_value']), (1000, 1100))
+        # Nothing invested, or only today: no rate to speak of
+        self.assertEqual((results[empty.id]['xirr'], results[empty.id]['twr']), (None, None))
+        self.assertIsNone(results[fresh.id]['xirr'])
+        self.assertIsNone(results[fresh.id]['annualized_twr'])
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.asset = Asset.objects.create(name="Asset", ticker="T", asset_type='STOCK', current_price=10)
+
+    def tick(self, moment, price):
+        AssetPriceTick.objects.insert([(self.asset.id, Decimal(price), moment)])
+
+    def bars(self, interval):
+        return list(AssetPriceBar.objects.filter(asset=self.asset, interval=interval).order_by('start')
+                    .values_list('start', 'open', 'high', 'low', 'close', 'tick_count'))
+
+    def test_ohlc_per_level(self):
+        for moment, price in ((datetime(2024, 3, 1, 10, 0, 5), '10'), (datetime(2024, 3, 1, 10, 0, 30), '12'),
+                              (datetime(2024, 3, 1, 10, 0, 50), '9'), (datetime(2024, 3, 1, 10, 1, 10), '11'),
+                              (datetime(2024, 3, 1, 11, 30), '8')):
+            self.tick(moment.replace(tzinfo=dt_timezone.utc), price)
+        self.assertEqual(rollup_price_ticks(batch_size=2), 5)
+
+        def at(*parts):
+            return datetime(*parts, tzinfo=dt_timezone.utc)
+        self.assertEqual(self.bars('1m'), [
+            (at(2024, 3, 1, 10, 0), 10, 12, 9, 9, 3),
+            (at(2024, 3, 1, 10, 1), 11, 11, 11, 11, 1),
+            (at(2024, 3, 1, 11, 30), 8, 8, 8, 8, 1),
+        ])
+        self.assertEqual(self.bars('1h'), [
+            (at(2024, 3, 1, 10), 10, 12, 9, 11, 4),
+            (at(2024, 3, 1, 11), 8, 8, 8, 8, 1),
+        ])
+        self.assertEqual(self.bars('1d'), [(at(2024, 3, 1), 10, 12, 8, 8, 5)])
+
+    def test_resumes_from_the_cursor(self):
+        first = datetime(2024, 3, 1, 10, tzinfo=dt_timezone.utc)
+        self.tick(first, '10')
+        self.tick(first + timedelta(days=30), '20')
+        self.assertEqual(rollup_price_ticks(), 2)
+        self.assertEqual(rollup_price_ticks(), 0)
+
+        # A late tick in an old minute, one in between and one too recent to take yet
+        self.tick(first + timedelta(seconds=30), '15')
+        self.tick(first + timedelta(days=10), '5')
+        self.tick(timezone.now(), '30')
+        self.assertEqual(rollup_price_ticks(), 2)
+        self.assertEqual(PriceRollupCursor.objects.get().last_tick_id,
+                         AssetPriceTick.objects.order_by('-id').values_list('id', flat=True)[1])
+        self.assertEqual([bar[1:] for bar in self.bars('1m')], [
+            (10, 15, 10, 15, 2), (5, 5, 5, 5, 1), (20, 20, 20, 20, 1),
+        ])
+        self.assertEqual([bar[5] for bar in self.bars('1d')], [2, 1, 1])
+        self.assertEqual(rollup_price_ticks(), 0)
+
+    def test_bucket_ranges_merge_consecutive_buckets(self):
+        minute = timedelta(minutes=1)
+        first = datetime(2024, 3, 1, 10, tzinfo=dt_timezone.utc)
+        self.assertEqual(
+            _bucket_ranges({first + 5 * minute, first, first + minute, first + 2 * minute, first + 9 * minute}, minute),
+            [(first, first + 3 * minute), (first + 5 * minute, first + 6 * minute),
+             (first + 9 * minute, first + 10 * minute)],
+        )
+
+    def test_history_serves_the_bars(self):
+        self.tick(datetime(2024, 3, 1, 10, tzinfo=dt_timezone.utc), '10')
+        self.tick(datetime(2024, 3, 1, 10, 0, 20, tzinfo=dt_timezone.utc), '11')
+        rollup_price_ticks()
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.create_user('investor'))
+        response = client.get(f'/api/assets/{self.asset.id}/history/',
+                              {'start': '2024-03-01', 'end': '2024-03-02', 'interval': '1m'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(point['o'], point['h'], point['l'], point['c']) for point in response.json()['points']],
+                         [(10, 11, 10, 11)])
+
+
+class ImportTests(TestCase):
+    CSV = (
+        'date,ticker,purchase_price,quantity,goal_name\n'
+        '2024-01-01,T,10,1.5,Retirement\n'
+        '2024-02-01,NOPE,10,1,Retirement\n'
+        '2024-03-01,T,11,2,Retirement\n'
+    )
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('investor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.asset = Asset.objects.create(name="Asset", ticker="T", asset_type='STOCK', current_price=20)
+        self.goal = InvestmentGoal.objects.create(
+            user=self.user, name="Retirement", investment_type='STOCK',
+            target_amount=10000, years_to_invest=10, monthly_contribution=100,
+        )
+
+    def upload(self, content, name='history.csv', **data):
+        return self.client.post('/api/investments/import/', {'file': SimpleUploadedFile(name, content), **data},
+                                format='multipart')
+
+    def test_imports_rows_and_reports_rejects(self):
+        response = self.upload(self.CSV.encode())
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual({key: response.json()[key] for key in ('status', 'rows_processed', 'rows_imported',
+                                                                'rows_rejected')},
+                         {'status': 'COMPLETED', 'rows_processed': 3, 'rows_imported': 2, 'rows_rejected': 1})
+        self.assertEqual(response.json()['errors'], [{'row': 2, 'error': 'Unknown ticker: NOPE'}])
+        self.assertEqual(sorted(MonthlyInvestment.objects.values_list('quantity', flat=True)),
+                         [Decimal('1.5'), Decimal('2')])
+        self.goal.refresh_from_db()
+        self.assertEqual((self.goal.total_cost, self.goal.investment_count), (Decimal('37'), 2))
+
+    def test_resumes_from_the_checkpoint(self):
+        records = list(iter_records(io.StringIO(self.CSV + '2024-04-01,T,12,3,Retirement\n'), 'csv'))
+
+        def failing(records, after):
+            for number, record in enumerate(records, start=1):
+                if number > after:
+                    raise OSError("Connection lost")
+                yield record
+
+        job = InvestmentImport.objects.create(user=self.user, source='history.csv')
+        with self.assertRaises(OSError):
+            InvestmentImporter(job, chunk_size=2).run(failing(records, after=3))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_processed, job.rows_imported), ('FAILED', 2, 1))
+
+        InvestmentImporter(job, chunk_size=2).run(iter(records))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_processed, job.rows_imported, job.rows_rejected),
+                         ('COMPLETED', 4, 3, 1))
+        self.assertEqual(sorted(MonthlyInvestment.objects.values_list('date', flat=True)),
+                         [date(2024, 1, 1), date(2024, 3, 1), date(2024, 4, 1)])
+
+    def test_file_that_is_not_utf8_fails_the_job(self):
+        response = self.upload('date,ticker,purchase_price,quantity,notes\n2024-01-01,T,10,1,Café\n'
+                               .encode('latin-1'), goal=self.goal.id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['status'], 'FAILED')
+        self.assertEqual(response.json()['errors'][-1]['error'], 'File is not UTF-8 text')
+        self.assertEqual(InvestmentImport.objects.get().status, 'FAILED')
+
+    def test_resume_must_name_one_of_the_users_imports(self):
+        self.assertEqual(self.upload(self.CSV.encode(), resume='abc').status_code, 400)
+        other = InvestmentImport.objects.create(user=CustomUser.objects.create_user('other'), source='x.csv')
+        self.assertEqual(self.upload(self.CSV.encode(), resume=other.id).status_code, 404)
+        self.assertFalse(MonthlyInvestment.objects.exists())
+
+    @override_settings(IMPORT_UPLOAD_MAX_BYTES=10)
+    def test_rejects_files_over_the_upload_limit(self):
+        self.assertEqual(self.upload(self.CSV.encode()).status_code, 413)
+        self.assertFalse(InvestmentImport.objects.exists())
+
+
+class BroadcastTests(TestCase):
+    class SlowLayer:
+        """Records each group_send and how many were awaiting at once"""
+
+        def __init__(self):
+            self.sent, self.in_flight, self.most_in_flight = [], 0, 0
+
+        async def group_send(self, group, message):
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+            self.sent.append((group, message['type']))
+
+    def test_fan_out_is_concurrent_and_complete(self):
+        layer = self.SlowLayer()
+        updates = [{'asset_id': asset_id, 'new_price': '1.00'} for asset_id in range(250)]
+        async_to_sync(group_send_price_updates)(layer, updates, 'now')
+        self.assertEqual(sorted(layer.sent), sorted(
+            [(f'price_updates.asset.{asset_id}', 'price.update') for asset_id in range(250)]
+            + [('price_updates', 'price.bulk_update')]
+        ))
+        self.assertEqual(layer.most_in_flight, GROUP_SEND_CONCURRENCY)
+
+        layer = self.SlowLayer()
+        async_to_sync(group_send_portfolio_updates)(layer, {1: [], 2: []}, 'now')
+        self.assertEqual(sorted(layer.sent), [('portfolio_updates.user.1', 'portfolio.update'),
+                                              ('portfolio_updates.user.2', 'portfolio.update')])
+        self.assertEqual(layer.most_in_flight, 2)
+
+
+# Consumers reach the database from database_sync_to_async threads
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+                   PRICE_UPDATES_FLUSH_INTERVAL=0)
+class PriceSocketTests(TransactionTestCase):
+    def setUp(self):
+        price_cache.clear()
+        self.user = CustomUser.objects.create_user('investor')
+        self.held, self.other = (Asset.objects.create(name=ticker, ticker=ticker, asset_type='STOCK', current_price=price)
+                                 for ticker, price in (('H', 10), ('O', 20)))
+        goal = InvestmentGoal.objects.create(user=self.user, name="Goal", investment_type='STOCK',
+                                             target_amount=1000, years_to_invest=1, monthly_contribution=1)
+        MonthlyInvestment.objects.create(goal=goal, asset=self.held, date='2024-01-01', purchase_price=8, quantity=2)
+
+    def communicator(self, query=''):
+        application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+        return WebsocketCommunicator(application, f'/ws/prices/?{query}')
+
+    def test_sockets_get_every_price_only_when_they_ask(self):
+        async def frames_on_connect(query):
+            communicator = self.communicator(query)
+            self.assertTrue((await communicator.connect())[0])
+            frames = [await communicator.receive_json_from()]
+            while not await communicator.receive_nothing(0.05):
+                frames.append(await communicator.receive_json_from())
+            await communicator.disconnect()
+            return frames
+
+        token = AccessToken.for_user(self.user)
+        self.assertEqual(async_to_sync(frames_on_connect)(''), [
+            {'type': 'subscriptions', 'asset_ids': [], 'all': False},
+        ])
+        subscriptions, snapshot = async_to_sync(frames_on_connect)(f'token={token}')
+        self.assertEqual(subscriptions, {'type': 'subscriptions', 'asset_ids': [self.held.id], 'all': False})
+        self.assertEqual([price['asset_id'] for price in snapshot['prices']], [self.held.id])
+        subscriptions, snapshot = async_to_sync(frames_on_connect)('all=1')
+        self.assertTrue(subscriptions['all'])
+        self.assertEqual([price['asset_id'] for price in snapshot['prices']], [self.held.id, self.other.id])
+
+    @override_settings(PRICE_UPDATES_FLUSH_INTERVAL=0.05)
+    def test_subscribe_snapshot_coalesced_ticks_and_portfolio_totals(self):
+        token = AccessToken.for_user(self.user)
+
+        async def session():
+            communicator = self.communicator(f'token={token}')
+            await communicator.connect()
+            await communicator.receive_json_from()  # subscriptions
+            await communicator.receive_json_from()  # snapshot of the held asset
+
+            await communicator.send_json_to({'type': 'subscribe', 'asset_ids': [self.other.id]})
+            subscriptions = await communicator.receive_json_from()
+            snapshot = await communicator.receive_json_from()
+
+            # Two ticks within one flush interval: only the latest is sent
+            layer = get_channel_layer()
+            for price in ('11', '12'):
+                updates = [{'asset_id': self.held.id, 'new_price': price}]
+                await group_send_price_updates(layer, updates, 'now')
+                await group_send_portfolio_updates(
+                    layer, await database_sync_to_async(holder_updates)(updates), 'now')
+            frames = [await communicator.receive_json_from(timeout=1), await communicator.receive_json_from()]
+            self.assertTrue(await communicator.receive_nothing(0.1))
+            await communicator.disconnect()
+            return subscriptions, snapshot, frames
+
+        subscriptions, snapshot, (tick, portfolio) = async_to_sync(session)()
+        self.assertEqual(subscriptions['asset_ids'], sorted([self.held.id, self.other.id]))
+        self.assertEqual(snapshot['prices'], [{'asset_id': self.other.id, 'new_price': '20.00',
+                                               'version': snapshot['prices'][0]['version']}])
+        self.assertEqual((tick['type'], tick['asset_id'], tick['new_price']), ('price.update', self.held.id, '12'))
+        self.assertEqual(portfolio['type'], 'portfolio.update')
+        self.assertEqual(portfolio['value_changes'], [{'asset_id': self.held.id, 'value_change': 4.0}])
+        self.assertEqual((portfolio['total_invested'], portfolio['total_current_value'], portfolio['total_gain_loss']),
+                         (16.0, 24.0, 8.0))
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
+from .async_views import AsyncAssetList, AsyncGoalList, AsyncInvestmentList, AsyncOverallGoalStats
 from .views import (
     InvestmentGoalViewSet,
     MonthlyInvestmentViewSet,
@@ -25,4 +26,9 @@ urlpatterns = [
     path('register/', RegisterUserAPIView.as_view(), name='register'),
     path('register-admin/', RegisterAdminAPIView.as_view(), name='register-admin'),
     path('overall-goal-stats/', OverallGoalStats.as_view(), name='overall-goal-stats'),
+    # Async (event loop, async ORM) variants of the read-heavy GET endpoints
+    path('async/overall-goal-stats/', AsyncOverallGoalStats.as_view(), name='async-overall-goal-stats'),
+    path('async/goals/', AsyncGoalList.as_view(), name='async-goal-list'),
+    path('async/investments/', AsyncInvestmentList.as_view(), name='async-investment-list'),
+    path('async/assets/', AsyncAssetList.as_view(), name='async-asset-list'),
 ]
@@ -0,0 +1,55 @@
+# user_status.py
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+# Columns token-backed requests need from the user row; the rest of the
+# user comes from the access token's claims
+STATUS_FIELDS = ('is_active', 'is_data_admin', 'password', 'data_version', 'data_updated_at')
+
+
+class UserStatusCache:
+    """
+    Process-wide map of user id -> STATUS_FIELDS (None once the user is
+    gone), evicting the least recently used past
+    TOKEN_USER_STATUS_MAX_ENTRIES. An entry is trusted for
+    TOKEN_USER_STATUS_TTL seconds, which bounds how long a deactivated
+    user, a changed password or another worker's write can go unnoticed;
+    writes in this process forget the entries they affect (see
+    bump_data_versions).
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[0] < getattr(settings, 'TOKEN_USER_STATUS_TTL', 5):
+                self._entries.move_to_end(user_id)
+                return entry[1]
+
+        status = get_user_model().objects.filter(pk=user_id).values(*STATUS_FIELDS).first()
+        with self._lock:
+            self._entries[user_id] = (now, status)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > getattr(settings, 'TOKEN_USER_STATUS_MAX_ENTRIES', 10000):
+                self._entries.popitem(last=False)
+        return status
+
+    def forget(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_status_cache = UserStatusCache()
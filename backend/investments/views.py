@@ -1,3 +1,7 @@
+import hashlib
+import hmac
+import time
+
 from rest_framework.decorators import action
 from rest_framework import viewsets, permissions
 from django_filters.rest_framework import DjangoFilterBackend, FilterSet
@@ -5,16 +9,24 @@ from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from django.db.models import Sum
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from django.views.decorators.csrf import csrf_exempt
+from django.http import HttpResponse
 from django.utils.decorators import method_decorator
 from django_filters import FilterSet, DateFromToRangeFilter, CharFilter, BooleanFilter
-from django.db.models import F
-from .models import InvestmentGoal, MonthlyInvestment, Asset
+from django.db.models import F, Prefetch
+from .models import (
+    InvestmentGoal,
+    MonthlyInvestment,
+    Asset,
+    AssetPriceBar,
+    AssetPriceTick,
+    PriceUpdateOutbox,
+    InvestmentImport,
+)
 from .serializers import (
     InvestmentGoalSerializer,
     MonthlyInvestmentSerializer,
@@ -22,11 +34,28 @@ from .serializers import (
     CustomTokenObtainPairSerializer,
     RegisterUserSerializer,
     RegisterAdminSerializer,
+    InvestmentImportSerializer,
+    parse_field_list,
 )
+from .importer import InvestmentImporter, detect_format, iter_records, open_text
+from .history import pick_interval
+from .analytics import portfolio_value_series
+from .projection import project_goal, remaining_months
+from .returns import returns_cache
+from .metrics import registry
+from .exporter import EXPORT_CHUNK_SIZE, EXPORT_CONTENT_TYPES, EXPORT_QUERY_FIELDS, stream_export
 from rest_framework.response import Response
 from django.utils import timezone
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from datetime import datetime, timezone as dt_timezone
+from .prices import PriceChange, holdings_prices, price_cache, parse_price
+from .catalog import asset_catalog
+from .pagination import InvestmentKeysetPagination
+from .portfolio import PortfolioTotals
 
 
 # --- Custom permission for Asset editing ---
@@ -35,16 +64,97 @@ class IsDataAdmin(permissions.BasePermission):
         return request.user.is_authenticated and getattr(request.user, 'is_data_admin', False)
 
 
+# --- Conditional GET for the user's own data ---
+def user_data_validators(request, user, format):
+    """
+    ETag (and Last-Modified, once its second is over) for ``user``'s data
+    at this URL: their data_version plus the committed prices of the assets
+    they hold, which their goals and investments embed.
+    """
+    prices = holdings_prices(user)
+    variant = '&'.join(sorted(request.GET.urlencode().split('&')))
+    digest = hashlib.sha256(
+        f'{user.pk}:{user.data_version}:{prices.total}:{format}:{request.path}?{variant}'.encode()
+    ).hexdigest()[:32]
+    headers = {'ETag': f'"{digest}"'}
+    modified = max(
+        user.data_updated_at.timestamp() if user.data_updated_at is not None else 0,
+        prices.latest / 1_000_000,
+    )
+    # Whole seconds only: a change later in the second the response is
+    # built in would share its Last-Modified, so none is sent until then
+    if modified and int(modified) < int(time.time()):
+        headers['Last-Modified'] = http_date(modified)
+    return headers
+
+
+def user_data_not_modified(request, user, headers):
+    """Whether If-None-Match (or, without one, If-Modified-Since) matches ``headers``"""
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or headers['ETag'] in etags or f'W/{headers["ETag"]}' in etags
+    if 'Last-Modified' in headers:
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        return since is not None and parse_http_date_safe(headers['Last-Modified']) <= since
+    return False
+
+
+class UserDataConditionalMixin:
+    """
+    ETag and Last-Modified on list/retrieve, derived from the requesting
+    user's data_version and data_updated_at and the prices of the assets
+    they hold. Authentication has already loaded the user, so a matching If-None-Match (or, without one, an
+    If-Modified-Since no older than the last change) gets a 304 before
+    get_queryset() runs or anything is serialized.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_get(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_get(super().retrieve, request, *args, **kwargs)
+
+    def conditional_get(self, handler, request, *args, **kwargs):
+        headers = user_data_validators(request, request.user, request.accepted_renderer.format)
+        if user_data_not_modified(request, request.user, headers):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            for name, value in headers.items():
+                response[name] = value
+        return response
+
+
+# --- Querysets shared with the async read views ---
+def goal_queryset(user):
+    return InvestmentGoal.objects.filter(user_id=user.pk)\
+        .select_related('asset')\
+        .prefetch_related('positions')\
+        .with_portfolio_totals()
+
+
+def investment_queryset(user, expand=None):
+    queryset = MonthlyInvestment.objects.filter(goal__user_id=user.pk)
+    if 'goal' in parse_field_list(expand):
+        # The expanded goal carries portfolio totals; annotate them once per goal
+        return queryset.select_related('asset').prefetch_related(Prefetch(
+            'goal',
+            queryset=InvestmentGoal.objects.select_related('asset').prefetch_related('positions')
+            .with_portfolio_totals(),
+        ))
+    return queryset.select_related('goal', 'asset')
+
+
 # --- InvestmentGoal viewset ---
-class InvestmentGoalViewSet(viewsets.ModelViewSet):
+class InvestmentGoalViewSet(UserDataConditionalMixin, viewsets.ModelViewSet):
     serializer_class = InvestmentGoalSerializer
-    authentication_classes = [JWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = None  # Disable pagination
 
     def get_queryset(self):
-        return InvestmentGoal.objects.filter(user=self.request.user)\
-            .select_related('asset')
+        return goal_queryset(self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -59,6 +169,88 @@ class InvestmentGoalViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         serializer.save()
 
+    @action(detail=True, methods=['get'], url_path='value-series')
+    def value_series(self, request, pk=None):
+        """
+        Daily invested amount and market value of the goal, valued with the
+        daily price rollups. ``?start=`` and ``?end=`` take ISO dates; the
+        range is clamped as portfolio_value_series() describes.
+        """
+        goal = self.get_object()
+        try:
+            start = _parse_day(request.query_params.get('start'))
+            end = _parse_day(request.query_params.get('end'))
+        except ValueError:
+            return Response({'error': 'start and end must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'goal_id': goal.id, **portfolio_value_series(goal, start, end)})
+
+
+    @action(detail=True, methods=['get'])
+    def projection(self, request, pk=None):
+        """
+        Monte Carlo projection of the goal to the end of its term: the chance
+        of reaching the target and percentile bands of its value per year.
+        ``?annual_return=`` and ``?volatility=`` (fractions, e.g. 0.07)
+        override the estimate from the goal's price history; ``?paths=``
+        sets the number of simulated paths.
+        """
+        goal = self.get_object()
+        params = request.query_params
+        try:
+            paths = int(params.get('paths') or settings.PROJECTION_DEFAULT_PATHS)
+            annual_return = float(params['annual_return']) if params.get('annual_return') else None
+            volatility = float(params['volatility']) if params.get('volatility') else None
+        except ValueError:
+            return Response({'error': 'paths must be an integer; annual_return and volatility numbers'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= paths <= settings.PROJECTION_MAX_PATHS:
+            return Response({'error': f'paths must be between 1 and {settings.PROJECTION_MAX_PATHS}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if (annual_return is not None and not -1 < annual_return < 10) or \
+                (volatility is not None and not 0 <= volatility < 10):
+            return Response({'error': 'annual_return must be in (-1, 10) and volatility in [0, 10)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # Memory grows with paths x months, and goals saved before
+        # years_to_invest was capped can run for centuries
+        months = remaining_months(goal)
+        if months > settings.PROJECTION_MAX_MONTHS:
+            return Response({'error': f'goals longer than {settings.PROJECTION_MAX_MONTHS} months can\'t be projected'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if paths * months > settings.PROJECTION_MAX_CELLS:
+            return Response({'error': f'paths must be at most {settings.PROJECTION_MAX_CELLS // months} '
+                                      f'for a {months}-month projection'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(project_goal(goal, paths, annual_return, volatility, months=months))
+
+
+    @action(detail=True, methods=['get'])
+    def returns(self, request, pk=None):
+        """
+        Money-weighted (XIRR) and time-weighted (TWR) returns of the goal,
+        from the dates and amounts of its investments.
+        """
+        goal = self.get_object()
+        returns = returns_cache.user_returns(request.user, goal_ids=[goal.id])
+        return Response({'goal_id': goal.id, **returns['goals'][goal.id]})
+
+    @action(detail=False, methods=['get'], url_path='returns')
+    def all_returns(self, request):
+        """XIRR and TWR of each of the user's goals and of their whole portfolio"""
+        returns = returns_cache.user_returns(request.user)
+        return Response({
+            'goals': [{'goal_id': goal_id, **values} for goal_id, values in returns['goals'].items()],
+            'portfolio': returns['portfolio'],
+        })
+
+
+def _parse_day(value):
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(value)
+    return day
+
 
 # --- MonthlyInvestment filters ---
 class MonthlyInvestmentFilter(FilterSet):
@@ -69,6 +261,7 @@ class MonthlyInvestmentFilter(FilterSet):
     class Meta:
         model = MonthlyInvestment
         fields = {
+            'goal': ['exact'],
             'goal__investment_type': ['exact'],
             'goal__name': ['icontains'],
             'date': ['exact'],
@@ -88,31 +281,142 @@ class MonthlyInvestmentFilter(FilterSet):
 
 
 # --- MonthlyInvestment viewset ---
-class MonthlyInvestmentViewSet(viewsets.ModelViewSet):
+class MonthlyInvestmentViewSet(UserDataConditionalMixin, viewsets.ModelViewSet):
     serializer_class = MonthlyInvestmentSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_class = MonthlyInvestmentFilter
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and InvestmentKeysetPagination.requested(self.request):
+            self._paginator = InvestmentKeysetPagination()
+        return super().paginator
+
     def get_queryset(self):
-        return MonthlyInvestment.objects.filter(goal__user=self.request.user)
+        return investment_queryset(self.request.user, self.request.query_params.get('expand'))
 
     def perform_create(self, serializer):
         goal_id = self.request.data.get('goal')
         goal = InvestmentGoal.objects.get(id=goal_id, user=self.request.user)
         serializer.save(goal=goal)
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream every matching investment as CSV (default) or JSONL, chosen
+        with ``?file_format=``. Accepts the same filters as the list view;
+        rows are read with .iterator() over values(), so memory stays flat
+        regardless of how many rows are exported.
+        """
+        file_format = request.query_params.get('file_format', 'csv').lower()
+        if file_format not in EXPORT_CONTENT_TYPES:
+            return Response({'error': 'file_format must be csv or jsonl'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(
+            MonthlyInvestment.objects.filter(goal__user_id=request.user.pk)
+        ).order_by('-date', '-id')
+        rows = queryset.values_list(*EXPORT_QUERY_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        response = StreamingHttpResponse(
+            stream_export(rows, file_format),
+            content_type=EXPORT_CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="investments.{file_format}"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        """
+        Stream an uploaded CSV/JSONL file of transactions into the user's
+        goals (see importer.InvestmentImporter). Pass ``resume`` with a
+        previous import id and the same file to continue after a failure.
+
+        The import runs within the request, so uploads are limited to
+        IMPORT_UPLOAD_MAX_BYTES; larger files go through
+        ``manage.py import_investments``.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'A file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if upload.size > settings.IMPORT_UPLOAD_MAX_BYTES:
+            return Response({'error': f'Files over {settings.IMPORT_UPLOAD_MAX_BYTES} bytes must be imported '
+                                      f'with manage.py import_investments'},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        try:
+            fmt = detect_format(upload.name, request.data.get('format'))
+            default_goal_id = int(request.data['goal']) if request.data.get('goal') else None
+            resume_id = int(request.data['resume']) if request.data.get('resume') else None
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if resume_id is not None:
+            job = InvestmentImport.objects.filter(
+                id=resume_id, user=request.user
+            ).exclude(status='COMPLETED').first()
+            if job is None:
+                return Response({'error': 'No resumable import found'}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            job = InvestmentImport.objects.create(user=request.user, source=upload.name[-255:])
+
+        try:
+            importer = InvestmentImporter(job, default_goal_id=default_goal_id)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        importer.run(iter_records(open_text(upload.open('rb')), fmt))
+        return Response(
+            InvestmentImportSerializer(job).data,
+            status=status.HTTP_400_BAD_REQUEST if job.status == 'FAILED' else status.HTTP_201_CREATED,
+        )
+
 
 # --- Asset viewset ---
+BULK_PRICE_LOOKUP_BATCH = 500
+HISTORY_INTERVALS = ('tick', '1m', '1h', '1d')
+HISTORY_TICK_LIMIT = 10000
+
+
+def _parse_moment(value):
+    """Parse an ISO date or datetime query parameter into an aware datetime"""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        moment = datetime.combine(day, datetime.min.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+    return moment
+
+
 class AssetViewSet(viewsets.ModelViewSet):
     queryset = Asset.objects.all()
     serializer_class = AssetSerializer
 
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy', 'update_price']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy',
+                           'update_price', 'bulk_update_prices']:
             return [IsAuthenticated(), IsDataAdmin()]
         return [permissions.AllowAny()]
-    
+
+    def list(self, request, *args, **kwargs):
+        """
+        Served from asset_catalog, which every asset write invalidates. The
+        ETag is derived from the catalog version alone, so a client sending
+        the current one in If-None-Match gets a 304 without the database or
+        the serializer being touched.
+        """
+        entry = asset_catalog.lookup(request)
+        if entry.not_modified:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': entry.etag})
+
+        data = entry.data
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            asset_catalog.store(entry, data)
+        return Response(data, headers={'ETag': entry.etag})
+
     @action(detail=True, methods=['post'], permission_classes=[IsDataAdmin])
     def update_price(self, request, pk=None):
         asset = self.get_object()
@@ -121,18 +425,22 @@ class AssetViewSet(viewsets.ModelViewSet):
         if not new_price:
             return Response({'error': 'Price is required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            new_price = float(new_price)
-        except (TypeError, ValueError):
+        # The same validation as bulk_update_prices and the WebSocket: a
+        # price the column can't hold would otherwise break every read
+        new_price = parse_price(new_price)
+        if new_price is None:
             return Response({'error': 'Invalid price format'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Update the asset price in database
+        # Update the asset price in database; the outbox row commits with it
+        # and the dispatcher broadcasts it to connected clients
         asset.current_price = new_price
         asset.last_updated = timezone.now()
-        asset.save()
-        
-        # Broadcast the update to all connected clients
-        self._broadcast_price_update(asset.id, new_price)
+        with transaction.atomic():
+            asset.save()
+            PriceUpdateOutbox.objects.record([asset])
+            AssetPriceTick.objects.record([asset])
+        price_cache.store([asset])
+        asset_catalog.invalidate()
         
         return Response({
             'status': 'success',
@@ -141,31 +449,149 @@ class AssetViewSet(viewsets.ModelViewSet):
             'timestamp': asset.last_updated
         })
     
-    def _broadcast_price_update(self, asset_id, new_price):
-        """Helper method to broadcast price updates"""
-        channel_layer = get_channel_layer()
+    @action(detail=False, methods=['post'], permission_classes=[IsDataAdmin])
+    def bulk_update_prices(self, request):
+        """
+        Apply a list of ``{"id" | "ticker", "price"}`` items in one
+        transaction. Nothing is written unless every item is valid; the
+        response then lists the per-item errors by index.
+        """
+        items = request.data.get('prices') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'A non-empty list of prices is required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        errors = []
+        parsed = []  # (index, lookup field, lookup value, price)
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors.append({'index': index, 'error': 'Expected an object'})
+                continue
+            price = parse_price(item.get('price'))
+            if price is None:
+                errors.append({'index': index, 'error': 'Invalid price format'})
+            elif item.get('id') is not None:
+                try:
+                    parsed.append((index, 'id', int(item['id']), price))
+                except (TypeError, ValueError):
+                    errors.append({'index': index, 'error': 'Invalid asset id'})
+            elif item.get('ticker'):
+                parsed.append((index, 'ticker', str(item['ticker']), price))
+            else:
+                errors.append({'index': index, 'error': 'Either id or ticker is required'})
+
+        # (id, current price) per id or ticker; rows rather than instances,
+        # which would cost more to build than the update itself
+        assets_by_id = {}
+        assets_by_ticker = {}
+        for field, found in (('id', assets_by_id), ('ticker', assets_by_ticker)):
+            keys = list({key for _, f, key, _ in parsed if f == field})
+            for start in range(0, len(keys), BULK_PRICE_LOOKUP_BATCH):
+                batch = keys[start:start + BULK_PRICE_LOOKUP_BATCH]
+                for asset_id, ticker, current_price in Asset.objects.filter(**{f'{field}__in': batch})\
+                        .order_by().values_list('id', 'ticker', 'current_price'):
+                    found[asset_id if field == 'id' else ticker] = (asset_id, current_price)
+
+        # Later items for the same asset win
+        new_prices = {}
+        for index, field, key, price in parsed:
+            asset = (assets_by_id if field == 'id' else assets_by_ticker).get(key)
+            if asset is None:
+                errors.append({'index': index, 'error': f'Asset not found: {key}'})
+            else:
+                new_prices[asset[0]] = (asset[1], price)
+
+        if errors:
+            errors.sort(key=lambda error: error['index'])
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+        changed = [
+            PriceChange(asset_id, price, now)
+            for asset_id, (current_price, price) in new_prices.items()
+            if current_price != price
+        ]
+
+        with transaction.atomic():
+            Asset.objects.bulk_update_prices(changed)
+            PriceUpdateOutbox.objects.record(changed)
+            AssetPriceTick.objects.record(changed)
+        price_cache.store(changed)
+        if changed:
+            asset_catalog.invalidate()
+
+        return Response({
+            'status': 'success',
+            'updated': len(changed),
+            'unchanged': len(new_prices) - len(changed),
+            'timestamp': now,
+        })
+
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        """
+        Price history between ``?start=`` and ``?end=`` (ISO dates or
+        datetimes). ``?interval=`` is one of tick, 1m, 1h, 1d; without it the
+        finest rollup that keeps the range to a few thousand bars is used.
+        """
+        asset = self.get_object()
         try:
-            async_to_sync(channel_layer.group_send)(
-                "price_updates",
-                {
-                    "type": "price.update",  # This matches the method name in consumer
-                    "asset_id": asset_id,
-                    "new_price": str(new_price),
-                    "timestamp": str(timezone.now())
-                }
-            )
-        except Exception as e:
-            # Log error but don't fail the request
-            print(f"WebSocket broadcast failed: {str(e)}")
+            start = _parse_moment(request.query_params.get('start'))
+            end = _parse_moment(request.query_params.get('end'))
+        except ValueError:
+            return Response({'error': 'Invalid start or end'}, status=status.HTTP_400_BAD_REQUEST)
+
+        interval = request.query_params.get('interval') or 'auto'
+        if interval == 'auto':
+            interval = pick_interval(start, end)
+        if interval not in HISTORY_INTERVALS:
+            return Response({'error': 'interval must be one of auto, ' + ', '.join(HISTORY_INTERVALS)},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if interval == 'tick':
+            ticks = AssetPriceTick.objects.filter(asset=asset)
+            if start:
+                ticks = ticks.filter(timestamp__gte=start)
+            if end:
+                ticks = ticks.filter(timestamp__lt=end)
+            # Most recent ticks when the range holds more than the limit
+            rows = list(ticks.order_by('-timestamp', '-id')
+                        .values_list('timestamp', 'price')[:HISTORY_TICK_LIMIT])
+            points = [{'t': moment, 'p': price} for moment, price in reversed(rows)]
+        else:
+            bars = AssetPriceBar.objects.filter(asset=asset, interval=interval)
+            if start:
+                bars = bars.filter(start__gte=start)
+            if end:
+                bars = bars.filter(start__lt=end)
+            points = [
+                {'t': moment, 'o': open_, 'h': high, 'l': low, 'c': close}
+                for moment, open_, high, low, close in bars.order_by('start')
+                .values_list('start', 'open', 'high', 'low', 'close')
+            ]
+
+        return Response({'asset_id': asset.id, 'interval': interval, 'points': points})
+
+    def perform_create(self, serializer):
+        serializer.save()
+        asset_catalog.invalidate()
 
     # Add WebSocket support for regular updates too
+    @transaction.atomic
     def perform_update(self, serializer):
         instance = serializer.save()
         if 'current_price' in serializer.validated_data:
-            self._broadcast_price_update(
-                instance.id,
-                serializer.validated_data['current_price']
-            )
+            PriceUpdateOutbox.objects.record([instance])
+            AssetPriceTick.objects.record([instance])
+            transaction.on_commit(lambda: price_cache.store([instance]))
+        # After commit, or a concurrent list could cache the old row under the new version
+        transaction.on_commit(asset_catalog.invalidate)
+
+    def perform_destroy(self, instance):
+        asset_id = instance.id
+        instance.delete()
+        price_cache.discard(asset_id)
+        asset_catalog.invalidate()
 
 
 # --- Registration API ---
@@ -225,35 +651,28 @@ class OverallGoalStats(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        goals = InvestmentGoal.objects.filter(user=request.user).select_related('asset')
-        investments = MonthlyInvestment.objects.filter(
-            goal__user=request.user
-        ).select_related('asset', 'goal')
-
-        # Calculate totals
-        total_target = goals.aggregate(Sum('target_amount'))['target_amount__sum'] or 0
-        total_invested = sum(inv.total_cost for inv in investments if inv.total_cost)
-        total_units_bought = sum(inv.quantity for inv in investments if inv.quantity)
-
-        # Current values now use live asset prices (updated via WebSocket)
-        total_current_value = sum(
-            inv.quantity * inv.asset.current_price 
-            for inv in investments 
-            if inv.asset and inv.asset.current_price
-        )
-
-        # ROI calculations
-        total_gain_loss = total_current_value - total_invested
-        total_return = (total_gain_loss / total_invested * 100) if total_invested else 0
-        overall_progress = (total_invested / total_target * 100) if total_target else 0
-
+        # Cold-start totals; connected sockets then receive portfolio.update
+        # frames computed the same way as prices move
+        totals = PortfolioTotals.load(request.user).as_dict()
         return Response({
-            "total_target": total_target,
-            "total_invested": total_invested,
-            "overall_progress": overall_progress,
-            "total_units_bought": total_units_bought,
-            "total_current_value": total_current_value,  # Will reflect live prices
-            "total_gain_loss": total_gain_loss,
-            "total_return": total_return,
+            **totals,
             "last_updated": timezone.now().isoformat(),  # Add timestamp
         })
+
+
+# --- Metrics ---
+def metrics_view(request):
+    """
+    This process's metrics (see metrics.py) in the Prometheus text format.
+    Scrapes must send METRICS_TOKEN as a Bearer token; without one set the
+    endpoint is only served with DEBUG on.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    elif not hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()
+    ):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED, headers={'WWW-Authenticate': 'Bearer'})
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
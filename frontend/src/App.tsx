@@ -7,7 +7,6 @@ import Login from './pages/Login';
 import Register from './pages/Register';
 import RegisterStaff from './pages/Register';
 import UserDashboard from './pages/Dashboard';
-import { usePriceWebSocket } from './hooks/usePriceWebSocket';
 
 // Helper to get is_data_admin from localStorage (or use context/auth hook)
 function isAdmin() {
@@ -17,8 +16,6 @@ function isAdmin() {
 export const queryClient = new QueryClient();
 
 function App() {
-  usePriceWebSocket();
-
   return (
     <QueryClientProvider client={queryClient}>
       <BrowserRouter>
@@ -7,6 +7,9 @@ export default function AggregateGoalsSummary() {
   const { data: aggregate, isLoading: loadingAggregate } = useQuery({
     queryKey: ['overall-goal-stats'],
     queryFn: () => api.get('/overall-goal-stats/').then(res => res.data),
+    // Fetched on first load and after goal/investment changes; price moves
+    // arrive as portfolio.update frames (usePriceWebSocket)
+    staleTime: Infinity,
   });
 
   return (
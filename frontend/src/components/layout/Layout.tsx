@@ -1,7 +1,12 @@
 import Header from './Header';
 import { Outlet } from 'react-router-dom';
+import { usePriceWebSocket } from '../../hooks/usePriceWebSocket';
 
 export default function Layout() {
+  // Opened once signed in, so the socket carries the access token; data
+  // admins watch every asset's price
+  usePriceWebSocket({ allPrices: localStorage.getItem('is_data_admin') === 'true' });
+
   return (
     <div className="min-h-screen bg-gray-50">
       <Header />
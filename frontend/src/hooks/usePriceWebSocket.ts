@@ -5,28 +5,78 @@ import ReconnectingWebSocket from 'reconnecting-websocket';
 
 const backendPort = 8000; // or whatever port Daphne is running on
 
-export const usePriceWebSocket = () => {
+type PriceTick = { asset_id: number; new_price: string };
+
+// The prices carried by a frame: one for price.update (and the old untyped
+// frames), several for price.bulk_update and price.snapshot
+const ticksOf = (data: any): PriceTick[] => {
+  switch (data.type) {
+    case 'price.bulk_update':
+      return data.updates ?? [];
+    case 'price.snapshot':
+      return data.prices ?? [];
+    case 'price.update':
+    case undefined:
+      return data.asset_id !== undefined ? [data] : [];
+    default:
+      return [];
+  }
+};
+
+// Browsers can't set headers on a WebSocket, so the access token goes in
+// the query string; read on every (re)connect to pick up refreshed tokens.
+// Signed-in sockets get their own assets' prices and portfolio.update
+// frames; allPrices opts into every asset's ticks.
+const socketUrl = (allPrices: boolean) => () => {
+  const params = new URLSearchParams();
+  const token = localStorage.getItem('access_token');
+  if (token) params.set('token', token);
+  if (allPrices) params.set('all', '1');
+  const query = params.toString();
+  return `ws://localhost:${backendPort}/ws/prices/${query ? `?${query}` : ''}`;
+};
+
+export const usePriceWebSocket = ({ allPrices = false }: { allPrices?: boolean } = {}) => {
   useEffect(() => {
-    const socket = new ReconnectingWebSocket(
-      `ws://localhost:${backendPort}/ws/prices/`
-    );
+    const socket = new ReconnectingWebSocket(socketUrl(allPrices));
 
     socket.onmessage = (event) => {
       const data = JSON.parse(event.data);
 
+      // Totals pushed for signed-in sockets replace the fetched stats
+      if (data.type === 'portfolio.update') {
+        const { type, value_changes, ...totals } = data;
+        queryClient.setQueryData(['overall-goal-stats'], (old: any) => ({ ...old, ...totals }));
+        return;
+      }
+
+      const ticks = ticksOf(data);
+      if (!ticks.length) return;  // e.g. the subscriptions frame
+      const prices = new Map(ticks.map((tick): [number, number] => [tick.asset_id, parseFloat(tick.new_price)]));
+
       // Update investments cache
       queryClient.setQueryData(['investments'], (old: any) => 
         old?.map((inv: any) => 
-          inv.asset.id === data.asset_id
-            ? { ...inv, current_value: inv.quantity * parseFloat(data.new_price) }
+          prices.has(inv.asset?.id)
+            ? { ...inv, current_value: inv.quantity * prices.get(inv.asset.id)! }
             : inv
         )
       );
 
-      // Invalidate aggregate stats (fix the query key!)
-      queryClient.invalidateQueries({ queryKey: ['overall-goal-stats'] });
+      // Update the asset list (admin dashboard)
+      queryClient.setQueryData(['assets'], (old: any) =>
+        old?.results
+          ? {
+              ...old,
+              results: old.results.map((asset: any) =>
+                prices.has(asset.id) ? { ...asset, current_price: prices.get(asset.id)!.toFixed(2) } : asset
+              ),
+            }
+          : old
+      );
+      // Overall stats aren't refetched: portfolio.update frames carry them
     };
 
     return () => socket.close();
-  }, []);
-};
\ No newline at end of file
+  }, [allPrices]);
+};
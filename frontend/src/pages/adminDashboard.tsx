@@ -1,7 +1,6 @@
 import React, { useState } from 'react';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import api from '../api/client';
-import { usePriceWebSocket } from '../hooks/usePriceWebSocket';
 import Header from '../components/layout/Header';
 
 type Asset = {
@@ -23,9 +22,6 @@ export default function AdminDashboard() {
   const [showAddForm, setShowAddForm] = useState(false);
   const [editAsset, setEditAsset] = useState<Asset | null>(null);
 
-  // Initialize WebSocket for real-time price updates
-  usePriceWebSocket();
-
   // Fetch all assets with proper typing
   const { data: assets, isLoading } = useQuery<AssetListResponse>({
     queryKey: ['assets'],